@@ -3,9 +3,10 @@ from django.db import models
 from django.utils.crypto import get_random_string
 from django.utils import timezone
 from cloudinary.models import CloudinaryField
+from utils.loaded_values import LoadedValuesMixin
 from vehicle.models import VehicleModel
 
-class User(AbstractUser):
+class User(LoadedValuesMixin, AbstractUser):
     email = models.EmailField(unique=True)
     email_verified = models.BooleanField(default=False)
 
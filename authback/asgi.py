@@ -13,6 +13,7 @@ from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from django.urls import path
 from repairing_service.consumers import ServiceRequestConsumer, AdminDashboardConsumer
+from repairing_service.dispatch import DispatchLoopMiddleware
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'authback.settings')
 
@@ -25,10 +26,11 @@ websocket_urlpatterns = [
     path('ws/admin/', AdminDashboardConsumer.as_asgi()),
 ]
 
-# Configure the ASGI application with protocol routers
-application = ProtocolTypeRouter({
+# Configure the ASGI application with protocol routers; mechanic dispatches
+# started from sync views run on this server's event loop
+application = DispatchLoopMiddleware(ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(websocket_urlpatterns)
     ),
-})
+}))
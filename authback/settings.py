@@ -543,10 +543,18 @@ AUTHENTICATION_BACKENDS = [
 # Admin email address for notifications
 ADMIN_EMAIL = config('ADMIN_EMAIL', default='admin@repairmybike.in')
 
-# Channel layers configuration for WebSockets
+# Channel layers configuration for WebSockets. The SQLite layer is shared by
+# every worker process on the host, so notifications sent from any worker
+# reach sockets held by the others. In development CHANNEL_LAYER_PATH
+# defaults to a file in the temp directory; production must set it, since
+# the temp directory may be private to each worker or cleared on restart.
+CHANNEL_LAYER_PATH = config('CHANNEL_LAYER_PATH', default=None) if DEBUG else config('CHANNEL_LAYER_PATH')
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
+        "BACKEND": "tools.channel_layers.SQLiteChannelLayer",
+        "CONFIG": {
+            "path": CHANNEL_LAYER_PATH,
+        },
         # For production, use Redis:
         # "BACKEND": "channels_redis.core.RedisChannelLayer",
         # "CONFIG": {
@@ -555,5 +563,36 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Live location pings are bulk inserted every N points or T milliseconds
+LIVE_LOCATION_FLUSH_POINTS = config('LIVE_LOCATION_FLUSH_POINTS', default=200, cast=int)
+LIVE_LOCATION_FLUSH_INTERVAL_MS = config('LIVE_LOCATION_FLUSH_INTERVAL_MS', default=1000, cast=int)
+# Latest position per service request / mechanic is kept in the cache this long (seconds)
+LIVE_LOCATION_CACHE_TIMEOUT = config('LIVE_LOCATION_CACHE_TIMEOUT', default=60 * 60 * 6, cast=int)
+# Each mechanic's pings reach the customer at most once per
+# LIVE_LOCATION_BROADCAST_INTERVAL_MS (the latest one wins); a ping is only
+# stored after moving LIVE_LOCATION_MIN_DISTANCE_M or after
+# LIVE_LOCATION_MIN_INTERVAL_SECONDS, which is also the window for dropping
+# repeated coordinates
+LIVE_LOCATION_BROADCAST_INTERVAL_MS = config('LIVE_LOCATION_BROADCAST_INTERVAL_MS', default=1000, cast=int)
+LIVE_LOCATION_MIN_DISTANCE_M = config('LIVE_LOCATION_MIN_DISTANCE_M', default=10.0, cast=float)
+LIVE_LOCATION_MIN_INTERVAL_SECONDS = config('LIVE_LOCATION_MIN_INTERVAL_SECONDS', default=15.0, cast=float)
+
+# Mechanic dispatch: offers go to DISPATCH_WAVE_SIZE mechanics at a time, each
+# wave waits DISPATCH_WAVE_TIMEOUT_SECONDS for an answer before the next one
+DISPATCH_WAVE_SIZE = config('DISPATCH_WAVE_SIZE', default=3, cast=int)
+DISPATCH_WAVE_TIMEOUT_SECONDS = config('DISPATCH_WAVE_TIMEOUT_SECONDS', default=30, cast=int)
+# Search radii tried in turn when nobody in the current ring accepts
+DISPATCH_SEARCH_RADII_KM = config(
+    'DISPATCH_SEARCH_RADII_KM',
+    default='5,8,12,18',
+    cast=lambda value: tuple(float(radius) for radius in value.split(','))
+)
+DISPATCH_ACCEPTANCE_WINDOW_DAYS = config('DISPATCH_ACCEPTANCE_WINDOW_DAYS', default=30, cast=int)
+
+# Active carts live in the cache (seconds); edits to signed-in users' carts are
+# written to Cart/CartItem every CART_STORE_FLUSH_INTERVAL seconds
+CART_STORE_TIMEOUT = config('CART_STORE_TIMEOUT', default=60 * 60 * 24 * 7, cast=int)
+CART_STORE_FLUSH_INTERVAL = config('CART_STORE_FLUSH_INTERVAL', default=5.0, cast=float)
+
 # Specify ASGI application
 ASGI_APPLICATION = 'authback.asgi.application'
\ No newline at end of file
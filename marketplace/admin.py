@@ -1,9 +1,11 @@
 from django.contrib import admin
-from .models import Vehicle, SellRequest, InspectionReport, PurchaseOffer, Notification
+from .models import Vehicle, SellRequest, InspectionReport, PurchaseOffer, Notification, VehiclePriceEvent, VehiclePriceStats, VehicleValuationModel
+from .services import PurchaseOfferBulkService
 
 @admin.register(Vehicle)
 class VehicleAdmin(admin.ModelAdmin):
     list_display = ('registration_number', 'vehicle_type', 'brand', 'model', 'year', 'status', 'fuel_type', 'Mileage', 'price', 'expected_price')
+    list_select_related = ('owner',)
     list_filter = ('vehicle_type', 'status', 'fuel_type', 'brand')
     search_fields = ('registration_number', 'brand', 'model')
     readonly_fields = ('created_at', 'updated_at')
@@ -32,6 +34,7 @@ class VehicleAdmin(admin.ModelAdmin):
 @admin.register(SellRequest)
 class SellRequestAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'vehicle', 'status', 'created_at')
+    list_select_related = ('user', 'vehicle')
     list_filter = ('status', 'created_at')
     search_fields = ('user__email', 'vehicle__registration_number')
     raw_id_fields = ('user', 'vehicle')
@@ -95,53 +98,50 @@ class SellRequestAdmin(admin.ModelAdmin):
 @admin.register(InspectionReport)
 class InspectionReportAdmin(admin.ModelAdmin):
     list_display = ('get_registration', 'inspector', 'overall_rating', 'passed', 'created_at')
+    list_select_related = ('sell_request__vehicle', 'inspector')
     list_filter = ('passed', 'overall_rating')
     search_fields = ('sell_request__vehicle__registration_number',)
     readonly_fields = ('created_at', 'updated_at')
 
     def get_registration(self, obj):
-        return obj.sell_request.vehicle.registration_number
+        vehicle = obj.sell_request.vehicle
+        return vehicle.registration_number if vehicle else None
     get_registration.short_description = 'Registration Number'
 
 @admin.register(PurchaseOffer)
 class PurchaseOfferAdmin(admin.ModelAdmin):
     list_display = ('get_registration', 'market_value', 'offer_price', 'status', 'counter_offer', 'valid_until')
+    list_select_related = ('sell_request__vehicle',)
     list_filter = ('status', 'is_negotiable')
     search_fields = ('sell_request__vehicle__registration_number',)
     readonly_fields = ('created_at', 'updated_at')
 
     def get_registration(self, obj):
-        return obj.sell_request.vehicle.registration_number
+        vehicle = obj.sell_request.vehicle
+        return vehicle.registration_number if vehicle else None
     get_registration.short_description = 'Registration Number'
     
     actions = ['mark_as_accepted', 'mark_as_rejected', 'extend_validity']
     
     def mark_as_accepted(self, request, queryset):
-        for offer in queryset:
-            offer.status = PurchaseOffer.OfferStatus.ACCEPTED
-            offer.save()
-        self.message_user(request, f"{queryset.count()} offers marked as accepted")
+        updated = PurchaseOfferBulkService.accept(queryset)
+        self.message_user(request, f"{updated} offers marked as accepted")
     mark_as_accepted.short_description = "Mark offers as accepted"
     
     def mark_as_rejected(self, request, queryset):
-        for offer in queryset:
-            offer.status = PurchaseOffer.OfferStatus.REJECTED
-            offer.save()
-        self.message_user(request, f"{queryset.count()} offers marked as rejected")
+        updated = PurchaseOfferBulkService.reject(queryset)
+        self.message_user(request, f"{updated} offers marked as rejected")
     mark_as_rejected.short_description = "Mark offers as rejected"
     
     def extend_validity(self, request, queryset):
-        from datetime import timedelta
-        from django.utils import timezone
-        for offer in queryset:
-            offer.valid_until = timezone.now() + timedelta(days=7)
-            offer.save()
-        self.message_user(request, f"Extended validity for {queryset.count()} offers")
+        updated = PurchaseOfferBulkService.extend_validity(queryset)
+        self.message_user(request, f"Extended validity for {updated} offers")
     extend_validity.short_description = "Extend offer validity by 7 days"
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ('user', 'type', 'title', 'is_read', 'created_at')
+    list_select_related = ('user',)
     list_filter = ('type', 'is_read', 'created_at')
     search_fields = ('user__email', 'title', 'message')
     readonly_fields = ('created_at',)
@@ -157,3 +157,27 @@ class NotificationAdmin(admin.ModelAdmin):
         updated = queryset.update(is_read=False)
         self.message_user(request, f"{updated} notifications marked as unread")
     mark_as_unread.short_description = "Mark as unread"
+
+@admin.register(VehiclePriceEvent)
+class VehiclePriceEventAdmin(admin.ModelAdmin):
+    list_display = ('vehicle', 'brand', 'model', 'year', 'previous_price', 'price', 'status', 'source', 'recorded_at')
+    list_filter = ('source', 'status', 'brand')
+    search_fields = ('vehicle__registration_number', 'brand', 'model')
+    list_select_related = ('vehicle',)
+    date_hierarchy = 'recorded_at'
+
+    def has_change_permission(self, request, obj=None):
+        # Price history is append-only
+        return False
+
+@admin.register(VehiclePriceStats)
+class VehiclePriceStatsAdmin(admin.ModelAdmin):
+    list_display = ('brand', 'model', 'year', 'sample_size', 'p25_price', 'median_price', 'p75_price', 'computed_at')
+    list_filter = ('brand', 'year')
+    search_fields = ('brand', 'model')
+
+@admin.register(VehicleValuationModel)
+class VehicleValuationModelAdmin(admin.ModelAdmin):
+    list_display = ('version', 'sample_size', 'last_event_id', 'fitted_at')
+    exclude = ('statistics',)
+    readonly_fields = ('version', 'sample_size', 'last_event_id', 'features', 'coefficients', 'fitted_at')
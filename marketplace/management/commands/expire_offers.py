@@ -0,0 +1,43 @@
+import time
+from django.core.management.base import BaseCommand
+from marketplace.services import PurchaseOfferExpiryService
+
+class Command(BaseCommand):
+    help = 'Mark purchase offers past their valid_until as expired and notify customers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Maximum number of offers expired per transaction (default: 1000)'
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Stop after this many batches in one sweep'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep sweeping every --interval seconds instead of exiting'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Seconds between sweeps when running with --loop (default: 60)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            expired = PurchaseOfferExpiryService.expire_due(
+                batch_size=options['batch_size'],
+                max_batches=options['max_batches']
+            )
+            if expired or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Expired {expired} purchase offers'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
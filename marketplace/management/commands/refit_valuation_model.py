@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from marketplace.valuation import refit
+
+class Command(BaseCommand):
+    help = 'Refit the vehicle valuation model from price events recorded since the last fit'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Discard the stored statistics and refit from every price event'
+        )
+
+    def handle(self, *args, **options):
+        state, added = refit(full=options['full'])
+        if state is None:
+            self.stdout.write(self.style.WARNING('No priced vehicles available yet, nothing to fit'))
+            return
+        if added == 0:
+            self.stdout.write(self.style.SUCCESS(f'No new price events, keeping valuation model v{state.version}'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Fitted valuation model v{state.version} with {added} new observations '
+            f'({state.sample_size} total, log RMSE {state.coefficients["rmse_log"]:.3f})'
+        ))
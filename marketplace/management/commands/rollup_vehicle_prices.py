@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from marketplace.services import VehiclePriceHistoryService
+
+class Command(BaseCommand):
+    help = 'Rebuild per (brand, model, year) vehicle price percentiles from the price event history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window-days',
+            type=int,
+            default=365,
+            help='Only consider price events from the last N days (default: 365)'
+        )
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='First record the current price of vehicles that have no price history'
+        )
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            recorded = VehiclePriceHistoryService.backfill()
+            self.stdout.write(self.style.SUCCESS(f'Backfilled {recorded} price events'))
+
+        groups = VehiclePriceHistoryService.rebuild_stats(window_days=options['window_days'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt price statistics for {groups} brand/model/year groups'))
@@ -0,0 +1,166 @@
+# Generated by Django 5.2 on 2026-10-18 22:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marketplace", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VehiclePriceStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("brand", models.CharField(max_length=50)),
+                ("model", models.CharField(max_length=50)),
+                ("year", models.PositiveIntegerField()),
+                ("sample_size", models.PositiveIntegerField(default=0)),
+                ("min_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("p10_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("p25_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("median_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("p75_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("p90_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("max_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("mean_price", models.DecimalField(decimal_places=2, max_digits=10)),
+                (
+                    "window_start",
+                    models.DateTimeField(
+                        help_text="Oldest event considered in this rollup"
+                    ),
+                ),
+                (
+                    "computed_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+            options={
+                "ordering": ["brand", "model", "-year"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("brand", "model", "year"),
+                        name="unique_vehicle_price_stats",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="VehiclePriceEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("brand", models.CharField(blank=True, default="", max_length=50)),
+                ("model", models.CharField(blank=True, default="", max_length=50)),
+                ("year", models.PositiveIntegerField(blank=True, null=True)),
+                (
+                    "price",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=10),
+                ),
+                (
+                    "expected_price",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("available", "Available"),
+                            ("under_inspection", "Under Inspection"),
+                            ("inspection_done", "Inspection Done"),
+                            ("sold", "Sold"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "previous_price",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True
+                    ),
+                ),
+                (
+                    "previous_expected_price",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True
+                    ),
+                ),
+                (
+                    "previous_status",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("available", "Available"),
+                            ("under_inspection", "Under Inspection"),
+                            ("inspection_done", "Inspection Done"),
+                            ("sold", "Sold"),
+                        ],
+                        default="",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[
+                            ("save", "Single Save"),
+                            ("bulk_update", "Bulk Update"),
+                            ("bulk_adjustment", "Bulk Adjustment"),
+                        ],
+                        default="save",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "recorded_at",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+                (
+                    "vehicle",
+                    models.ForeignKey(
+                        help_text="Vehicle the event belongs to",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="price_events",
+                        to="marketplace.vehicle",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-recorded_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["brand", "model", "year", "recorded_at"],
+                        name="marketplace_brand_158291_idx",
+                    ),
+                    models.Index(
+                        fields=["vehicle", "recorded_at"],
+                        name="marketplace_vehicle_a57e2b_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-18 22:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marketplace", "0002_vehicle_price_history"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VehicleValuationModel",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.PositiveIntegerField(default=0)),
+                ("sample_size", models.PositiveIntegerField(default=0)),
+                (
+                    "last_event_id",
+                    models.BigIntegerField(
+                        default=0,
+                        help_text="Last VehiclePriceEvent folded into the statistics",
+                    ),
+                ),
+                (
+                    "features",
+                    models.JSONField(
+                        default=list,
+                        help_text="Ordered feature names of the design matrix",
+                    ),
+                ),
+                (
+                    "statistics",
+                    models.BinaryField(help_text="Serialized XtX / Xty arrays"),
+                ),
+                ("coefficients", models.JSONField(default=dict)),
+                ("fitted_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-18 22:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marketplace", "0003_vehicle_valuation_model"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="notification",
+            name="type",
+            field=models.CharField(
+                choices=[
+                    ("new_sell_request", "New Sell Request"),
+                    ("status_change", "Status Change"),
+                    ("offer_made", "Offer Made"),
+                    ("counter_offer", "Counter Offer"),
+                    ("offer_accepted", "Offer Accepted"),
+                    ("offer_rejected", "Offer Rejected"),
+                    ("offer_expired", "Offer Expired"),
+                    ("inspection_scheduled", "Inspection Scheduled"),
+                    ("inspection_completed", "Inspection Completed"),
+                    ("new_booking", "New Booking"),
+                    ("booking_created", "Booking Created"),
+                    ("booking_confirmed", "Booking Confirmed"),
+                    ("booking_completed", "Booking Completed"),
+                    ("booking_cancelled", "Booking Cancelled"),
+                ],
+                max_length=30,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseoffer",
+            index=models.Index(
+                condition=models.Q(
+                    ("status__in", ["initial", "counter_offered", "renegotiated"])
+                ),
+                fields=["valid_until"],
+                name="offer_open_valid_until_idx",
+            ),
+        ),
+    ]
@@ -5,6 +5,7 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from datetime import timedelta
 from django.contrib.auth import get_user_model
 from cloudinary.models import CloudinaryField
+from utils.loaded_values import LoadedValuesMixin
 
 User = get_user_model()
 
@@ -23,7 +24,7 @@ class BaseModel(models.Model):
         abstract = True
         ordering = ['-created_at']
 
-class Vehicle(BaseModel):
+class Vehicle(LoadedValuesMixin, BaseModel):
     """
     Vehicle model representing any two-wheeler (bike, scooter, etc.)
     Handles both petrol and electric vehicles
@@ -177,6 +178,33 @@ class Vehicle(BaseModel):
             models.Index(fields=['price']),
         ]
 
+    # Fields whose changes are recorded as VehiclePriceEvent rows
+    PRICE_TRACKED_FIELDS = ('price', 'expected_price', 'status')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Keep the loaded price/status values so changes can be detected on save"""
+        instance = super().from_db(db, field_names, values)
+        instance._price_snapshot = {
+            field: instance.__dict__[field]
+            for field in cls.PRICE_TRACKED_FIELDS
+            if field in instance.__dict__
+        }
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        """Reloaded values become the new baseline for price change detection"""
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        snapshot = {} if fields is None else getattr(self, '_price_snapshot', {})
+        self._price_snapshot = {
+            **snapshot,
+            **{
+                field: self.__dict__[field]
+                for field in self.PRICE_TRACKED_FIELDS
+                if field in self.__dict__ and (fields is None or field in fields)
+            }
+        }
+
     def __str__(self):
         return f"{self.year} {self.brand or 'Unknown'} {self.model or 'Unknown'} - {self.registration_number}"
 
@@ -201,7 +229,7 @@ class Vehicle(BaseModel):
         
         return round(emi, 2)
 
-class SellRequest(BaseModel):
+class SellRequest(LoadedValuesMixin, BaseModel):
     """
     Represents a request to sell a vehicle
     Tracks the entire selling process from submission to completion
@@ -485,6 +513,19 @@ class PurchaseOffer(BaseModel):
         help_text="Offer validity period"
     )
 
+    # Offers in these statuses lapse once valid_until has passed
+    OPEN_STATUSES = (OfferStatus.INITIAL, OfferStatus.COUNTER_OFFERED, OfferStatus.RENEGOTIATED)
+
+    class Meta(BaseModel.Meta):
+        indexes = [
+            # Partial index so the expiry sweeper only scans offers that can still expire
+            models.Index(
+                fields=['valid_until'],
+                name='offer_open_valid_until_idx',
+                condition=models.Q(status__in=['initial', 'counter_offered', 'renegotiated'])
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         """Ensure a default validity period if not specified"""
         if not self.valid_until:
@@ -530,7 +571,7 @@ class PurchaseOffer(BaseModel):
         self.save()
         return True
 
-class VehiclePurchase(models.Model):
+class VehiclePurchase(LoadedValuesMixin, models.Model):
     """Model to handle direct vehicle purchases"""
     class Status(models.TextChoices):
         PENDING = 'pending', 'Payment Pending'
@@ -577,6 +618,7 @@ class Notification(BaseModel):
         COUNTER_OFFER = 'counter_offer', 'Counter Offer'
         OFFER_ACCEPTED = 'offer_accepted', 'Offer Accepted'
         OFFER_REJECTED = 'offer_rejected', 'Offer Rejected'
+        OFFER_EXPIRED = 'offer_expired', 'Offer Expired'
         INSPECTION_SCHEDULED = 'inspection_scheduled', 'Inspection Scheduled'
         INSPECTION_COMPLETED = 'inspection_completed', 'Inspection Completed'
         NEW_BOOKING = 'new_booking', 'New Booking'
@@ -703,10 +745,37 @@ def create_sell_request_notification(sender, instance, created, **kwargs):
             )
 
 
+def record_vehicle_price_change(sender, instance, created, **kwargs):
+    """Append a price event when a single vehicle is created or its price/status changes"""
+    from .services import VehiclePriceHistoryService
+
+    previous = {} if created else getattr(instance, '_price_snapshot', None)
+    if previous is None:
+        # Instance was not loaded from the database, so there is nothing to diff against
+        return
+    event = VehiclePriceHistoryService.build_event(
+        instance, previous, source=VehiclePriceEvent.Source.SAVE
+    )
+    if event is not None:
+        VehiclePriceHistoryService.record([event])
+    instance._price_snapshot = {
+        field: getattr(instance, field) for field in Vehicle.PRICE_TRACKED_FIELDS
+    }
+
+
+def invalidate_vehicle_listing_cache(sender, instance, **kwargs):
+    """Drop cached vehicle listings whenever a single vehicle is saved or deleted"""
+    from .services import invalidate_vehicle_listings
+    invalidate_vehicle_listings()
+
+
 # Connect signals
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 post_save.connect(create_sell_request_notification, sender=SellRequest)
 post_save.connect(create_purchase_offer, sender=PurchaseOffer)
+post_save.connect(record_vehicle_price_change, sender=Vehicle)
+post_save.connect(invalidate_vehicle_listing_cache, sender=Vehicle)
+post_delete.connect(invalidate_vehicle_listing_cache, sender=Vehicle)
 
 class VehicleBooking(BaseModel):
     """
@@ -793,4 +862,101 @@ class VehicleBooking(BaseModel):
             title='Booking Cancelled',
             message=f'Your booking for {self.vehicle} has been cancelled.',
             data={'booking_id': self.id, 'vehicle_id': self.vehicle.id}
-        )
\ No newline at end of file
+        )
+
+
+class VehiclePriceEvent(models.Model):
+    """
+    Append-only history of vehicle price, expected price and status changes.
+    Brand, model and year are copied at write time so statistics can be
+    computed without joining back to Vehicle.
+    """
+    class Source(models.TextChoices):
+        SAVE = 'save', 'Single Save'
+        BULK_UPDATE = 'bulk_update', 'Bulk Update'
+        BULK_ADJUSTMENT = 'bulk_adjustment', 'Bulk Adjustment'
+
+    vehicle = models.ForeignKey(
+        Vehicle,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='price_events',
+        help_text="Vehicle the event belongs to"
+    )
+    brand = models.CharField(max_length=50, blank=True, default='')
+    model = models.CharField(max_length=50, blank=True, default='')
+    year = models.PositiveIntegerField(null=True, blank=True)
+
+    price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    expected_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=Vehicle.Status.choices)
+
+    previous_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    previous_expected_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    previous_status = models.CharField(max_length=20, choices=Vehicle.Status.choices, blank=True, default='')
+
+    source = models.CharField(max_length=20, choices=Source.choices, default=Source.SAVE)
+    recorded_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ['-recorded_at']
+        indexes = [
+            models.Index(fields=['brand', 'model', 'year', 'recorded_at']),
+            models.Index(fields=['vehicle', 'recorded_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.brand} {self.model} {self.year}: {self.previous_price} -> {self.price}"
+
+
+class VehiclePriceStats(models.Model):
+    """
+    Precomputed price percentiles per (brand, model, year).
+    Rebuilt by the rollup_vehicle_prices management command.
+    """
+    brand = models.CharField(max_length=50)
+    model = models.CharField(max_length=50)
+    year = models.PositiveIntegerField()
+
+    sample_size = models.PositiveIntegerField(default=0)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2)
+    p10_price = models.DecimalField(max_digits=10, decimal_places=2)
+    p25_price = models.DecimalField(max_digits=10, decimal_places=2)
+    median_price = models.DecimalField(max_digits=10, decimal_places=2)
+    p75_price = models.DecimalField(max_digits=10, decimal_places=2)
+    p90_price = models.DecimalField(max_digits=10, decimal_places=2)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2)
+    mean_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    window_start = models.DateTimeField(help_text="Oldest event considered in this rollup")
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['brand', 'model', '-year']
+        constraints = [
+            models.UniqueConstraint(fields=['brand', 'model', 'year'], name='unique_vehicle_price_stats')
+        ]
+
+    def __str__(self):
+        return f"{self.year} {self.brand} {self.model}: median {self.median_price}"
+
+
+class VehicleValuationModel(models.Model):
+    """
+    Fitted depreciation model used to suggest purchase offer market values.
+    Holds the least-squares sufficient statistics so the model can be refit
+    incrementally from new price events. A single row is kept up to date.
+    """
+    version = models.PositiveIntegerField(default=0)
+    sample_size = models.PositiveIntegerField(default=0)
+    last_event_id = models.BigIntegerField(
+        default=0,
+        help_text="Last VehiclePriceEvent folded into the statistics"
+    )
+    features = models.JSONField(default=list, help_text="Ordered feature names of the design matrix")
+    statistics = models.BinaryField(help_text="Serialized XtX / Xty arrays")
+    coefficients = models.JSONField(default=dict)
+    fitted_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Valuation model v{self.version} ({self.sample_size} samples)"
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from django.utils import timezone
 from django.core.validators import RegexValidator
-from .models import Vehicle, SellRequest, InspectionReport, PurchaseOffer, VehiclePurchase, VehicleBooking
+from .models import Vehicle, SellRequest, InspectionReport, PurchaseOffer, VehiclePurchase, VehicleBooking, VehiclePriceStats
 from django.conf import settings
 import re
 
@@ -210,6 +210,112 @@ class VehicleSerializer(serializers.ModelSerializer):
             
         return data
 
+class VehicleBulkUpdateItemSerializer(serializers.Serializer):
+    """A single row of a bulk vehicle price/status update"""
+    id = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    expected_price = serializers.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        min_value=0,
+        required=False,
+        allow_null=True
+    )
+    status = serializers.ChoiceField(choices=Vehicle.Status.choices, required=False)
+
+    def validate(self, data):
+        if len(data) == 1:
+            raise serializers.ValidationError("At least one of price, expected_price or status is required")
+        return data
+
+class VehicleBulkFilterSerializer(serializers.Serializer):
+    """Lookups a filter-based bulk update may select vehicles by, with typed values"""
+    id__in = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, required=False)
+    vehicle_type = serializers.ChoiceField(choices=Vehicle.VehicleType.choices, required=False)
+    brand = serializers.CharField(max_length=50, required=False)
+    brand__in = serializers.ListField(child=serializers.CharField(max_length=50), allow_empty=False, required=False)
+    model = serializers.CharField(max_length=50, required=False)
+    model__in = serializers.ListField(child=serializers.CharField(max_length=50), allow_empty=False, required=False)
+    year = serializers.IntegerField(min_value=1900, required=False)
+    year__gte = serializers.IntegerField(min_value=1900, required=False)
+    year__lte = serializers.IntegerField(min_value=1900, required=False)
+    fuel_type = serializers.ChoiceField(choices=Vehicle.FuelType.choices, required=False)
+    status = serializers.ChoiceField(choices=Vehicle.Status.choices, required=False)
+    status__in = serializers.ListField(
+        child=serializers.ChoiceField(choices=Vehicle.Status.choices),
+        allow_empty=False,
+        required=False
+    )
+    price__gte = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    price__lte = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict):
+            unknown = set(data) - set(self.fields)
+            if unknown:
+                raise serializers.ValidationError(f"Unsupported filter fields: {', '.join(sorted(unknown))}")
+        return super().to_internal_value(data)
+
+    def validate(self, data):
+        if not data:
+            raise serializers.ValidationError("Filter cannot be empty")
+        return data
+
+class VehicleBulkUpdateSerializer(serializers.Serializer):
+    """
+    Validates a staff bulk update. Either:
+    - updates: a list of {id, price, expected_price, status} rows, or
+    - filter + adjust_percent and/or status: applied to every matching vehicle
+    """
+    MAX_ROWS = 1000
+
+    updates = VehicleBulkUpdateItemSerializer(many=True, required=False)
+    filter = VehicleBulkFilterSerializer(required=False)
+    adjust_percent = serializers.DecimalField(
+        max_digits=6,
+        decimal_places=2,
+        min_value=-90,
+        max_value=500,
+        required=False
+    )
+    adjust_fields = serializers.MultipleChoiceField(
+        choices=['price', 'expected_price'],
+        required=False,
+        default=['price']
+    )
+    status = serializers.ChoiceField(choices=Vehicle.Status.choices, required=False)
+
+    def validate_updates(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one update is required")
+        if len(value) > self.MAX_ROWS:
+            raise serializers.ValidationError(f"At most {self.MAX_ROWS} rows can be updated at once")
+        ids = [row['id'] for row in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Each vehicle id may only appear once")
+        return value
+
+    def validate(self, data):
+        has_updates = 'updates' in data
+        has_filter = 'filter' in data
+        if has_updates == has_filter:
+            raise serializers.ValidationError("Provide either updates or filter, not both")
+        if has_filter and data.get('adjust_percent') is None and not data.get('status'):
+            raise serializers.ValidationError("A filter update needs adjust_percent and/or status")
+        return data
+
+class VehiclePriceStatsSerializer(serializers.ModelSerializer):
+    """Serializer for precomputed per-model price percentiles"""
+    class Meta:
+        model = VehiclePriceStats
+        fields = [
+            'brand', 'model', 'year', 'sample_size',
+            'min_price', 'p10_price', 'p25_price', 'median_price',
+            'p75_price', 'p90_price', 'max_price', 'mean_price',
+            'window_start', 'computed_at'
+        ]
+        read_only_fields = fields
+
 class InspectionReportSerializer(serializers.ModelSerializer):
     """Serializer for inspection reports with computed fields"""
     inspector_name = serializers.CharField(source='inspector.get_full_name', read_only=True)
@@ -370,7 +476,7 @@ class PurchaseOfferSerializer(serializers.ModelSerializer):
         model = PurchaseOffer
         fields = [
             'id', 'sell_request', 'sell_request_details', 'market_value',
-            'offer_price', 'price_breakdown', 'is_negotiable', 'accepted',
+            'offer_price', 'price_breakdown', 'is_negotiable', 'status',
             'counter_offer', 'valid_until', 'valid_until_display',
             'price_analysis', 'created_at'
         ]
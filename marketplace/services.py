@@ -0,0 +1,463 @@
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Round
+from django.utils import timezone
+from tools.cache_utils import invalidate_namespace
+from .models import (
+    Vehicle, SellRequest, PurchaseOffer, Notification,
+    VehiclePriceEvent, VehiclePriceStats
+)
+
+CENT = Decimal('0.01')
+
+# Cache namespace shared by every cached vehicle listing response
+VEHICLE_LISTING_CACHE_NAMESPACE = 'marketplace_vehicle_listings'
+# Cache namespace for responses served from the VehiclePriceStats rollup
+PRICE_STATS_CACHE_NAMESPACE = 'marketplace_price_stats'
+
+
+def invalidate_vehicle_listings():
+    """Drop all cached vehicle listings once the current transaction commits"""
+    transaction.on_commit(lambda: invalidate_namespace(VEHICLE_LISTING_CACHE_NAMESPACE))
+
+
+class VehicleBulkUpdateService:
+    """
+    Set-based price and status updates for marketplace vehicles.
+    Rows are written with bulk_update/UPDATE statements, so per-instance
+    save() logic and save signals are intentionally bypassed.
+    """
+    BULK_FIELDS = ('price', 'expected_price', 'status')
+
+    @staticmethod
+    @transaction.atomic
+    def apply_updates(updates):
+        """
+        Apply a list of {id, price, expected_price, status} rows.
+        Returns (updated_ids, not_found_ids).
+        """
+        requested_ids = [row['id'] for row in updates]
+        vehicles = Vehicle.objects.select_for_update().in_bulk(requested_ids)
+        not_found = [vehicle_id for vehicle_id in requested_ids if vehicle_id not in vehicles]
+
+        now = timezone.now()
+        changed_fields = set()
+        changed = []
+        events = []
+        for row in updates:
+            vehicle = vehicles.get(row['id'])
+            if vehicle is None:
+                continue
+            previous = {field: getattr(vehicle, field) for field in Vehicle.PRICE_TRACKED_FIELDS}
+            for field in VehicleBulkUpdateService.BULK_FIELDS:
+                if field in row:
+                    setattr(vehicle, field, row[field])
+                    changed_fields.add(field)
+            vehicle.updated_at = now
+            changed.append(vehicle)
+
+            event = VehiclePriceHistoryService.build_event(
+                vehicle, previous, source=VehiclePriceEvent.Source.BULK_UPDATE, recorded_at=now
+            )
+            if event is not None:
+                events.append(event)
+
+        if changed:
+            Vehicle.objects.bulk_update(
+                changed,
+                sorted(changed_fields) + ['updated_at'],
+                batch_size=500
+            )
+            VehiclePriceHistoryService.record(events)
+            invalidate_vehicle_listings()
+
+        return [vehicle.id for vehicle in changed], not_found
+
+    @staticmethod
+    def max_value(field):
+        """Largest amount the vehicle's decimal column can store"""
+        column = Vehicle._meta.get_field(field)
+        step = Decimal(10) ** -column.decimal_places
+        return Decimal(10) ** (column.max_digits - column.decimal_places) - step
+
+    @staticmethod
+    @transaction.atomic
+    def apply_adjustment(queryset, percent=None, fields=('price',), status=None):
+        """
+        Adjust prices of every vehicle in the queryset by a percentage and/or
+        set their status, using a single UPDATE statement. The price events
+        are built from the locked snapshot, so the rows are not read back.
+        Raises ValidationError, before writing anything, if an adjusted price
+        would not fit its column.
+        Returns the number of updated rows.
+        """
+        now = timezone.now()
+        factor = None if percent is None else Decimal('1') + (Decimal(percent) / Decimal('100'))
+
+        def adjusted(row):
+            """The values the UPDATE below writes into a snapshot row"""
+            after = {field: row[field] for field in Vehicle.PRICE_TRACKED_FIELDS}
+            if factor is not None:
+                for field in fields:
+                    if row[field] is not None:
+                        after[field] = (row[field] * factor).quantize(CENT, rounding=ROUND_HALF_UP)
+            if status:
+                after['status'] = status
+            return after
+
+        # Lock the affected rows and keep their old values for the price history.
+        # While locked the snapshot is exactly what the UPDATE replaces, so the
+        # new values follow from it (ROUND on numeric rounds half away from zero)
+        snapshot_fields = ('id', 'brand', 'model', 'year') + Vehicle.PRICE_TRACKED_FIELDS
+        before = list(queryset.select_for_update().values(*snapshot_fields))
+        if not before:
+            return 0
+        after = [adjusted(row) for row in before]
+
+        if factor is not None and factor > 1:
+            for field in fields:
+                limit = VehicleBulkUpdateService.max_value(field)
+                if any(row[field] is not None and row[field] > limit for row in after):
+                    raise ValidationError(f"Adjusting by {percent}% would push {field} above {limit}")
+
+        values = {'updated_at': now}
+        if factor is not None:
+            for field in fields:
+                values[field] = Round(F(field) * factor, 2)
+        if status:
+            values['status'] = status
+        updated = Vehicle.objects.filter(id__in=[row['id'] for row in before]).update(**values)
+
+        events = []
+        for previous, current in zip(before, after):
+            event = VehiclePriceHistoryService.build_event(
+                current, previous,
+                source=VehiclePriceEvent.Source.BULK_ADJUSTMENT,
+                recorded_at=now,
+                identity=previous
+            )
+            if event is not None:
+                events.append(event)
+        VehiclePriceHistoryService.record(events)
+
+        invalidate_vehicle_listings()
+        return updated
+
+
+class VehiclePriceHistoryService:
+    """
+    Writes the append-only VehiclePriceEvent history and rebuilds the
+    per (brand, model, year) VehiclePriceStats rollup from it.
+    """
+    PERCENTILES = {'p10_price': 10, 'p25_price': 25, 'median_price': 50, 'p75_price': 75, 'p90_price': 90}
+
+    @staticmethod
+    def build_event(current, previous, source, recorded_at=None, identity=None):
+        """
+        Build an unsaved VehiclePriceEvent if any tracked field differs between
+        previous (dict) and current (Vehicle instance or dict of values).
+        identity supplies id/brand/model/year when current is a dict.
+        Returns None when nothing changed.
+        """
+        def value(obj, field):
+            return obj.get(field) if isinstance(obj, dict) else getattr(obj, field)
+
+        if all(
+            field in previous and previous[field] == value(current, field)
+            for field in Vehicle.PRICE_TRACKED_FIELDS
+        ):
+            return None
+
+        identity = identity if identity is not None else current
+        return VehiclePriceEvent(
+            vehicle_id=value(identity, 'id'),
+            brand=value(identity, 'brand') or '',
+            model=value(identity, 'model') or '',
+            year=value(identity, 'year'),
+            price=value(current, 'price') or 0,
+            expected_price=value(current, 'expected_price'),
+            status=value(current, 'status'),
+            previous_price=previous.get('price'),
+            previous_expected_price=previous.get('expected_price'),
+            previous_status=previous.get('status') or '',
+            source=source,
+            recorded_at=recorded_at or timezone.now()
+        )
+
+    @staticmethod
+    def record(events):
+        """Insert price events in bulk"""
+        if events:
+            VehiclePriceEvent.objects.bulk_create(events, batch_size=1000)
+        return len(events)
+
+    @staticmethod
+    def backfill():
+        """
+        Record the current price of every vehicle that has no history yet,
+        so the rollup has a starting point for pre-existing listings.
+        """
+        vehicles = Vehicle.objects.filter(price_events__isnull=True).values(
+            'id', 'brand', 'model', 'year', *Vehicle.PRICE_TRACKED_FIELDS
+        )
+        now = timezone.now()
+        events = [
+            VehiclePriceHistoryService.build_event(
+                vehicle, {}, source=VehiclePriceEvent.Source.SAVE, recorded_at=now
+            )
+            for vehicle in vehicles.iterator(chunk_size=2000)
+        ]
+        return VehiclePriceHistoryService.record(events)
+
+    @staticmethod
+    def percentile(sorted_values, pct):
+        """Linearly interpolated percentile of an already sorted list"""
+        if len(sorted_values) == 1:
+            return sorted_values[0]
+        rank = Decimal(len(sorted_values) - 1) * pct / 100
+        lower = int(rank)
+        upper = min(lower + 1, len(sorted_values) - 1)
+        return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+    @staticmethod
+    def _stats_row(key, prices, window_start, now):
+        prices.sort()
+        quantize = lambda amount: Decimal(amount).quantize(Decimal('0.01'))
+        row = VehiclePriceStats(
+            brand=key[0],
+            model=key[1],
+            year=key[2],
+            sample_size=len(prices),
+            min_price=prices[0],
+            max_price=prices[-1],
+            mean_price=quantize(sum(prices) / len(prices)),
+            window_start=window_start,
+            computed_at=now
+        )
+        for field, pct in VehiclePriceHistoryService.PERCENTILES.items():
+            setattr(row, field, quantize(VehiclePriceHistoryService.percentile(prices, pct)))
+        return row
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild_stats(window_days=365):
+        """
+        Recompute VehiclePriceStats from the latest priced event of every
+        vehicle within the window, streaming events in group order.
+        Returns the number of (brand, model, year) groups written.
+        """
+        now = timezone.now()
+        window_start = now - timedelta(days=window_days)
+        events = (
+            VehiclePriceEvent.objects
+            .filter(recorded_at__gte=window_start, vehicle__isnull=False, year__isnull=False)
+            .order_by('brand', 'model', 'year', 'vehicle_id', 'recorded_at', 'id')
+            .values_list('brand', 'model', 'year', 'vehicle_id', 'price')
+        )
+
+        rows = []
+        current_key = None
+        latest_by_vehicle = {}
+        for brand, model, year, vehicle_id, price in events.iterator(chunk_size=5000):
+            key = (brand, model, year)
+            if key != current_key:
+                prices = [p for p in latest_by_vehicle.values() if p > 0]
+                if prices:
+                    rows.append(VehiclePriceHistoryService._stats_row(current_key, prices, window_start, now))
+                current_key = key
+                latest_by_vehicle = {}
+            latest_by_vehicle[vehicle_id] = price
+
+        prices = [p for p in latest_by_vehicle.values() if p > 0]
+        if prices:
+            rows.append(VehiclePriceHistoryService._stats_row(current_key, prices, window_start, now))
+
+        VehiclePriceStats.objects.all().delete()
+        VehiclePriceStats.objects.bulk_create(rows, batch_size=1000)
+        transaction.on_commit(lambda: invalidate_namespace(PRICE_STATS_CACHE_NAMESPACE))
+        return len(rows)
+
+
+class PurchaseOfferBulkService:
+    """
+    Set-based status changes for purchase offers, used by admin actions.
+    Each operation is a handful of UPDATE statements plus at most one bulk
+    notification insert, regardless of how many offers are selected.
+    """
+
+    @staticmethod
+    def _offer_notifications(offers, notification_type, title, message):
+        """Build one unsaved notification per offer for the owning customer"""
+        return [
+            Notification(
+                user_id=offer['sell_request__user_id'],
+                type=notification_type,
+                sell_request_id=offer['sell_request_id'],
+                title=title,
+                message=message.format(offer_price=offer['offer_price']),
+                data={
+                    'offer_id': str(offer['id']),
+                    'offer_price': float(offer['offer_price'])
+                }
+            )
+            for offer in offers
+        ]
+
+    @staticmethod
+    def _notify_customers(offers, notification_type, title, message):
+        """Insert one notification per offer for the owning customer"""
+        Notification.objects.bulk_create(
+            PurchaseOfferBulkService._offer_notifications(offers, notification_type, title, message),
+            batch_size=500
+        )
+
+    @staticmethod
+    def _status_change_notifications(offers, new_status):
+        """
+        Build the "Sell Request Status Updated" notification a SellRequest
+        save() would create, for every sell request whose status changes.
+        """
+        label = SellRequest.Status(new_status).label
+        return [
+            Notification(
+                user_id=offer['sell_request__user_id'],
+                type=Notification.Type.STATUS_CHANGE,
+                sell_request_id=offer['sell_request_id'],
+                title="Sell Request Status Updated",
+                message=f"Your sell request status has been updated to {label}.",
+                data={
+                    'sell_request_id': offer['sell_request_id'],
+                    'old_status': offer['sell_request__status'],
+                    'new_status': new_status
+                }
+            )
+            for offer in offers
+            if offer['sell_request__status'] != new_status
+        ]
+
+    @staticmethod
+    @transaction.atomic
+    def accept(queryset):
+        """
+        Mark offers as accepted, close their sell requests and notify customers,
+        both of the accepted offer and of the sell request status change.
+        Returns the number of offers whose status changed.
+        """
+        pending = queryset.exclude(status=PurchaseOffer.OfferStatus.ACCEPTED)
+        offers = list(pending.values(
+            'id', 'sell_request_id', 'sell_request__user_id', 'sell_request__status', 'offer_price'
+        ))
+        if not offers:
+            return 0
+
+        now = timezone.now()
+        offer_ids = [offer['id'] for offer in offers]
+        PurchaseOffer.objects.filter(id__in=offer_ids).update(
+            status=PurchaseOffer.OfferStatus.ACCEPTED,
+            updated_at=now
+        )
+        SellRequest.objects.filter(
+            id__in=[offer['sell_request_id'] for offer in offers]
+        ).update(status=SellRequest.Status.DEAL_CLOSED, updated_at=now)
+
+        Notification.objects.bulk_create(
+            PurchaseOfferBulkService._offer_notifications(
+                offers,
+                Notification.Type.OFFER_ACCEPTED,
+                "Offer Accepted",
+                "Your offer of ₹{offer_price} has been accepted. The deal is now closed."
+            ) + PurchaseOfferBulkService._status_change_notifications(offers, SellRequest.Status.DEAL_CLOSED),
+            batch_size=500
+        )
+        return len(offers)
+
+    @staticmethod
+    @transaction.atomic
+    def reject(queryset):
+        """
+        Mark offers as rejected and notify customers.
+        Sell request status is left unchanged, as with single rejections.
+        Returns the number of offers whose status changed.
+        """
+        pending = queryset.exclude(status=PurchaseOffer.OfferStatus.REJECTED)
+        offers = list(pending.values('id', 'sell_request_id', 'sell_request__user_id', 'offer_price'))
+        if not offers:
+            return 0
+
+        PurchaseOffer.objects.filter(id__in=[offer['id'] for offer in offers]).update(
+            status=PurchaseOffer.OfferStatus.REJECTED,
+            updated_at=timezone.now()
+        )
+
+        PurchaseOfferBulkService._notify_customers(
+            offers,
+            Notification.Type.OFFER_REJECTED,
+            "Offer Rejected",
+            "The offer of ₹{offer_price} for your vehicle has been rejected."
+        )
+        return len(offers)
+
+    @staticmethod
+    def extend_validity(queryset, days=7):
+        """Push the validity of every selected offer to now + days in one UPDATE"""
+        now = timezone.now()
+        return queryset.update(valid_until=now + timedelta(days=days), updated_at=now)
+
+
+class PurchaseOfferExpiryService:
+    """
+    Marks purchase offers whose valid_until has passed as expired.
+    Works in bounded batches so each transaction stays short no matter how
+    many historical offers exist.
+    """
+
+    @staticmethod
+    @transaction.atomic
+    def expire_batch(now, batch_size):
+        """
+        Expire up to batch_size due offers with one UPDATE and one bulk
+        notification insert. Rows locked by another sweeper are skipped.
+        Returns the number of offers expired.
+        """
+        due = (
+            PurchaseOffer.objects
+            .filter(status__in=PurchaseOffer.OPEN_STATUSES, valid_until__lt=now)
+            .order_by('valid_until')
+            .select_for_update(skip_locked=True, of=('self',))
+            .values('id', 'sell_request_id', 'sell_request__user_id', 'offer_price')
+        )[:batch_size]
+        offers = list(due)
+        if not offers:
+            return 0
+
+        PurchaseOffer.objects.filter(id__in=[offer['id'] for offer in offers]).update(
+            status=PurchaseOffer.OfferStatus.EXPIRED,
+            updated_at=now
+        )
+        PurchaseOfferBulkService._notify_customers(
+            offers,
+            Notification.Type.OFFER_EXPIRED,
+            "Offer Expired",
+            "Our offer of ₹{offer_price} for your vehicle has expired. Contact us for a fresh quote."
+        )
+        return len(offers)
+
+    @staticmethod
+    def expire_due(batch_size=1000, max_batches=None):
+        """
+        Expire every due offer, batch by batch, until none are left or
+        max_batches is reached. Returns the total number expired.
+        """
+        now = timezone.now()
+        total = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            expired = PurchaseOfferExpiryService.expire_batch(now, batch_size)
+            total += expired
+            batches += 1
+            if expired < batch_size:
+                break
+        return total
@@ -0,0 +1,67 @@
+import pytest
+from decimal import Decimal
+
+
+@pytest.fixture
+def staff_client():
+    from rest_framework.test import APIClient
+    from accounts.models import User
+
+    client = APIClient()
+    client.force_authenticate(
+        User.objects.create_user(username='staff', email='staff@example.com', password='x', is_staff=True)
+    )
+    return client
+
+
+@pytest.mark.django_db
+def test_filter_update_applies_typed_lookups(staff_client):
+    from marketplace.models import Vehicle
+
+    old = Vehicle.objects.create(registration_number='DL01AA0001', brand='Hero', year=2015, price=Decimal('100.00'))
+    new = Vehicle.objects.create(registration_number='DL01AA0002', brand='Hero', year=2022, price=Decimal('200.00'))
+
+    response = staff_client.post('/api/marketplace/vehicles/bulk-update/', {
+        'filter': {'brand__in': ['Hero'], 'year__lte': '2018'}, 'adjust_percent': '10',
+    }, format='json')
+    assert response.status_code == 200, response.content
+    assert response.json()['updated'] == 1
+    old.refresh_from_db()
+    new.refresh_from_db()
+    assert (old.price, new.price) == (Decimal('110.00'), Decimal('200.00'))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('lookup', [
+    {'year': 'abc'},
+    {'id__in': 5},
+    {'status': 'gone'},
+    {'price__gte': 'cheap'},
+    {'owner__email': 'someone@example.com'},
+    {},
+])
+def test_invalid_filters_are_rejected(staff_client, lookup):
+    response = staff_client.post('/api/marketplace/vehicles/bulk-update/', {
+        'filter': lookup, 'adjust_percent': '10',
+    }, format='json')
+    assert response.status_code == 400
+    assert 'filter' in response.json()
+
+
+@pytest.mark.django_db
+def test_adjustment_that_overflows_the_price_column_is_rejected(staff_client):
+    from marketplace.models import Vehicle, VehiclePriceEvent
+
+    cheap = Vehicle.objects.create(registration_number='DL01AA0003', brand='Hero', price=Decimal('100.00'))
+    dear = Vehicle.objects.create(registration_number='DL01AA0004', brand='Hero', price=Decimal('50000000.00'))
+    events = VehiclePriceEvent.objects.count()
+
+    response = staff_client.post('/api/marketplace/vehicles/bulk-update/', {
+        'filter': {'brand': 'Hero'}, 'adjust_percent': '100',
+    }, format='json')
+    assert response.status_code == 400
+    assert 'adjust_percent' in response.json()
+    cheap.refresh_from_db()
+    dear.refresh_from_db()
+    assert (cheap.price, dear.price) == (Decimal('100.00'), Decimal('50000000.00'))
+    assert VehiclePriceEvent.objects.count() == events
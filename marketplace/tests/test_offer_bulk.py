@@ -0,0 +1,97 @@
+import pytest
+from datetime import timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+
+@pytest.fixture
+def make_offer():
+    from accounts.models import User
+    from marketplace.models import PurchaseOffer, SellRequest, Vehicle
+
+    seller = User.objects.create_user(username='seller', email='seller@example.com', password='x')
+    counter = iter(range(1000))
+
+    def make(status=PurchaseOffer.OfferStatus.INITIAL, sell_status=SellRequest.Status.OFFER_MADE):
+        number = next(counter)
+        sell_request = SellRequest.objects.create(
+            user=seller,
+            vehicle=Vehicle.objects.create(registration_number=f'DL04DD{number:04d}', price=100),
+            pickup_address='Sector 5', contact_number='9999999999', status=sell_status
+        )
+        return PurchaseOffer.objects.create(sell_request=sell_request, offer_price=50 + number, status=status)
+
+    return make
+
+
+@pytest.mark.django_db
+def test_accept_closes_sell_requests_and_notifies(make_offer):
+    from marketplace.models import Notification, PurchaseOffer, SellRequest
+    from marketplace.services import PurchaseOfferBulkService
+
+    chosen = [make_offer(), make_offer(PurchaseOffer.OfferStatus.COUNTER_OFFERED)]
+    already = make_offer(PurchaseOffer.OfferStatus.ACCEPTED, SellRequest.Status.DEAL_CLOSED)
+    untouched = make_offer()
+    Notification.objects.all().delete()
+
+    ids = [offer.id for offer in chosen + [already]]
+    assert PurchaseOfferBulkService.accept(PurchaseOffer.objects.filter(id__in=ids)) == 2
+
+    statuses = dict(PurchaseOffer.objects.values_list('id', 'status'))
+    assert {statuses[offer.id] for offer in chosen + [already]} == {PurchaseOffer.OfferStatus.ACCEPTED}
+    assert statuses[untouched.id] == PurchaseOffer.OfferStatus.INITIAL
+    sell_statuses = dict(SellRequest.objects.values_list('id', 'status'))
+    assert {sell_statuses[offer.sell_request_id] for offer in chosen} == {SellRequest.Status.DEAL_CLOSED}
+    assert sell_statuses[untouched.sell_request_id] == SellRequest.Status.OFFER_MADE
+
+    accepted = Notification.objects.filter(type=Notification.Type.OFFER_ACCEPTED)
+    assert sorted(accepted.values_list('sell_request_id', flat=True)) == sorted(o.sell_request_id for o in chosen)
+    status_changes = Notification.objects.filter(type=Notification.Type.STATUS_CHANGE)
+    assert sorted(status_changes.values_list('sell_request_id', flat=True)) == sorted(o.sell_request_id for o in chosen)
+    assert {(n.data['old_status'], n.data['new_status']) for n in status_changes} == {
+        (SellRequest.Status.OFFER_MADE, SellRequest.Status.DEAL_CLOSED)
+    }
+    assert Notification.objects.count() == 4
+
+
+@pytest.mark.django_db
+def test_reject_updates_the_whole_selection_in_constant_queries(make_offer):
+    from marketplace.models import Notification, PurchaseOffer, SellRequest
+    from marketplace.services import PurchaseOfferBulkService
+
+    small = [make_offer() for _ in range(2)]
+    large = [make_offer() for _ in range(10)]
+    Notification.objects.all().delete()
+
+    with CaptureQueriesContext(connection) as few:
+        assert PurchaseOfferBulkService.reject(PurchaseOffer.objects.filter(id__in=[o.id for o in small])) == 2
+    with CaptureQueriesContext(connection) as many:
+        assert PurchaseOfferBulkService.reject(PurchaseOffer.objects.filter(id__in=[o.id for o in large])) == 10
+    assert len(many) == len(few)
+
+    assert set(PurchaseOffer.objects.values_list('status', flat=True)) == {PurchaseOffer.OfferStatus.REJECTED}
+    # Rejecting leaves the sell requests where they were
+    assert set(SellRequest.objects.values_list('status', flat=True)) == {SellRequest.Status.OFFER_MADE}
+    assert Notification.objects.filter(type=Notification.Type.OFFER_REJECTED).count() == 12
+    assert Notification.objects.count() == 12
+    assert PurchaseOfferBulkService.reject(PurchaseOffer.objects.all()) == 0
+
+
+@pytest.mark.django_db
+def test_extend_validity_moves_every_selected_offer(make_offer):
+    from marketplace.models import PurchaseOffer
+    from marketplace.services import PurchaseOfferBulkService
+
+    chosen = [make_offer() for _ in range(3)]
+    other = make_offer()
+    before = timezone.now()
+
+    assert PurchaseOfferBulkService.extend_validity(
+        PurchaseOffer.objects.filter(id__in=[offer.id for offer in chosen]), days=3
+    ) == 3
+
+    for offer in chosen:
+        offer.refresh_from_db()
+        assert before + timedelta(days=3) <= offer.valid_until <= timezone.now() + timedelta(days=3)
+    assert PurchaseOffer.objects.get(id=other.id).valid_until == other.valid_until
@@ -0,0 +1,59 @@
+import pytest
+from datetime import timedelta
+from django.utils import timezone
+
+
+@pytest.mark.django_db
+def test_only_due_open_offers_expire():
+    from accounts.models import User
+    from marketplace.models import Notification, PurchaseOffer, SellRequest, Vehicle
+    from marketplace.services import PurchaseOfferExpiryService
+
+    seller = User.objects.create_user(username='seller', email='seller@example.com', password='x')
+    now = timezone.now()
+
+    def offer(number, valid_until, status=PurchaseOffer.OfferStatus.INITIAL):
+        sell_request = SellRequest.objects.create(
+            user=seller,
+            vehicle=Vehicle.objects.create(registration_number=f'DL02BB{number:04d}', price=100),
+            pickup_slot=now, pickup_address='Sector 5', contact_number='9999999999'
+        )
+        return PurchaseOffer.objects.create(
+            sell_request=sell_request, offer_price=50, valid_until=valid_until, status=status
+        )
+
+    due = [offer(number, now - timedelta(hours=number + 1)) for number in range(5)]
+    countered = offer(5, now - timedelta(hours=1), PurchaseOffer.OfferStatus.COUNTER_OFFERED)
+    accepted = offer(6, now - timedelta(hours=1), PurchaseOffer.OfferStatus.ACCEPTED)
+    current = offer(7, now + timedelta(days=1))
+    Notification.objects.all().delete()
+
+    # Small batches: the sweep keeps going until nothing is due
+    assert PurchaseOfferExpiryService.expire_due(batch_size=2) == 6
+
+    statuses = dict(PurchaseOffer.objects.values_list('id', 'status'))
+    assert {statuses[item.id] for item in due + [countered]} == {PurchaseOffer.OfferStatus.EXPIRED}
+    assert statuses[accepted.id] == PurchaseOffer.OfferStatus.ACCEPTED
+    assert statuses[current.id] == PurchaseOffer.OfferStatus.INITIAL
+    assert Notification.objects.filter(type=Notification.Type.OFFER_EXPIRED).count() == 6
+    assert PurchaseOfferExpiryService.expire_due(batch_size=2) == 0
+
+
+@pytest.mark.django_db
+def test_max_batches_bounds_one_run():
+    from accounts.models import User
+    from marketplace.models import PurchaseOffer, SellRequest, Vehicle
+    from marketplace.services import PurchaseOfferExpiryService
+
+    seller = User.objects.create_user(username='seller', email='seller@example.com', password='x')
+    past = timezone.now() - timedelta(days=1)
+    for number in range(5):
+        sell_request = SellRequest.objects.create(
+            user=seller,
+            vehicle=Vehicle.objects.create(registration_number=f'DL03CC{number:04d}', price=100),
+            pickup_slot=past, pickup_address='Sector 5', contact_number='9999999999'
+        )
+        PurchaseOffer.objects.create(sell_request=sell_request, offer_price=50, valid_until=past)
+
+    assert PurchaseOfferExpiryService.expire_due(batch_size=2, max_batches=1) == 2
+    assert PurchaseOffer.objects.filter(status=PurchaseOffer.OfferStatus.EXPIRED).count() == 2
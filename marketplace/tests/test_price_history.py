@@ -0,0 +1,152 @@
+import io
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management import call_command
+from django.utils import timezone
+
+
+def vehicle(number, price, brand='Hero', model='Splendor', year=2020):
+    from marketplace.models import Vehicle
+
+    return Vehicle.objects.create(
+        registration_number=f'DL05EE{number:04d}', brand=brand, model=model, year=year, price=Decimal(price)
+    )
+
+
+@pytest.mark.django_db
+def test_save_records_one_event_per_change_and_none_when_unchanged():
+    from marketplace.models import Vehicle, VehiclePriceEvent
+
+    bike = vehicle(1, '100.00')
+    assert bike.price_events.count() == 1
+
+    bike = Vehicle.objects.get(id=bike.id)
+    bike.price = Decimal('120.00')
+    bike.save()
+    event = bike.price_events.order_by('-id').first()
+    assert bike.price_events.count() == 2
+    assert (event.previous_price, event.price, event.source) == (
+        Decimal('100.00'), Decimal('120.00'), VehiclePriceEvent.Source.SAVE
+    )
+
+    bike.save()
+    bike.mileage = 1000
+    bike.save()
+    Vehicle.objects.get(id=bike.id).save()
+    assert bike.price_events.count() == 2
+
+
+@pytest.mark.django_db
+def test_refresh_from_db_resets_the_change_baseline():
+    from marketplace.models import Vehicle, VehiclePriceEvent
+
+    bike = vehicle(1, '100.00')
+    Vehicle.objects.filter(id=bike.id).update(price=Decimal('90.00'))
+    bike.refresh_from_db()
+    bike.save()
+    assert VehiclePriceEvent.objects.filter(vehicle=bike).count() == 1
+
+
+@pytest.mark.django_db
+def test_bulk_adjustment_records_one_event_per_vehicle():
+    from marketplace.models import Vehicle, VehiclePriceEvent
+    from marketplace.services import VehicleBulkUpdateService
+
+    bikes = [vehicle(1, '100.00'), vehicle(2, '33.33'), vehicle(3, '0.05')]
+    other = vehicle(4, '500.00', brand='Bajaj')
+    VehiclePriceEvent.objects.all().delete()
+
+    updated = VehicleBulkUpdateService.apply_adjustment(
+        Vehicle.objects.filter(brand='Hero'), percent=Decimal('10'), status=Vehicle.Status.AVAILABLE
+    )
+    assert updated == 3
+
+    events = {event.vehicle_id: event for event in VehiclePriceEvent.objects.all()}
+    assert set(events) == {bike.id for bike in bikes}
+    for bike in bikes:
+        bike.refresh_from_db()
+        event = events[bike.id]
+        # The recorded values are the ones the UPDATE wrote
+        assert (event.price, event.status) == (bike.price, Vehicle.Status.AVAILABLE)
+        assert event.source == VehiclePriceEvent.Source.BULK_ADJUSTMENT
+    assert [bike.price for bike in bikes] == [Decimal('110.00'), Decimal('36.66'), Decimal('0.06')]
+    assert events[bikes[1].id].previous_price == Decimal('33.33')
+    other.refresh_from_db()
+    assert other.price == Decimal('500.00')
+
+
+@pytest.mark.django_db
+def test_bulk_adjustment_without_changes_records_nothing():
+    from marketplace.models import Vehicle, VehiclePriceEvent
+    from marketplace.services import VehicleBulkUpdateService
+
+    vehicle(1, '100.00')
+    VehiclePriceEvent.objects.all().delete()
+
+    assert VehicleBulkUpdateService.apply_adjustment(Vehicle.objects.all(), percent=Decimal('0')) == 1
+    assert not VehiclePriceEvent.objects.exists()
+
+
+@pytest.mark.django_db
+def test_rollup_percentiles_use_each_vehicles_latest_price():
+    from marketplace.models import Vehicle, VehiclePriceEvent, VehiclePriceStats
+
+    bikes = [vehicle(number, str(price)) for number, price in enumerate([100, 200, 300, 400, 500])]
+    # Only the latest price of a vehicle counts
+    bikes[0].price = Decimal('600.00')
+    bikes[0].save()
+    vehicle(10, '1000.00', year=2018)
+    free = vehicle(11, '0.00', year=2018)
+    old = vehicle(12, '50.00', model='Passion')
+    VehiclePriceEvent.objects.filter(vehicle=old).update(recorded_at=timezone.now() - timedelta(days=400))
+    assert free.price_events.count() == 1
+
+    out = io.StringIO()
+    call_command('rollup_vehicle_prices', stdout=out)
+    assert 'for 2 brand/model/year groups' in out.getvalue()
+
+    stats = VehiclePriceStats.objects.get(brand='Hero', model='Splendor', year=2020)
+    assert stats.sample_size == 5
+    assert (stats.min_price, stats.max_price, stats.mean_price) == (Decimal('200'), Decimal('600'), Decimal('400'))
+    assert (stats.p10_price, stats.p25_price, stats.median_price, stats.p75_price, stats.p90_price) == (
+        Decimal('240'), Decimal('300'), Decimal('400'), Decimal('500'), Decimal('560')
+    )
+    single = VehiclePriceStats.objects.get(year=2018)
+    assert (single.sample_size, single.median_price) == (1, Decimal('1000'))
+    assert not VehiclePriceStats.objects.filter(model='Passion').exists()
+    assert Vehicle.objects.count() == 8
+
+
+@pytest.mark.django_db
+def test_backfill_records_vehicles_without_history():
+    from marketplace.models import Vehicle, VehiclePriceEvent, VehiclePriceStats
+
+    vehicle(1, '100.00')
+    Vehicle.objects.bulk_create([
+        Vehicle(registration_number='DL05EE0002', brand='Hero', model='Splendor', year=2020, price=Decimal('300.00'))
+    ])
+    out = io.StringIO()
+    call_command('rollup_vehicle_prices', '--backfill', stdout=out)
+    assert 'Backfilled 1 price events' in out.getvalue()
+    assert VehiclePriceEvent.objects.count() == 2
+    assert VehiclePriceStats.objects.get().median_price == Decimal('200')
+
+
+@pytest.mark.django_db
+def test_price_stats_endpoint_serves_the_rollup():
+    from rest_framework.test import APIClient
+    from accounts.models import User
+    from marketplace.services import VehiclePriceHistoryService
+
+    vehicle(1, '100.00')
+    vehicle(2, '300.00', brand='Bajaj', model='Pulsar')
+    VehiclePriceHistoryService.rebuild_stats()
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='buyer', email='buyer@example.com', password='x'))
+    response = client.get('/api/marketplace/price-stats/', {'brand': 'Bajaj'})
+    assert response.status_code == 200
+    results = response.json()
+    results = results.get('results', results) if isinstance(results, dict) else results
+    assert [(row['model'], row['median_price']) for row in results] == [('Pulsar', '300.00')]
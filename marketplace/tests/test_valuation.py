@@ -0,0 +1,228 @@
+import io
+import math
+import time
+import pytest
+from decimal import Decimal
+from types import SimpleNamespace
+from django.core.management import call_command
+from django.utils import timezone
+
+AGE_EFFECT = -0.1
+KMS_EFFECT = -0.2
+BAJAJ_EFFECT = 0.3
+
+
+def true_price(brand, year, kms_driven):
+    age = timezone.now().year - year
+    log_price = 11.0 + AGE_EFFECT * age + KMS_EFFECT * math.log1p(kms_driven / 1000.0)
+    return Decimal(str(round(math.exp(log_price + (BAJAJ_EFFECT if brand == 'Bajaj' else 0.0)), 2)))
+
+
+@pytest.fixture(autouse=True)
+def fresh_coefficients(monkeypatch):
+    from django.core.cache import cache
+    from marketplace import valuation
+
+    cache.delete(valuation.COEFFICIENTS_CACHE_KEY)
+    monkeypatch.setattr(valuation, '_local', {'coefficients': None, 'checked_at': None})
+
+
+@pytest.fixture
+def market():
+    """Listed vehicles priced exactly by a known depreciation curve"""
+    from marketplace.models import Vehicle
+
+    counter = iter(range(10000))
+    this_year = timezone.now().year
+
+    def add(brand, year, kms_driven, model='Base'):
+        return Vehicle.objects.create(
+            registration_number=f'DL06FF{next(counter):04d}', brand=brand, model=model, year=year,
+            kms_driven=kms_driven, status=Vehicle.Status.AVAILABLE, price=true_price(brand, year, kms_driven)
+        )
+
+    for brand in ('Hero', 'Bajaj'):
+        for year in range(this_year - 12, this_year):
+            for kms_driven in (5000, 20000, 60000):
+                add(brand, year, kms_driven)
+    return add
+
+
+@pytest.mark.django_db
+def test_refit_recovers_the_depreciation_curve(market):
+    from marketplace.valuation import refit
+
+    state, added = refit()
+    assert (state.version, added, state.sample_size) == (1, 72, 72)
+    numeric = state.coefficients['numeric']
+    assert numeric['age'] == pytest.approx(AGE_EFFECT, abs=1e-3)
+    assert numeric['log_kms'] == pytest.approx(KMS_EFFECT, abs=1e-3)
+    # The ridge penalty shrinks the brand/model effects a little towards zero
+    effect = {
+        brand: state.coefficients['brand'][brand] + state.coefficients['model'][f'{brand}|base']
+        for brand in ('hero', 'bajaj')
+    }
+    assert effect['bajaj'] - effect['hero'] == pytest.approx(BAJAJ_EFFECT, abs=0.02)
+    assert state.coefficients['rmse_log'] < 0.05
+
+
+@pytest.mark.django_db
+def test_refit_only_folds_in_new_events(market, django_capture_on_commit_callbacks):
+    from django.core.cache import cache
+    from marketplace.models import Vehicle
+    from marketplace.valuation import COEFFICIENTS_CACHE_KEY, refit
+
+    first, _ = refit()
+    assert refit() == (first, 0)
+
+    market('Hero', timezone.now().year - 3, 10000, model='Splendor')
+    # Vehicles not listed or sold are not market observations
+    Vehicle.objects.create(registration_number='DL06FF9999', brand='Hero', price=Decimal('1000.00'))
+    with django_capture_on_commit_callbacks(execute=True):
+        second, added = refit()
+    assert (second.version, added, second.sample_size) == (2, 1, 73)
+    assert 'hero|splendor' in second.coefficients['model']
+    assert cache.get(COEFFICIENTS_CACHE_KEY)['version'] == 2
+
+    full, added = refit(full=True)
+    assert (full.version, added, full.sample_size) == (3, 73, 73)
+    assert full.coefficients['numeric']['age'] == pytest.approx(second.coefficients['numeric']['age'])
+
+
+@pytest.mark.django_db
+def test_refit_command_reports_each_outcome():
+    from marketplace.models import Vehicle
+
+    def run(*args):
+        out = io.StringIO()
+        call_command('refit_valuation_model', *args, stdout=out)
+        return out.getvalue()
+
+    assert 'nothing to fit' in run()
+    Vehicle.objects.create(
+        registration_number='DL06FF0001', brand='Hero', year=2020, status=Vehicle.Status.AVAILABLE, price=50000
+    )
+    assert 'Fitted valuation model v1 with 1 new observations' in run()
+    assert 'keeping valuation model v1' in run()
+    assert 'v2' in run('--full')
+
+
+@pytest.mark.django_db
+def test_coefficients_are_kept_in_memory_and_cache(market, django_assert_num_queries):
+    from django.core.cache import cache
+    from marketplace import valuation
+
+    valuation.refit()
+    with django_assert_num_queries(1):
+        coefficients = valuation.get_coefficients()
+    assert coefficients['version'] == 1
+    assert cache.get(valuation.COEFFICIENTS_CACHE_KEY) == coefficients
+
+    with django_assert_num_queries(0):
+        assert valuation.get_coefficients() is coefficients
+        # Once the local copy is stale the shared cache answers
+        valuation._local['checked_at'] -= valuation.LOCAL_CACHE_SECONDS + 1
+        assert valuation.get_coefficients() == coefficients
+
+
+@pytest.mark.django_db
+def test_suggestion_breakdown_adds_up():
+    from marketplace.valuation import CONDITION_FIELDS, suggest_valuation
+
+    assert suggest_valuation(SimpleNamespace(brand='Hero', model='X', year=2020, kms_driven=0, fuel_type='petrol')) is None
+
+    coefficients = {
+        'numeric': {'intercept': 11.0, 'age': -0.1, 'log_kms': -0.2, 'electric': 0.0,
+                    **{field: 0.05 for field in CONDITION_FIELDS}},
+        'brand': {'hero': 0.1}, 'model': {}, 'version': 7,
+    }
+    bike = SimpleNamespace(brand='Hero', model='Splendor', year=2020, kms_driven=12000, fuel_type='petrol')
+    suggestion = suggest_valuation(bike, {'engine_condition': 1}, coefficients=coefficients, reference_year=2025)
+
+    breakdown = suggestion['price_breakdown']
+    assert breakdown['model_version'] == 7
+    assert set(breakdown['deductions']) == {field.replace('_condition', '') for field in CONDITION_FIELDS}
+    # Engine is poor and the rest average: every part is a deduction, the engine the largest
+    assert all(amount < 0 for amount in breakdown['deductions'].values())
+    assert min(breakdown['deductions'], key=breakdown['deductions'].get) == 'engine'
+    total = Decimal(str(breakdown['base_price'])) + sum(Decimal(str(v)) for v in breakdown['deductions'].values())
+    assert suggestion['market_value'] == total.quantize(Decimal('0.01'))
+
+
+@pytest.mark.django_db
+def test_suggestion_takes_under_a_millisecond(market):
+    from marketplace.valuation import get_coefficients, refit, suggest_valuation
+
+    refit()
+    coefficients = get_coefficients()
+    bikes = [
+        SimpleNamespace(brand=brand, model='Base', year=2015 + n % 10, kms_driven=1000 * n, fuel_type='petrol')
+        for n, brand in enumerate(['Hero', 'Bajaj', 'Unknown'] * 100)
+    ]
+    start = time.perf_counter()
+    for bike in bikes:
+        suggest_valuation(bike, {'engine_condition': 4}, coefficients=coefficients)
+    assert (time.perf_counter() - start) / len(bikes) < 0.001
+
+
+@pytest.fixture
+def offer_setup(market):
+    from rest_framework.test import APIClient
+    from accounts.models import User
+    from marketplace.models import SellRequest
+    from marketplace.valuation import refit
+
+    refit()
+    seller = User.objects.create_user(username='seller', email='seller@example.com', password='x')
+    staff = APIClient()
+    staff.force_authenticate(User.objects.create_user(username='staff', email='staff@example.com', password='x', is_staff=True))
+    customer = APIClient()
+    customer.force_authenticate(seller)
+    sell_request = SellRequest.objects.create(
+        user=seller, vehicle=market('Bajaj', timezone.now().year - 4, 15000),
+        pickup_address='Sector 5', contact_number='9999999999'
+    )
+    return SimpleNamespace(staff=staff, customer=customer, sell_request=sell_request)
+
+
+@pytest.mark.django_db
+def test_staff_offer_without_market_value_is_filled_in(offer_setup):
+    from marketplace.models import PurchaseOffer
+    from marketplace.valuation import suggest_valuation
+
+    response = offer_setup.staff.post('/api/marketplace/offers/', {
+        'sell_request': offer_setup.sell_request.id, 'offer_price': '40000.00',
+    }, format='json')
+    assert response.status_code == 201, response.content
+
+    offer = PurchaseOffer.objects.get(sell_request=offer_setup.sell_request)
+    expected = suggest_valuation(offer_setup.sell_request.vehicle)
+    assert offer.market_value == expected['market_value']
+    assert offer.price_breakdown['model_version'] == 1
+    assert offer.offer_price == Decimal('40000.00')
+
+
+@pytest.mark.django_db
+def test_typed_market_value_is_kept(offer_setup):
+    from marketplace.models import PurchaseOffer
+
+    response = offer_setup.staff.post('/api/marketplace/offers/', {
+        'sell_request': offer_setup.sell_request.id, 'offer_price': '40000.00', 'market_value': '45000.00',
+    }, format='json')
+    assert response.status_code == 201, response.content
+    offer = PurchaseOffer.objects.get(sell_request=offer_setup.sell_request)
+    assert (offer.market_value, offer.price_breakdown) == (Decimal('45000.00'), {})
+
+
+@pytest.mark.django_db
+def test_suggest_endpoint(offer_setup):
+    url = '/api/marketplace/offers/suggest/'
+    response = offer_setup.staff.get(url, {'sell_request': offer_setup.sell_request.id})
+    assert response.status_code == 200
+    assert Decimal(response.json()['market_value']) > 0
+
+    assert offer_setup.staff.get(url).status_code == 400
+    assert offer_setup.staff.get(url, {'sell_request': 'abc'}).status_code == 400
+    assert offer_setup.staff.get(url, {'sell_request': offer_setup.sell_request.id + 100}).status_code == 404
+    # Valuations are staff-only, even for the seller's own request
+    assert offer_setup.customer.get(url, {'sell_request': offer_setup.sell_request.id}).status_code == 403
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     VehicleViewSet, SellRequestViewSet, InspectionReportViewSet,
-    PurchaseOfferViewSet, VehiclePurchaseViewSet, VehicleBookingViewSet,
+    PurchaseOfferViewSet, VehiclePurchaseViewSet, VehicleBookingViewSet, VehiclePriceStatsViewSet,
     email_vehicle_summary, secure_document_view
 )
 
@@ -13,6 +13,7 @@ router.register('inspections', InspectionReportViewSet, basename='inspection')
 router.register('offers', PurchaseOfferViewSet, basename='offer')
 router.register('purchases', VehiclePurchaseViewSet, basename='purchase')
 router.register('bookings', VehicleBookingViewSet, basename='booking')
+router.register('price-stats', VehiclePriceStatsViewSet, basename='price-stats')
 
 urlpatterns = [
     path('', include(router.urls)),
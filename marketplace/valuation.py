@@ -0,0 +1,327 @@
+"""
+Data-driven market value suggestions for purchase offers.
+
+Vehicle prices are modelled as log-linear in age, kilometres driven, fuel
+type, inspection condition scores and brand/model effects. The model is
+fitted with NumPy least squares over the sufficient statistics (XtX, Xty)
+of VehiclePriceEvent rows, so a refit only reads the events recorded since
+the previous one. Suggestions are computed from a small coefficient dict
+kept in the cache and in process memory, without touching the database.
+"""
+import io
+import math
+import time
+from decimal import Decimal
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .models import Vehicle, InspectionReport, VehiclePriceEvent, VehicleValuationModel
+
+CONDITION_FIELDS = (
+    'engine_condition',
+    'transmission_condition',
+    'suspension_condition',
+    'tyre_condition',
+    'brake_condition',
+    'electrical_condition',
+    'frame_condition',
+    'paint_condition',
+)
+NUMERIC_FEATURES = ('intercept', 'age', 'log_kms', 'electric') + CONDITION_FIELDS
+
+# Only listed or sold prices are treated as market observations
+TRAINING_STATUSES = (Vehicle.Status.AVAILABLE, Vehicle.Status.SOLD)
+
+# Ridge penalties: brand/model effects shrink towards zero (the overall mean)
+# when there are few samples, numeric features are left almost unpenalised
+CATEGORY_PENALTY = 2.0
+NUMERIC_PENALTY = 1e-6
+
+# Missing inspection scores are treated as average, the base price as excellent
+NEUTRAL_CONDITION = InspectionReport.Condition.AVERAGE
+BEST_CONDITION = InspectionReport.Condition.EXCELLENT
+
+COEFFICIENTS_CACHE_KEY = 'marketplace_valuation_coefficients'
+# How long a process reuses its coefficients before looking for a newer fit
+LOCAL_CACHE_SECONDS = 60
+
+_local = {'coefficients': None, 'checked_at': None}
+
+
+def brand_key(brand):
+    return (brand or '').strip().lower()
+
+
+def model_key(brand, model):
+    return f"{brand_key(brand)}|{(model or '').strip().lower()}"
+
+
+def numeric_features(year, kms_driven, fuel_type, conditions, reference_year):
+    """Numeric part of a design row, in NUMERIC_FEATURES order"""
+    age = max(reference_year - (year or reference_year), 0)
+    row = [
+        1.0,
+        float(age),
+        math.log1p((kms_driven or 0) / 1000.0),
+        1.0 if fuel_type == Vehicle.FuelType.ELECTRIC else 0.0,
+    ]
+    for field in CONDITION_FIELDS:
+        score = conditions.get(field) if conditions else None
+        row.append(float((score or NEUTRAL_CONDITION) - NEUTRAL_CONDITION))
+    return row
+
+
+class DepreciationModel:
+    """
+    Accumulates least-squares sufficient statistics and solves for coefficients.
+    Brand and brand|model indicator columns are added as new values appear.
+    """
+
+    def __init__(self, features=None, xtx=None, xty=None, yty=0.0, sample_size=0, last_event_id=0):
+        self.features = list(features or NUMERIC_FEATURES)
+        self.index = {name: i for i, name in enumerate(self.features)}
+        size = len(self.features)
+        self.xtx = xtx if xtx is not None else np.zeros((size, size))
+        self.xty = xty if xty is not None else np.zeros(size)
+        self.yty = yty
+        self.sample_size = sample_size
+        self.last_event_id = last_event_id
+
+    @classmethod
+    def from_state(cls, state):
+        arrays = np.load(io.BytesIO(bytes(state.statistics)))
+        return cls(
+            features=state.features,
+            xtx=arrays['xtx'],
+            xty=arrays['xty'],
+            yty=float(arrays['yty']),
+            sample_size=state.sample_size,
+            last_event_id=state.last_event_id
+        )
+
+    def serialize_statistics(self):
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, xtx=self.xtx, xty=self.xty, yty=np.float64(self.yty))
+        return buffer.getvalue()
+
+    def _column(self, name):
+        index = self.index.get(name)
+        if index is None:
+            index = len(self.features)
+            self.features.append(name)
+            self.index[name] = index
+        return index
+
+    def _grow(self):
+        """Pad the statistics with zeros for newly added indicator columns"""
+        size = len(self.features)
+        grow_by = size - self.xty.shape[0]
+        if grow_by > 0:
+            self.xtx = np.pad(self.xtx, ((0, grow_by), (0, grow_by)))
+            self.xty = np.pad(self.xty, (0, grow_by))
+
+    def add_observations(self, observations):
+        """
+        Fold a batch of (numeric_row, brand, brand|model, price) observations
+        into the statistics. Returns the number of observations added.
+        """
+        if not observations:
+            return 0
+        columns = np.array([
+            (self._column(f"brand:{brand}"), self._column(f"model:{model}"))
+            for _, brand, model, _ in observations
+        ])
+        self._grow()
+
+        X = np.zeros((len(observations), len(self.features)))
+        X[:, :len(NUMERIC_FEATURES)] = [numeric for numeric, _, _, _ in observations]
+        rows = np.arange(len(observations))
+        X[rows, columns[:, 0]] = 1.0
+        X[rows, columns[:, 1]] = 1.0
+        y = np.log([float(price) for _, _, _, price in observations])
+
+        self.xtx += X.T @ X
+        self.xty += X.T @ y
+        self.yty += float(y @ y)
+        self.sample_size += len(observations)
+        return len(observations)
+
+    def solve(self):
+        """Solve the ridge-regularised normal equations and return a coefficient dict"""
+        penalty = np.full(len(self.features), CATEGORY_PENALTY)
+        penalty[:len(NUMERIC_FEATURES)] = NUMERIC_PENALTY
+        penalty[0] = 0.0
+        beta = np.linalg.lstsq(self.xtx + np.diag(penalty), self.xty, rcond=None)[0]
+
+        residual = self.yty - 2 * beta @ self.xty + beta @ self.xtx @ beta
+        coefficients = {'numeric': {}, 'brand': {}, 'model': {}}
+        for name, value in zip(self.features, beta.tolist()):
+            if name.startswith('brand:'):
+                coefficients['brand'][name[len('brand:'):]] = value
+            elif name.startswith('model:'):
+                coefficients['model'][name[len('model:'):]] = value
+            else:
+                coefficients['numeric'][name] = value
+        coefficients['sample_size'] = self.sample_size
+        coefficients['rmse_log'] = math.sqrt(max(residual, 0.0) / self.sample_size)
+        return coefficients
+
+
+def _training_events(after_event_id):
+    condition_lookups = [
+        f'vehicle__sell_request__inspection_report__{field}' for field in CONDITION_FIELDS
+    ]
+    return (
+        VehiclePriceEvent.objects
+        .filter(
+            id__gt=after_event_id,
+            status__in=TRAINING_STATUSES,
+            price__gt=0,
+            vehicle__isnull=False
+        )
+        .order_by('id')
+        .values_list(
+            'id', 'price', 'brand', 'model', 'year', 'recorded_at',
+            'vehicle__kms_driven', 'vehicle__fuel_type', *condition_lookups
+        )
+    )
+
+
+def _observation(row):
+    _, price, brand, model, year, recorded_at, kms_driven, fuel_type = row[:8]
+    conditions = dict(zip(CONDITION_FIELDS, row[8:]))
+    return (
+        numeric_features(year, kms_driven, fuel_type, conditions, recorded_at.year),
+        brand_key(brand),
+        model_key(brand, model),
+        price
+    )
+
+
+@transaction.atomic
+def refit(full=False, chunk_size=5000):
+    """
+    Fold new price events into the stored statistics and re-solve.
+    With full=True the statistics are rebuilt from every event.
+    Returns (state, added_observations); state is None when there is no data.
+    """
+    state = VehicleValuationModel.objects.select_for_update().order_by('-version').first()
+    if state is None or full:
+        model = DepreciationModel()
+    else:
+        model = DepreciationModel.from_state(state)
+
+    added = 0
+    batch = []
+    last_event_id = model.last_event_id
+    for row in _training_events(model.last_event_id).iterator(chunk_size=chunk_size):
+        batch.append(_observation(row))
+        last_event_id = row[0]
+        if len(batch) >= chunk_size:
+            added += model.add_observations(batch)
+            batch = []
+    added += model.add_observations(batch)
+
+    if model.sample_size == 0:
+        return state, 0
+    if state is not None and not full and added == 0:
+        return state, 0
+
+    if state is None:
+        state = VehicleValuationModel()
+    coefficients = model.solve()
+    state.version += 1
+    coefficients['version'] = state.version
+    state.sample_size = model.sample_size
+    state.last_event_id = last_event_id
+    state.features = model.features
+    state.statistics = model.serialize_statistics()
+    state.coefficients = coefficients
+    state.fitted_at = timezone.now()
+    state.save()
+
+    transaction.on_commit(lambda: cache.set(COEFFICIENTS_CACHE_KEY, coefficients, None))
+    return state, added
+
+
+def get_coefficients():
+    """
+    Return the current coefficient dict, or None if no model has been fitted.
+    Kept in process memory and re-validated against the cache periodically.
+    """
+    now = time.monotonic()
+    if _local['checked_at'] is not None and now - _local['checked_at'] < LOCAL_CACHE_SECONDS:
+        return _local['coefficients']
+
+    coefficients = cache.get(COEFFICIENTS_CACHE_KEY)
+    if coefficients is None:
+        state = VehicleValuationModel.objects.only('coefficients').order_by('-version').first()
+        coefficients = state.coefficients if state is not None and state.coefficients else None
+        if coefficients is not None:
+            cache.set(COEFFICIENTS_CACHE_KEY, coefficients, None)
+
+    _local['coefficients'] = coefficients
+    _local['checked_at'] = now
+    return coefficients
+
+
+def suggest_valuation(vehicle, conditions=None, coefficients=None, reference_year=None):
+    """
+    Suggest a market value and price breakdown for a vehicle.
+
+    conditions is an InspectionReport or a dict of condition scores; missing
+    scores count as average. The breakdown starts from the value of the same
+    vehicle in excellent condition and attributes the difference to each
+    inspected component. Returns None when no model has been fitted yet.
+    """
+    coefficients = coefficients or get_coefficients()
+    if coefficients is None:
+        return None
+    if conditions is not None and not isinstance(conditions, dict):
+        conditions = {field: getattr(conditions, field) for field in CONDITION_FIELDS}
+
+    numeric = coefficients['numeric']
+    row = numeric_features(
+        vehicle.year,
+        vehicle.kms_driven,
+        vehicle.fuel_type,
+        conditions,
+        reference_year or timezone.now().year
+    )
+    log_value = (
+        coefficients['brand'].get(brand_key(vehicle.brand), 0.0)
+        + coefficients['model'].get(model_key(vehicle.brand, vehicle.model), 0.0)
+    )
+    for name, value in zip(NUMERIC_FEATURES[:4], row[:4]):
+        log_value += numeric[name] * value
+
+    # Base price assumes every component is in excellent condition
+    best = BEST_CONDITION - NEUTRAL_CONDITION
+    contributions = {}
+    for field, value in zip(CONDITION_FIELDS, row[4:]):
+        log_value += numeric[field] * best
+        contributions[field] = numeric[field] * (value - best)
+
+    base_price = math.exp(log_value)
+    final_price = math.exp(log_value + sum(contributions.values()))
+
+    # Split the multiplicative condition effect additively, in proportion to
+    # each component's share of the log adjustment, so the parts sum exactly
+    total_log = sum(contributions.values())
+    deductions = {}
+    for field, contribution in contributions.items():
+        share = contribution / total_log if total_log else 0.0
+        amount = Decimal(str(round((final_price - base_price) * share, 2)))
+        deductions[field.replace('_condition', '')] = float(amount) + 0.0  # avoid -0.0
+
+    base = Decimal(str(round(base_price, 2)))
+    market_value = base + sum(Decimal(str(amount)) for amount in deductions.values())
+    return {
+        'market_value': market_value.quantize(Decimal('0.01')),
+        'price_breakdown': {
+            'base_price': float(base),
+            'deductions': deductions,
+            'model_version': coefficients.get('version'),
+        }
+    }
@@ -2,19 +2,24 @@ from decimal import Decimal
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated,AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
+from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from authback.permissions import IsOwnerOrStaff, IsStaffOrReadOnly
-from .models import Vehicle, SellRequest, InspectionReport, PurchaseOffer, VehiclePurchase, VehicleBooking
+from .models import Vehicle, SellRequest, InspectionReport, PurchaseOffer, VehiclePurchase, VehicleBooking, VehiclePriceStats
 from .serializers import (
     VehicleSerializer, SellRequestSerializer, 
     InspectionReportSerializer, PurchaseOfferSerializer,
-    VehiclePurchaseSerializer, VehicleBookingSerializer
+    VehiclePurchaseSerializer, VehicleBookingSerializer,
+    VehicleBulkUpdateSerializer, VehiclePriceStatsSerializer
 )
+from .services import VehicleBulkUpdateService, VEHICLE_LISTING_CACHE_NAMESPACE, PRICE_STATS_CACHE_NAMESPACE
+from .valuation import suggest_valuation
+from tools.cache_utils import cache_api_response, CACHE_TIMES
 from rest_framework.exceptions import PermissionDenied
 from django.contrib.auth import get_user_model
 from .models import Notification
@@ -96,6 +101,45 @@ class VehicleViewSet(viewsets.ModelViewSet):
         
         return queryset
 
+    @cache_api_response(
+        timeout=CACHE_TIMES['DYNAMIC'],
+        key_prefix="marketplace_vehicles",
+        namespace=VEHICLE_LISTING_CACHE_NAMESPACE
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser], url_path='bulk-update')
+    def bulk_update(self, request):
+        """
+        Staff-only bulk repricing.
+        Accepts either {"updates": [{"id", "price", "expected_price", "status"}, ...]}
+        or {"filter": {...}, "adjust_percent": -5, "adjust_fields": ["price"], "status": "..."}
+        and applies it in a single transaction.
+        """
+        serializer = VehicleBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        if 'updates' in data:
+            updated_ids, not_found = VehicleBulkUpdateService.apply_updates(data['updates'])
+            return Response({
+                "updated": len(updated_ids),
+                "updated_ids": updated_ids,
+                "not_found": not_found
+            })
+
+        try:
+            updated = VehicleBulkUpdateService.apply_adjustment(
+                Vehicle.objects.filter(**data['filter']),
+                percent=data.get('adjust_percent'),
+                fields=sorted(data['adjust_fields']),
+                status=data.get('status')
+            )
+        except ValidationError as e:
+            return Response({"adjust_percent": e.messages}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"updated": updated})
+
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def check_registration_number(self, request):
         """
@@ -282,6 +326,11 @@ class VehicleViewSet(viewsets.ModelViewSet):
         )
 
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    @cache_api_response(
+        timeout=CACHE_TIMES['DYNAMIC'],
+        key_prefix="marketplace_public_vehicles",
+        namespace=VEHICLE_LISTING_CACHE_NAMESPACE
+    )
     def public_list(self, request):
         """
         Public endpoint to list available vehicles without requiring authentication.
@@ -615,6 +664,27 @@ class InspectionReportViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("Only staff can create inspection reports")
         serializer.save(inspector=self.request.user)
 
+class VehiclePriceStatsViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Read-only access to per (brand, model, year) price percentiles.
+    Served straight from the VehiclePriceStats rollup, never from raw events.
+    """
+    queryset = VehiclePriceStats.objects.all()
+    serializer_class = VehiclePriceStatsSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = {
+        'brand': ['exact', 'iexact'],
+        'model': ['exact', 'iexact'],
+        'year': ['exact', 'gte', 'lte'],
+    }
+    ordering_fields = ['year', 'median_price', 'sample_size']
+    ordering = ['brand', 'model', '-year']
+
+    @cache_api_response(timeout=CACHE_TIMES['LOOKUP'], key_prefix="marketplace_price_stats", namespace=PRICE_STATS_CACHE_NAMESPACE)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 class PurchaseOfferViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing purchase offers.
@@ -625,7 +695,7 @@ class PurchaseOfferViewSet(viewsets.ModelViewSet):
     serializer_class = PurchaseOfferSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrStaff]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['accepted', 'is_negotiable', 'sell_request__status']
+    filterset_fields = ['status', 'is_negotiable', 'sell_request__status']
     ordering_fields = ['created_at', 'offer_price', 'valid_until']
     ordering = ['-created_at']
 
@@ -633,18 +703,58 @@ class PurchaseOfferViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_staff:
             return self.queryset
-        return self.queryset.filter(
-            Q(sell_request__user=user) | 
-            Q(created_by=user)
-        )
+        return self.queryset.filter(sell_request__user=user)
 
     def perform_create(self, serializer):
         """
-        Create a new purchase offer and associate it with the current user
+        Create a new staff purchase offer, filling in a suggested market value
         """
         if not self.request.user.is_staff:
             raise PermissionDenied("Only staff can create purchase offers")
-        serializer.save(created_by=self.request.user)
+
+        # Fill in the data-driven valuation when staff did not type one in
+        extra = {}
+        sell_request = serializer.validated_data.get('sell_request')
+        if sell_request is not None and not serializer.validated_data.get('market_value'):
+            suggestion = self._suggest_for(sell_request)
+            if suggestion is not None:
+                extra['market_value'] = suggestion['market_value']
+                if not serializer.validated_data.get('price_breakdown'):
+                    extra['price_breakdown'] = suggestion['price_breakdown']
+        serializer.save(**extra)
+
+    @staticmethod
+    def _suggest_for(sell_request):
+        if sell_request.vehicle is None:
+            return None
+        inspection = InspectionReport.objects.filter(sell_request=sell_request).first()
+        return suggest_valuation(sell_request.vehicle, inspection)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def suggest(self, request):
+        """Suggest market_value and price_breakdown for ?sell_request=<id>"""
+        sell_request_id = request.query_params.get('sell_request', '')
+        if not sell_request_id.isdigit():
+            return Response(
+                {"error": "sell_request must be a sell request id"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        sell_requests = SellRequest.objects.select_related('vehicle')
+        if not request.user.is_staff:
+            sell_requests = sell_requests.filter(user=request.user)
+        sell_request = get_object_or_404(sell_requests, pk=int(sell_request_id))
+        if sell_request.vehicle is None:
+            return Response(
+                {"error": "Sell request has no vehicle"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        suggestion = self._suggest_for(sell_request)
+        if suggestion is None:
+            return Response(
+                {"error": "Valuation model has not been fitted yet"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        return Response(suggestion)
 
     @action(detail=True, methods=['post'])
     def counter_offer(self, request, pk=None):
@@ -7,7 +7,8 @@ from django.utils.html import format_html
 from .models import (
     Feature, ServiceCategory, Service, ServicePrice, Cart, CartItem,
     ServiceRequest, FieldStaff, ServiceRequestResponse, LiveLocation,
-    DistancePricingRule, PricingPlan, PricingPlanFeature, AdditionalService
+    DistancePricingRule, PricingPlan, PricingPlanFeature, AdditionalService,
+    TrackSummary, DispatchOffer, ServiceCenter, ServiceArea, DashboardCounters
 )
 
 @admin.register(Feature)
@@ -51,11 +52,35 @@ class CartItemAdmin(admin.ModelAdmin):
     list_display = ('cart', 'service', 'quantity')
     list_filter = ('cart', 'service')
 
+@admin.register(ServiceCenter)
+class ServiceCenterAdmin(admin.ModelAdmin):
+    list_display = ('name', 'latitude', 'longitude', 'is_active', 'created_at')
+    list_editable = ('is_active',)
+    list_filter = ('is_active',)
+    search_fields = ('name', 'address')
+
+@admin.register(ServiceArea)
+class ServiceAreaAdmin(admin.ModelAdmin):
+    list_display = ('name', 'service_center', 'is_active', 'created_at')
+    list_editable = ('is_active',)
+    list_filter = ('is_active', 'service_center')
+    search_fields = ('name',)
+
+@admin.register(DashboardCounters)
+class DashboardCountersAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'users_total', 'service_requests_total', 'service_requests_pending', 'reconciled_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 @admin.register(DistancePricingRule)
 class DistancePricingRuleAdmin(admin.ModelAdmin):
-    list_display = ('id', 'service_center_latitude', 'service_center_longitude', 'free_radius_km', 'per_km_charge', 'base_charge', 'is_active')
+    list_display = ('id', 'service_center', 'service_center_latitude', 'service_center_longitude', 'free_radius_km', 'per_km_charge', 'base_charge', 'is_active')
     list_editable = ('service_center_latitude', 'service_center_longitude', 'free_radius_km', 'per_km_charge', 'base_charge', 'is_active')
-    list_filter = ('is_active',)
+    list_filter = ('is_active', 'service_center')
 
 @admin.register(PricingPlan)
 class PricingPlanAdmin(admin.ModelAdmin):
@@ -161,6 +186,21 @@ class LiveLocationAdmin(admin.ModelAdmin):
     list_filter = ('field_staff', 'timestamp')
     date_hierarchy = 'timestamp'
 
+@admin.register(TrackSummary)
+class TrackSummaryAdmin(admin.ModelAdmin):
+    list_display = (
+        'service_request', 'field_staff', 'distance_km', 'duration_seconds',
+        'average_speed_kmh', 'point_count', 'compacted_point_count', 'compacted_at'
+    )
+    list_select_related = ('service_request', 'field_staff')
+    readonly_fields = ('computed_at', 'compacted_at', 'compacted_point_count')
+
+@admin.register(DispatchOffer)
+class DispatchOfferAdmin(admin.ModelAdmin):
+    list_display = ('service_request', 'field_staff', 'wave', 'score', 'distance_km', 'offered_at', 'accepted')
+    list_filter = ('accepted', 'wave')
+    list_select_related = ('service_request', 'field_staff')
+
 @admin.register(FieldStaff)
 class FieldStaffAdmin(admin.ModelAdmin):
     list_display = ('get_username', 'get_email', 'get_phone')
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RepairingServiceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'repairing_service'
+
+    def ready(self):
+        import repairing_service.signals  # Import signals when app is ready
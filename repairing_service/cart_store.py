@@ -0,0 +1,384 @@
+"""
+Cache-backed store for active carts.
+
+Each active cart is kept in the cache as one compact dict holding its items
+(item id, service id, quantity, service name and unit price) together with
+precomputed totals, so cart reads and edits never hit the database.
+
+- Carts of signed-in users are backed by a Cart row. Edits mark them dirty
+  and a background thread writes the dirty carts to Cart/CartItem every
+  CART_STORE_FLUSH_INTERVAL seconds (write-behind).
+- Anonymous carts only exist in the cache. Their ids are allocated from a
+  cache counter starting at ANONYMOUS_CART_ID_BASE, far above any database
+  id, and they are written to the database only when they convert at checkout.
+
+Item ids are handles into the cached cart. Items loaded from the database
+keep their CartItem id; items added in the cache get ids from a counter
+starting at CART_ITEM_ID_BASE. The database rows are synced by service,
+which is unique per cart.
+"""
+import atexit
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+from .models import Cart, CartItem
+
+logger = logging.getLogger(__name__)
+
+ANONYMOUS_CART_ID_BASE = 10 ** 12
+CART_ITEM_ID_BASE = 10 ** 12
+
+# Positions in a cached item list
+ITEM_ID, SERVICE_ID, QUANTITY, NAME, PRICE = range(5)
+
+
+class CartBusy(APIException):
+    """The cart's lock could not be taken; the client should retry"""
+    status_code = 409
+    default_detail = 'The cart is being updated by another request, please retry.'
+    default_code = 'cart_busy'
+
+
+def is_anonymous_cart(cart_id):
+    return int(cart_id) >= ANONYMOUS_CART_ID_BASE
+
+
+def _cart_key(cart_id):
+    return f'cart_store_{cart_id}'
+
+
+def _item_key(item_id):
+    return f'cart_store_item_{item_id}'
+
+
+def _next_id(counter, base):
+    key = f'cart_store_seq_{counter}'
+    cache.add(key, base, None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The counter was evicted between add and incr
+        cache.add(key, base, None)
+        return cache.incr(key)
+
+
+def _with_totals(state):
+    total = sum((Decimal(item[PRICE]) * item[QUANTITY] for item in state['items']), Decimal('0'))
+    state['total_amount'] = str(total)
+    state['total_items'] = len(state['items'])
+    state['total_quantity'] = sum(item[QUANTITY] for item in state['items'])
+    return state
+
+
+class CartStore:
+    def __init__(self, timeout=60 * 60 * 24 * 7, flush_interval=5.0):
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # Cache access
+
+    def _save(self, state):
+        cache.set_many(
+            {_cart_key(state['id']): state, **{_item_key(item[ITEM_ID]): state['id'] for item in state['items']}},
+            self.timeout
+        )
+
+    @contextmanager
+    def _locked(self, cart_id, wait=2.0, timeout=5):
+        """
+        Serialize read-modify-write cycles on one cart across processes.
+        Raises CartBusy if another holder keeps the lock past wait seconds,
+        or right away if the cache refuses the lock without anyone holding it
+        (the cache is unreachable).
+        """
+        key = f'{_cart_key(cart_id)}_lock'
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + wait
+        unheld = 0
+        while not cache.add(key, token, timeout):
+            if cache.get(key) is None:
+                # Released between the two calls; twice in a row means no cache
+                unheld += 1
+                if unheld > 1:
+                    raise CartBusy()
+            elif time.monotonic() >= deadline:
+                raise CartBusy()
+            else:
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            # Past the timeout the lock may belong to someone else now
+            if cache.get(key) == token:
+                cache.delete(key)
+
+    def _load(self, cart_id):
+        """Read a database cart into the cache"""
+        cart = Cart.objects.filter(id=cart_id).values('id', 'user_id', 'status', 'created_at', 'modified_at').first()
+        if cart is None:
+            return None
+        items = CartItem.objects.filter(cart_id=cart_id).order_by('id').values_list(
+            'id', 'service_id', 'quantity', 'service__name', 'service__base_price'
+        )
+        state = _with_totals({
+            'id': cart['id'],
+            'user': cart['user_id'],
+            'status': cart['status'],
+            'created_at': cart['created_at'],
+            'modified_at': cart['modified_at'],
+            'items': [[item_id, service_id, quantity, name, str(price)] for item_id, service_id, quantity, name, price in items],
+        })
+        self._save(state)
+        return state
+
+    def get(self, cart_id):
+        """Cached state of a cart, loading it from the database on a miss; None if it does not exist"""
+        cart_id = int(cart_id)
+        state = cache.get(_cart_key(cart_id))
+        if state is None and not is_anonymous_cart(cart_id):
+            state = self._load(cart_id)
+        return state
+
+    def cart_of_item(self, item_id):
+        cart_id = cache.get(_item_key(item_id))
+        if cart_id is None and int(item_id) < CART_ITEM_ID_BASE:
+            cart_id = CartItem.objects.filter(id=item_id).values_list('cart_id', flat=True).first()
+        return cart_id
+
+    # Cart operations
+
+    def create(self, user=None):
+        """New empty cart; anonymous carts get a cache-only id"""
+        now = timezone.now()
+        if user is not None:
+            cart = Cart.objects.create(user=user, status='active')
+            cart_id, created_at = cart.id, cart.created_at
+        else:
+            cart_id, created_at = _next_id('cart', ANONYMOUS_CART_ID_BASE), now
+        state = _with_totals({
+            'id': cart_id,
+            'user': user.id if user is not None else None,
+            'status': 'active',
+            'created_at': created_at,
+            'modified_at': now,
+            'items': [],
+        })
+        self._save(state)
+        return state
+
+    def _modify(self, cart_id, change):
+        """Apply change(state) to a cart under its lock and mark it dirty. Returns (state, change result)."""
+        with self._locked(cart_id):
+            state = self.get(cart_id)
+            if state is None:
+                return None, None
+            result = change(state)
+            state['modified_at'] = timezone.now()
+            self._save(_with_totals(state))
+        if not is_anonymous_cart(state['id']):
+            self._mark_dirty(state['id'])
+        return state, result
+
+    def add_item(self, cart_id, service, quantity):
+        """Add quantity of a service, merging with an existing line. Returns (state, item id)."""
+        def change(state):
+            for item in state['items']:
+                if item[SERVICE_ID] == service.id:
+                    item[QUANTITY] += quantity
+                    return item[ITEM_ID]
+            item_id = _next_id('item', CART_ITEM_ID_BASE)
+            state['items'].append([item_id, service.id, quantity, service.name, str(service.base_price)])
+            return item_id
+        return self._modify(cart_id, change)
+
+    def update_item(self, cart_id, item_id, quantity=None, service=None):
+        """
+        Change an item's quantity and/or service; a quantity of 0 or less
+        removes it. Returns (state, True) or (state, False) when the item is
+        not in the cart.
+        """
+        def change(state):
+            for index, item in enumerate(state['items']):
+                if item[ITEM_ID] != int(item_id):
+                    continue
+                if quantity is not None and quantity <= 0:
+                    del state['items'][index]
+                    return True
+                if quantity is not None:
+                    item[QUANTITY] = quantity
+                if service is not None:
+                    item[SERVICE_ID], item[NAME], item[PRICE] = service.id, service.name, str(service.base_price)
+                return True
+            return False
+        return self._modify(cart_id, change)
+
+    def remove_item(self, item_id):
+        """Remove an item wherever it is. Returns True if it was found."""
+        cart_id = self.cart_of_item(item_id)
+        if cart_id is None:
+            return False
+        _, removed = self.update_item(cart_id, item_id, quantity=0)
+        if removed:
+            cache.delete(_item_key(item_id))
+        return bool(removed)
+
+    def clear(self, cart_id):
+        state, _ = self._modify(cart_id, lambda state: state['items'].clear())
+        return state
+
+    def discard(self, cart_id):
+        """Forget a cart, e.g. after checkout deleted it"""
+        state = cache.get(_cart_key(cart_id))
+        cache.delete_many([_cart_key(cart_id)] + [_item_key(item[ITEM_ID]) for item in (state or {}).get('items', [])])
+        with self._lock:
+            self._dirty.discard(int(cart_id))
+
+    def carts_for_user(self, user):
+        """States of a user's database carts, with one cache round trip for the cached ones"""
+        cart_ids = list(Cart.objects.filter(user=user).values_list('id', flat=True))
+        cached = cache.get_many([_cart_key(cart_id) for cart_id in cart_ids])
+        states = [cached.get(_cart_key(cart_id)) or self._load(cart_id) for cart_id in cart_ids]
+        return [state for state in states if state is not None]
+
+    # Rendering
+
+    @staticmethod
+    def render(state):
+        """Cart payload in the shape of CartSerializer, built from the cache only"""
+        return {
+            'id': state['id'],
+            'user': state['user'],
+            'items': [
+                {
+                    'id': item[ITEM_ID],
+                    'cart': state['id'],
+                    'service': item[SERVICE_ID],
+                    'service_id': item[SERVICE_ID],
+                    'service_name': item[NAME],
+                    'quantity': item[QUANTITY],
+                    'service_price': item[PRICE],
+                    'total_price': str(Decimal(item[PRICE]) * item[QUANTITY])
+                }
+                for item in state['items']
+            ],
+            'created_at': state['created_at'],
+            'modified_at': state['modified_at'],
+            'status': state['status'],
+            'total_items': state['total_items'],
+            'total_quantity': state['total_quantity'],
+            'total_amount': state['total_amount'],
+        }
+
+    # Persistence
+
+    def persist(self, cart_id, user=None):
+        """
+        Write a cart to Cart/CartItem now and return its database id, or None
+        if the cart does not exist. An anonymous cart converts into a new
+        Cart row owned by user and moves to that id in the cache.
+        """
+        with self._locked(cart_id):
+            state = self.get(cart_id)
+            if state is None:
+                return None
+            with transaction.atomic():
+                if is_anonymous_cart(state['id']):
+                    cart = Cart.objects.create(user=user, status=state['status'])
+                    old_id = state['id']
+                    state['id'], state['user'] = cart.id, user.id if user is not None else None
+                elif not Cart.objects.select_for_update().filter(id=state['id']).exists():
+                    # Checked out or deleted elsewhere
+                    self.discard(state['id'])
+                    return None
+                else:
+                    old_id = None
+                    Cart.objects.filter(id=state['id']).update(modified_at=state['modified_at'])
+                self._write_items(state)
+            if old_id is not None:
+                cache.delete(_cart_key(old_id))
+                self._save(state)
+        with self._lock:
+            self._dirty.discard(state['id'])
+        return state['id']
+
+    @staticmethod
+    def _write_items(state):
+        wanted = {item[SERVICE_ID]: item[QUANTITY] for item in state['items']}
+        existing = {
+            service_id: (item_id, quantity)
+            for item_id, service_id, quantity in CartItem.objects.filter(cart_id=state['id']).values_list('id', 'service_id', 'quantity')
+        }
+        CartItem.objects.filter(cart_id=state['id']).exclude(service_id__in=wanted).delete()
+        CartItem.objects.bulk_create([
+            CartItem(cart_id=state['id'], service_id=service_id, quantity=quantity)
+            for service_id, quantity in wanted.items()
+            if service_id not in existing
+        ])
+        CartItem.objects.bulk_update([
+            CartItem(id=existing[service_id][0], quantity=quantity)
+            for service_id, quantity in wanted.items()
+            if service_id in existing and existing[service_id][1] != quantity
+        ], ['quantity'])
+
+    def _mark_dirty(self, cart_id):
+        with self._lock:
+            self._dirty.add(cart_id)
+        self._ensure_worker()
+
+    def flush(self):
+        """Persist every dirty cart. Returns the number written."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        written = 0
+        for cart_id in dirty:
+            try:
+                if self.persist(cart_id) is not None:
+                    written += 1
+            except Exception:
+                logger.exception("Failed to persist cart %s, will retry", cart_id)
+                with self._lock:
+                    self._dirty.add(cart_id)
+        return written
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='cart-store-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            if self._dirty:
+                close_old_connections()
+                self.flush()
+                close_old_connections()
+
+    def stop(self):
+        """Stop the background writer and persist whatever is dirty"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+
+
+cart_store = CartStore(
+    timeout=getattr(settings, 'CART_STORE_TIMEOUT', 60 * 60 * 24 * 7),
+    flush_interval=getattr(settings, 'CART_STORE_FLUSH_INTERVAL', 5.0)
+)
+atexit.register(cart_store.stop)
@@ -0,0 +1,136 @@
+"""
+Versioned snapshot of the service catalog.
+
+The booking UI needs categories, services with their features, vehicles and
+per-model price overrides. Instead of one request per category, the whole
+tree is built once into a gzip-compressed JSON blob whose SHA-256 prefix is
+its ETag. The blob is cached under the 'service_catalog' namespace version
+and each process also keeps the last one it served. Catalog writes bump the
+namespace version (see repairing_service.signals) and the next read
+rebuilds it.
+"""
+import gzip
+import hashlib
+import json
+import threading
+from collections import namedtuple
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from tools.cache_utils import CACHE_TIMES, get_namespace_version, invalidate_namespace
+from vehicle.models import Manufacturer, VehicleModel, VehicleType
+from .models import Service, ServiceCategory, ServicePrice
+
+NAMESPACE = 'service_catalog'
+
+Snapshot = namedtuple('Snapshot', ['version', 'etag', 'body'])
+
+_local = None
+_lock = threading.Lock()
+
+
+def _image_url(image):
+    return image.url if image else None
+
+
+def _pairs(through, owner, target):
+    grouped = {}
+    for owner_id, target_id in through.objects.order_by(owner, target).values_list(owner, target):
+        grouped.setdefault(owner_id, []).append(target_id)
+    return grouped
+
+
+def build_catalog():
+    """The catalog tree as plain data"""
+    features = {}
+    for service_id, feature_id, name in (
+        Service.features.through.objects
+        .order_by('service_id', 'feature_id')
+        .values_list('service_id', 'feature_id', 'feature__name')
+    ):
+        features.setdefault(service_id, []).append({'id': feature_id, 'name': name})
+    manufacturers = _pairs(Service.manufacturers.through, 'service_id', 'manufacturer_id')
+    vehicle_models = _pairs(Service.vehicles_models.through, 'service_id', 'vehiclemodel_id')
+
+    services = {}
+    for service in Service.objects.order_by('id'):
+        services.setdefault(service.category_id, []).append({
+            'id': service.id,
+            'name': service.name,
+            'slug': service.slug,
+            'description': service.description,
+            'base_price': service.base_price,
+            'duration': service.duration,
+            'warranty': service.warranty,
+            'recommended': service.recommended,
+            'manufacturers': manufacturers.get(service.id, []),
+            'vehicles_models': vehicle_models.get(service.id, []),
+            'features': features.get(service.id, []),
+            'image_url': _image_url(service.image),
+        })
+
+    price_overrides = {}
+    for vehicle_model_id, service_id, price in (
+        ServicePrice.objects
+        .filter(vehicle_model__isnull=False, service__isnull=False)
+        .order_by('vehicle_model_id', 'service_id')
+        .values_list('vehicle_model_id', 'service_id', 'price')
+    ):
+        price_overrides.setdefault(str(vehicle_model_id), {})[str(service_id)] = price
+
+    return {
+        'categories': [
+            {
+                'uuid': category.uuid,
+                'name': category.name,
+                'slug': category.slug,
+                'description': category.description,
+                'image_url': _image_url(category.image),
+                'services': services.get(category.uuid, []),
+            }
+            for category in ServiceCategory.objects.order_by('name', 'uuid')
+        ],
+        'vehicle_types': list(VehicleType.objects.order_by('id').values('id', 'name')),
+        'manufacturers': [
+            {'id': manufacturer.id, 'name': manufacturer.name, 'image_url': _image_url(manufacturer.image)}
+            for manufacturer in Manufacturer.objects.only('id', 'name', 'image').order_by('id')
+        ],
+        'vehicle_models': list(
+            VehicleModel.objects.order_by('id').values('id', 'name', 'manufacturer_id', 'vehicle_type_id')
+        ),
+        'price_overrides': price_overrides,
+    }
+
+
+def _build(version):
+    payload = json.dumps(build_catalog(), cls=DjangoJSONEncoder, separators=(',', ':'), sort_keys=True).encode()
+    etag = hashlib.sha256(payload).hexdigest()[:32]
+    # mtime=0 keeps the compressed bytes identical for identical catalogs
+    return Snapshot(version, etag, gzip.compress(payload, compresslevel=9, mtime=0))
+
+
+def catalog_snapshot():
+    """Current Snapshot(version, etag, gzip body), rebuilt only after catalog writes"""
+    global _local
+    version = get_namespace_version(NAMESPACE)
+    snapshot = _local
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _lock:
+        if _local is not None and _local.version == version:
+            return _local
+        key = f'service_catalog_snapshot_v{version}'
+        cached = cache.get(key)
+        if cached is not None:
+            snapshot = Snapshot(*cached)
+        else:
+            snapshot = _build(version)
+            cache.set(key, tuple(snapshot), CACHE_TIMES['STATIC'])
+        _local = snapshot
+    return snapshot
+
+
+def invalidate_catalog():
+    global _local
+    invalidate_namespace(NAMESPACE)
+    _local = None
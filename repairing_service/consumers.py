@@ -1,22 +1,58 @@
+import asyncio
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
-from .models import FieldStaff, ServiceRequest, LiveLocation
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from .models import DispatchOffer, FieldStaff, ServiceRequest
+from .location_ingest import location_buffer
+from .ping_control import ACCEPTED, DROPPED, PingGate, ping_counters
+from .positions import remember_position
 from django.utils import timezone
 
 User = get_user_model()
 
+MECHANIC_EMAIL_DOMAIN = '@field.repairmybike.in'
+
+# Requests a mechanic can still act on
+OPEN_STATUSES = (
+    ServiceRequest.STATUS_PENDING,
+    ServiceRequest.STATUS_CONFIRMED,
+    ServiceRequest.STATUS_IN_PROGRESS,
+)
+
+
+def invalidate_assignments(user_id):
+    """Make the mechanic's open connections reload their record and authorized requests"""
+    async_to_sync(get_channel_layer().group_send)(f"mechanic_{user_id}", {"type": "assignments.changed"})
+
+
 class ServiceRequestConsumer(AsyncWebsocketConsumer):
+    """
+    Websocket of a customer or a mechanic. The mechanic's FieldStaff record
+    is resolved once on connect, and the service requests they may act on
+    are loaded on first use and kept for the connection. Offers and
+    cancellations pushed to the mechanic update that set; any other change
+    to their assignments arrives as an 'assignments.changed' event (see
+    invalidate_assignments) and makes the connection load it again.
+    """
+
     async def connect(self):
         self.user = self.scope["user"]
         if not self.user.is_authenticated:
             await self.close()
             return
 
+        self.field_staff = None
+        self.authorized_request_ids = None
+        self.ping_gate = PingGate()
+        self.pending_ping = None
+        self.pending_ping_task = None
         # Join appropriate group based on user type
-        if self.user.email.endswith('@field.repairmybike.in'):
+        if self.user.email.endswith(MECHANIC_EMAIL_DOMAIN):
             self.group_name = f"mechanic_{self.user.id}"
+            self.field_staff = await self.load_field_staff()
         else:
             self.group_name = f"customer_{self.user.id}"
 
@@ -27,16 +63,27 @@ class ServiceRequestConsumer(AsyncWebsocketConsumer):
         await self.accept()
 
     async def disconnect(self, close_code):
+        if not hasattr(self, 'group_name'):
+            return
         await self.channel_layer.group_discard(
             self.group_name,
             self.channel_name
         )
+        if self.pending_ping_task is not None:
+            self.pending_ping_task.cancel()
+        # Don't leave a disconnected mechanic's last pings waiting in the buffer
+        if self.field_staff is not None:
+            await database_sync_to_async(location_buffer.flush)()
+
+    @property
+    def is_mechanic(self):
+        return self.field_staff is not None
 
     async def receive(self, text_data):
         data = json.loads(text_data)
         message_type = data.get('type')
 
-        if message_type == 'location_update' and self.user.email.endswith('@field.repairmybike.in'):
+        if message_type == 'location_update' and self.is_mechanic:
             await self.handle_location_update(data)
         elif message_type == 'service_response':
             await self.handle_service_response(data)
@@ -45,13 +92,53 @@ class ServiceRequestConsumer(AsyncWebsocketConsumer):
         elif message_type == 'complete_service':
             await self.handle_complete_service(data)
 
+    async def is_authorized(self, service_request_id):
+        """Whether the mechanic may act on the service request"""
+        if not self.is_mechanic:
+            return False
+        try:
+            service_request_id = int(service_request_id)
+        except (TypeError, ValueError):
+            return False
+        if self.authorized_request_ids is None:
+            self.authorized_request_ids = await self.load_authorized_request_ids()
+        return service_request_id in self.authorized_request_ids
+
     async def handle_location_update(self, data):
-        if not await self.is_valid_field_staff():
+        # Pings outside a job are allowed; pings for a job must be the mechanic's
+        if data.get('service_request_id') and not await self.is_authorized(data['service_request_id']):
             return
 
-        # Save location to database
-        await self.save_location_update(data)
+        try:
+            decision = self.ping_gate.check(data['latitude'], data['longitude'])
+        except (KeyError, TypeError, ValueError):
+            decision = None
+        ping_counters.add(decision.outcome if decision else DROPPED)
+        if decision is None or decision.outcome == DROPPED:
+            return
 
+        # Queue the ping for the database, or only refresh the cached position
+        await self.save_location_update(data, persist=decision.persist)
+
+        if decision.outcome == ACCEPTED:
+            self.pending_ping = None
+            await self.broadcast_location(data)
+            return
+        # Only the latest ping of the interval goes out, when it ends
+        self.pending_ping = data
+        if self.pending_ping_task is None or self.pending_ping_task.done():
+            self.pending_ping_task = asyncio.ensure_future(
+                self.broadcast_pending_ping(self.ping_gate.broadcast_delay())
+            )
+
+    async def broadcast_pending_ping(self, delay):
+        await asyncio.sleep(delay)
+        data, self.pending_ping = self.pending_ping, None
+        if data is not None:
+            self.ping_gate.broadcasted()
+            await self.broadcast_location(data)
+
+    async def broadcast_location(self, data):
         # Send location update to customer
         await self.channel_layer.group_send(
             f"customer_{data['customer_id']}",
@@ -84,7 +171,7 @@ class ServiceRequestConsumer(AsyncWebsocketConsumer):
             )
 
     async def handle_service_response(self, data):
-        if not await self.is_valid_field_staff():
+        if not await self.is_authorized(data.get('service_request_id')):
             return
 
         # Update response in database
@@ -108,7 +195,7 @@ class ServiceRequestConsumer(AsyncWebsocketConsumer):
         )
 
     async def handle_start_tracking(self, data):
-        if not await self.is_valid_field_staff():
+        if not await self.is_authorized(data.get('service_request_id')):
             return
 
         # Start service in database
@@ -134,13 +221,14 @@ class ServiceRequestConsumer(AsyncWebsocketConsumer):
         )
 
     async def handle_complete_service(self, data):
-        if not await self.is_valid_field_staff():
+        if not await self.is_authorized(data.get('service_request_id')):
             return
 
         # Complete service in database
         success = await self.complete_service(data)
         if not success:
             return
+        self.authorized_request_ids.discard(int(data['service_request_id']))
 
         # Notify customer
         await self.channel_layer.group_send(
@@ -161,6 +249,8 @@ class ServiceRequestConsumer(AsyncWebsocketConsumer):
 
     async def service_request(self, event):
         """Handle incoming service requests for mechanics"""
+        if self.authorized_request_ids is not None:
+            self.authorized_request_ids.add(int(event['message']['request_id']))
         await self.send(text_data=json.dumps({
             'type': 'new_service_request',
             'data': event['message']
@@ -168,50 +258,74 @@ class ServiceRequestConsumer(AsyncWebsocketConsumer):
 
     async def service_cancelled(self, event):
         """Handle service cancellation notifications"""
+        if self.authorized_request_ids is not None:
+            self.authorized_request_ids.discard(int(event['message']['request_id']))
         await self.send(text_data=json.dumps({
             'type': 'service_cancelled',
             'data': event['message']
         }))
 
+    async def assignments_changed(self, event):
+        """The mechanic's record or offers changed elsewhere; reload on next use"""
+        self.field_staff = await self.load_field_staff()
+        self.authorized_request_ids = None
+
     async def location_update(self, event):
         await self.send(text_data=json.dumps(event['message']))
 
     @database_sync_to_async
-    def is_valid_field_staff(self):
-        return (
-            self.user.email.endswith('@field.repairmybike.in') and
-            FieldStaff.objects.filter(user=self.user).exists()
+    def load_field_staff(self):
+        return FieldStaff.objects.select_related('user').filter(user=self.user).first()
+
+    @database_sync_to_async
+    def load_authorized_request_ids(self):
+        """Open service requests offered to the mechanic, plus their current job"""
+        ids = set(
+            DispatchOffer.objects
+            .filter(field_staff=self.field_staff, service_request__status__in=OPEN_STATUSES)
+            .values_list('service_request_id', flat=True)
         )
+        current_job_id = FieldStaff.objects.filter(pk=self.field_staff.pk).values_list('current_job_id', flat=True).first()
+        if current_job_id is not None:
+            ids.add(current_job_id)
+        return ids
 
     @database_sync_to_async
-    def save_location_update(self, data):
+    def save_location_update(self, data, persist=True):
         try:
-            field_staff = FieldStaff.objects.get(user=self.user)
-            service_request = ServiceRequest.objects.get(id=data['service_request_id'])
-            
-            # Save to LiveLocation model
-            LiveLocation.objects.create(
-                field_staff=field_staff,
-                service_request=service_request,
-                latitude=data['latitude'],
-                longitude=data['longitude']
+            service_request_id = data.get('service_request_id')
+            service_request_id = int(service_request_id) if service_request_id else None
+            if not persist:
+                remember_position(
+                    self.field_staff.id, service_request_id,
+                    float(data['latitude']), float(data['longitude']), timezone.now()
+                )
+                return True
+            # Queue the ping; the buffer writes LiveLocation rows and the
+            # mechanic's current position in bulk
+            location_buffer.add(
+                self.field_staff.id,
+                service_request_id,
+                data['latitude'],
+                data['longitude']
             )
-            
-            # Update field staff current location
-            field_staff.update_location(data['latitude'], data['longitude'])
             return True
         except Exception:
             return False
 
     @database_sync_to_async
-    def save_service_response(self, data):
+    def load_job(self, data):
+        """The mechanic and the service request a message refers to"""
+        service_request = ServiceRequest.objects.get(id=data['service_request_id'])
+        return self.field_staff, service_request
+
+    async def save_service_response(self, data):
         from .services import ServiceRequestManager
         try:
-            field_staff = FieldStaff.objects.get(user=self.user)
-            service_request = ServiceRequest.objects.get(id=data['service_request_id'])
+            field_staff, service_request = await self.load_job(data)
             
             manager = ServiceRequestManager(service_request)
-            return manager.handle_mechanic_response(
+            return await manager.ahandle_mechanic_response(
                 field_staff, 
                 data['response'], 
                 data.get('estimated_arrival_time')
@@ -219,15 +333,13 @@ class ServiceRequestConsumer(AsyncWebsocketConsumer):
         except Exception:
             return False
 
-    @database_sync_to_async
-    def start_service_tracking(self, data):
+    async def start_service_tracking(self, data):
         from .services import ServiceRequestManager
         try:
-            field_staff = FieldStaff.objects.get(user=self.user)
-            service_request = ServiceRequest.objects.get(id=data['service_request_id'])
+            field_staff, service_request = await self.load_job(data)
             
             manager = ServiceRequestManager(service_request)
-            manager.start_tracking(
+            await manager.astart_tracking(
                 field_staff, 
                 data['latitude'], 
                 data['longitude']
@@ -236,15 +348,13 @@ class ServiceRequestConsumer(AsyncWebsocketConsumer):
         except Exception:
             return False
 
-    @database_sync_to_async
-    def complete_service(self, data):
+    async def complete_service(self, data):
         from .services import ServiceRequestManager
         try:
-            field_staff = FieldStaff.objects.get(user=self.user)
-            service_request = ServiceRequest.objects.get(id=data['service_request_id'])
+            field_staff, service_request = await self.load_job(data)
             
             manager = ServiceRequestManager(service_request)
-            manager.complete_service(field_staff, data['service_cost'])
+            await manager.acomplete_service(field_staff, data['service_cost'])
             return True
         except Exception:
             return False
@@ -383,33 +493,8 @@ class AdminDashboardConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def get_statistics(self):
         """Get dashboard statistics data"""
-        from django.db.models import Sum, Count
-        from marketplace.models import Vehicle, SellRequest
-        from accounts.models import User, UserProfile
-        
-        # These queries would be optimized in production
-        total_users = User.objects.count()
-        total_vehicles = Vehicle.objects.count()
-        total_sell_requests = SellRequest.objects.count()
-        total_service_requests = ServiceRequest.objects.count()
-        pending_sell_requests = SellRequest.objects.filter(status='PENDING').count()
-        pending_repair_requests = ServiceRequest.objects.filter(status='PENDING').count()
-        
-        # Calculate revenue (this is a simplified example)
-        from marketplace.models import VehiclePurchase
-        vehicle_revenue = VehiclePurchase.objects.aggregate(total=Sum('price'))['total'] or 0
-        service_revenue = ServiceRequest.objects.filter(status='COMPLETED').aggregate(total=Sum('total_amount'))['total'] or 0
-        total_revenue = vehicle_revenue + service_revenue
-        
-        return {
-            'totalUsers': total_users,
-            'totalVehicles': total_vehicles,
-            'totalSales': total_sell_requests,
-            'totalServices': total_service_requests,
-            'pendingSellRequests': pending_sell_requests,
-            'pendingRepairRequests': pending_repair_requests,
-            'totalRevenue': f'₹{total_revenue:,.2f}'
-        }
+        from .dashboard_counters import dashboard_statistics
+        return dashboard_statistics()
     
     @database_sync_to_async
     def get_notifications(self):
@@ -0,0 +1,378 @@
+"""
+Admin dashboard totals maintained incrementally.
+
+Every counted model has a contribution function giving, for one row, what
+it adds to each counter (1 to a total, 1 to "pending" while its status is
+pending, its amount to a revenue...). On save or delete the signals in
+repairing_service.signals work out the difference between the contribution
+of the tracked fields as loaded (LoadedValuesMixin in utils.loaded_values,
+kept up to date by refresh_from_db and by every save counted here) and as
+saved. Saves whose update_fields miss every tracked field are ignored, so
+last_login updates cost nothing.
+
+The differences never touch the database inside the writer's transaction:
+once it commits they are added to pending totals in the cache with incr,
+so concurrent writes do not queue on one row lock. Dashboards read the
+DashboardCounters row (cached) plus those pending totals with one
+get_many (dashboard_counters()). flush() moves the pending totals into the
+row.
+
+flush() and reconcile() both lock the row before taking the pending
+totals, so they never take the same totals twice. Each one bumps a version
+in the cache once it commits; a cached row is only used while its version
+is current, so a row read before a flush cannot be cached over its result.
+
+Writes that bypass signals (QuerySet.update, bulk_create), pending totals
+lost with the cache, and the counters that depend on the date (new users in
+the last 30 days, upcoming visits) drift until reconcile() recomputes
+everything with aggregate queries; the reconcile_dashboard_counters command
+runs it periodically. A write that commits while reconcile() is running
+its aggregates may be counted twice or missed; the next reconcile() fixes
+it.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from accounts.models import User
+from marketplace.models import SellRequest, Vehicle, VehiclePurchase
+from subscription_plan.models import SubscriptionRequest, VisitSchedule
+from tools.cache_utils import CACHE_TIMES
+from vehicle.models import UserVehicle
+from .models import DashboardCounters, ServiceRequest
+
+ROW_ID = 1
+CACHE_KEY = 'dashboard_counters'
+VERSION_KEY = 'dashboard_counters_version'
+
+COUNTERS = (
+    'users_total', 'users_active', 'users_new_30d', 'vehicles_total', 'vehicles_for_sale', 'user_vehicles_total',
+    'sell_requests_total', 'sell_requests_pending', 'service_requests_total', 'service_requests_pending',
+    'service_requests_completed', 'subscriptions_active', 'subscriptions_pending', 'visits_upcoming',
+    'visits_completed', 'vehicle_revenue', 'service_revenue',
+)
+# Pending revenue is kept in paise, as cache counters only hold integers
+REVENUE = ('vehicle_revenue', 'service_revenue')
+
+NEW_USER_DAYS = 30
+
+Tracked = namedtuple('Tracked', ['fields', 'contribution'])
+
+
+def _recent_cutoff():
+    return timezone.now() - timedelta(days=NEW_USER_DAYS)
+
+
+def _today_start():
+    return timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _user(row):
+    return {
+        'users_total': 1,
+        'users_active': int(bool(row['is_active'])),
+        'users_new_30d': int(row['date_joined'] is not None and row['date_joined'] >= _recent_cutoff()),
+    }
+
+
+def _vehicle(row):
+    return {'vehicles_total': 1, 'vehicles_for_sale': int(row['status'] == Vehicle.Status.AVAILABLE)}
+
+
+def _user_vehicle(row):
+    return {'user_vehicles_total': 1}
+
+
+def _sell_request(row):
+    return {'sell_requests_total': 1, 'sell_requests_pending': int(row['status'] == SellRequest.Status.SUBMITTED)}
+
+
+def _service_request(row):
+    completed = row['status'] == ServiceRequest.STATUS_COMPLETED
+    return {
+        'service_requests_total': 1,
+        'service_requests_pending': int(row['status'] == ServiceRequest.STATUS_PENDING),
+        'service_requests_completed': int(completed),
+        'service_revenue': Decimal(row['total_amount'] or 0) if completed else Decimal(0),
+    }
+
+
+def _vehicle_purchase(row):
+    completed = row['status'] == VehiclePurchase.Status.COMPLETED
+    return {'vehicle_revenue': Decimal(row['amount'] or 0) if completed else Decimal(0)}
+
+
+def _subscription_request(row):
+    return {
+        'subscriptions_active': int(row['status'] == SubscriptionRequest.APPROVED),
+        'subscriptions_pending': int(row['status'] == SubscriptionRequest.PENDING),
+    }
+
+
+def _visit(row):
+    return {
+        'visits_upcoming': int(
+            row['status'] == VisitSchedule.SCHEDULED
+            and row['scheduled_date'] is not None
+            and row['scheduled_date'] >= _today_start()
+        ),
+        'visits_completed': int(row['status'] == VisitSchedule.COMPLETED),
+    }
+
+
+TRACKED = {
+    User: Tracked(('is_active', 'date_joined'), _user),
+    Vehicle: Tracked(('status',), _vehicle),
+    UserVehicle: Tracked((), _user_vehicle),
+    SellRequest: Tracked(('status',), _sell_request),
+    ServiceRequest: Tracked(('status', 'total_amount'), _service_request),
+    VehiclePurchase: Tracked(('status', 'amount'), _vehicle_purchase),
+    SubscriptionRequest: Tracked(('status',), _subscription_request),
+    VisitSchedule: Tracked(('status', 'scheduled_date'), _visit),
+}
+
+
+def _values(instance, fields):
+    return {field: getattr(instance, field) for field in fields}
+
+
+def remember_before_save(sender, instance, update_fields=None):
+    """Keep the stored values of a row about to be saved (None for a new row, False to skip it)"""
+    tracked = TRACKED[sender]
+    if update_fields is not None and not set(update_fields) & set(tracked.fields):
+        instance._dashboard_before = False
+        return
+    if instance._state.adding or instance.pk is None:
+        instance._dashboard_before = None
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+    if all(field in loaded for field in tracked.fields):
+        before = {field: loaded[field] for field in tracked.fields}
+    else:
+        # Not loaded from the database, or loaded with tracked fields deferred
+        before = sender._default_manager.filter(pk=instance.pk).values(*tracked.fields).first()
+    instance._dashboard_before = before
+
+
+def record_save(sender, instance, update_fields=None):
+    tracked = TRACKED[sender]
+    before = getattr(instance, '_dashboard_before', None)
+    if before is False:
+        return
+    instance._dashboard_before = False
+    current = _values(instance, tracked.fields)
+    if before is not None and update_fields is not None:
+        # Fields left out of update_fields keep their stored values
+        current = {field: current[field] if field in update_fields else before[field] for field in tracked.fields}
+    if tracked.fields:
+        instance._loaded_values = {**getattr(instance, '_loaded_values', {}), **current}
+    after = tracked.contribution(current)
+    if before is not None:
+        previous = tracked.contribution(before)
+        after = {name: value - previous[name] for name, value in after.items()}
+    apply(after)
+
+
+def record_update(sender, instance, **before):
+    """Count a change written with QuerySet.update(): instance holds the new values, before the replaced ones"""
+    tracked = TRACKED[sender]
+    instance._dashboard_before = {**_values(instance, tracked.fields), **before}
+    record_save(sender, instance)
+
+
+def record_delete(sender, instance):
+    tracked = TRACKED[sender]
+    apply({name: -value for name, value in tracked.contribution(_values(instance, tracked.fields)).items()})
+
+
+def _pending_key(name):
+    return f'dashboard_counters_pending_{name}'
+
+
+def _to_units(name, value):
+    return int(value * 100) if name in REVENUE else int(value)
+
+
+def _from_units(name, amount):
+    return Decimal(amount) / 100 if name in REVENUE else amount
+
+
+def apply(deltas):
+    """Add deltas to the pending totals once the current transaction commits"""
+    deltas = {name: _to_units(name, value) for name, value in deltas.items() if value}
+    if deltas:
+        transaction.on_commit(lambda: publish(deltas))
+
+
+def publish(deltas):
+    for name, amount in deltas.items():
+        key = _pending_key(name)
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            # Evicted between add and incr
+            cache.set(key, amount, None)
+
+
+def _take_pending():
+    """Remove the pending totals from the cache and return them, in cache units"""
+    keys = {_pending_key(name): name for name in COUNTERS}
+    pending = {keys[key]: amount for key, amount in cache.get_many(list(keys)).items() if amount}
+    for name, amount in pending.items():
+        # Subtract rather than delete, so increments made meanwhile stay
+        try:
+            cache.decr(_pending_key(name), amount)
+        except ValueError:
+            pass
+    return pending
+
+
+def flush():
+    """Move the pending totals into the counters row; returns what was moved"""
+    with transaction.atomic():
+        row = DashboardCounters.objects.select_for_update().filter(pk=ROW_ID).values_list('pk', flat=True)
+        if not list(row):
+            # Nothing to add to yet: count everything instead
+            reconcile()
+            return {}
+        pending = _take_pending()
+        if not pending:
+            return {}
+        try:
+            DashboardCounters.objects.filter(pk=ROW_ID).update(
+                **{name: F(name) + _from_units(name, amount) for name, amount in pending.items()}
+            )
+        except Exception:
+            publish(pending)
+            raise
+        transaction.on_commit(forget)
+    return {name: _from_units(name, amount) for name, amount in pending.items()}
+
+
+def forget():
+    """Retire the cached row by moving to a new version"""
+    cache.add(VERSION_KEY, 0, None)
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def _daily(queryset, field, since):
+    rows = (
+        queryset.filter(**{f'{field}__gte': since})
+        .annotate(day=TruncDate(field))
+        .values('day')
+        .annotate(count=Count('id'))
+        .order_by('day')
+    )
+    return [{'day': row['day'].isoformat(), 'count': row['count']} for row in rows]
+
+
+def compute():
+    """Every counter from the tables, with one aggregate query per model"""
+    recent, today = _recent_cutoff(), _today_start()
+    values = {}
+    values.update(User.objects.aggregate(
+        users_total=Count('id'),
+        users_active=Count('id', filter=Q(is_active=True)),
+        users_new_30d=Count('id', filter=Q(date_joined__gte=recent)),
+    ))
+    values.update(Vehicle.objects.aggregate(
+        vehicles_total=Count('id'),
+        vehicles_for_sale=Count('id', filter=Q(status=Vehicle.Status.AVAILABLE)),
+    ))
+    values['user_vehicles_total'] = UserVehicle.objects.count()
+    values.update(SellRequest.objects.aggregate(
+        sell_requests_total=Count('id'),
+        sell_requests_pending=Count('id', filter=Q(status=SellRequest.Status.SUBMITTED)),
+    ))
+    values.update(ServiceRequest.objects.aggregate(
+        service_requests_total=Count('id'),
+        service_requests_pending=Count('id', filter=Q(status=ServiceRequest.STATUS_PENDING)),
+        service_requests_completed=Count('id', filter=Q(status=ServiceRequest.STATUS_COMPLETED)),
+        service_revenue=Sum('total_amount', filter=Q(status=ServiceRequest.STATUS_COMPLETED)),
+    ))
+    values.update(VehiclePurchase.objects.aggregate(
+        vehicle_revenue=Sum('amount', filter=Q(status=VehiclePurchase.Status.COMPLETED)),
+    ))
+    values.update(SubscriptionRequest.objects.aggregate(
+        subscriptions_active=Count('id', filter=Q(status=SubscriptionRequest.APPROVED)),
+        subscriptions_pending=Count('id', filter=Q(status=SubscriptionRequest.PENDING)),
+    ))
+    values.update(VisitSchedule.objects.aggregate(
+        visits_upcoming=Count('id', filter=Q(status=VisitSchedule.SCHEDULED, scheduled_date__gte=today)),
+        visits_completed=Count('id', filter=Q(status=VisitSchedule.COMPLETED)),
+    ))
+    values['service_revenue'] = values['service_revenue'] or Decimal(0)
+    values['vehicle_revenue'] = values['vehicle_revenue'] or Decimal(0)
+    values['trends'] = {
+        'users': _daily(User.objects.all(), 'date_joined', recent),
+        'service_requests': _daily(ServiceRequest.objects.all(), 'created_at', recent),
+    }
+    return values
+
+
+def reconcile():
+    """Recompute the row from scratch; returns the differences that were corrected"""
+    with transaction.atomic():
+        row, _ = DashboardCounters.objects.select_for_update().get_or_create(pk=ROW_ID)
+        # The tables already include every committed write
+        pending = _take_pending()
+        for name, amount in pending.items():
+            setattr(row, name, getattr(row, name) + _from_units(name, amount))
+        values = compute()
+        drift = {
+            name: value - getattr(row, name)
+            for name, value in values.items()
+            if name != 'trends' and value != getattr(row, name)
+        }
+        for name, value in values.items():
+            setattr(row, name, value)
+        row.reconciled_at = timezone.now()
+        row.save()
+        transaction.on_commit(forget)
+    return drift
+
+
+def dashboard_counters():
+    """The counters row plus the pending totals as a dict, in one cache round trip when the row is cached"""
+    cached = cache.get_many([CACHE_KEY, VERSION_KEY] + [_pending_key(name) for name in COUNTERS])
+    version = cached.get(VERSION_KEY)
+    entry = cached.get(CACHE_KEY)
+    if entry is not None and entry['version'] == version:
+        row = entry['row']
+    else:
+        row = DashboardCounters.objects.filter(pk=ROW_ID).values().first()
+        if row is None:
+            reconcile()
+            row = DashboardCounters.objects.filter(pk=ROW_ID).values().first()
+        # Tagged with the version read before the row: if a flush
+        # committed in between, the next read sees a newer version
+        cache.set(CACHE_KEY, {'version': version, 'row': row}, CACHE_TIMES['LOOKUP'])
+    counters = dict(row)
+    for name in COUNTERS:
+        amount = cached.get(_pending_key(name))
+        if amount:
+            counters[name] += _from_units(name, amount)
+    return counters
+
+
+def dashboard_statistics():
+    """The totals returned by the admin statistics API and websocket"""
+    counters = dashboard_counters()
+    total_revenue = counters['vehicle_revenue'] + counters['service_revenue']
+    return {
+        'totalUsers': counters['users_total'],
+        'totalVehicles': counters['vehicles_total'],
+        'totalSales': counters['sell_requests_total'],
+        'totalServices': counters['service_requests_total'],
+        'pendingSellRequests': counters['sell_requests_pending'],
+        'pendingRepairRequests': counters['service_requests_pending'],
+        'totalRevenue': f'₹{total_revenue:,.2f}'
+    }
@@ -0,0 +1,368 @@
+"""
+Mechanic dispatch engine.
+
+Instead of broadcasting a new service request to every mechanic in range,
+candidates are scored (see repairing_service.dispatch_scoring) and the
+request is offered to the best few at a time. Each wave gets wave_timeout
+seconds to be accepted before the next wave is offered. When everyone in
+the current ring has been offered the job, the search widens to the next
+radius (5, 8, 12 km...) and only mechanics not offered yet are added.
+Every offer is recorded as a DispatchOffer, which also feeds the
+acceptance rate used in later rankings.
+
+The dispatch loop is a coroutine. start_dispatch() schedules it on the
+ASGI server's event loop so no worker thread waits on the timeouts; the
+server loop is recorded by DispatchLoopMiddleware, which authback.asgi
+wraps around the application.
+
+Outside an ASGI server (gunicorn with authback.wsgi, as in the Procfile,
+management commands, shells) there is no server loop, and each process
+starts one daemon thread running its own event loop for dispatches. That
+thread lives and dies with the process: dispatches in flight when a worker
+is recycled are lost and are not resumed elsewhere, and a request is only
+deduplicated against dispatches started in the same process.
+"""
+import asyncio
+import logging
+import os
+import threading
+from datetime import timedelta
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.utils import timezone
+from .dispatch_scoring import acceptance_rate, score_candidates, top_k, waves
+from .models import DispatchOffer, FieldStaff, ServiceRequest
+
+logger = logging.getLogger(__name__)
+
+WAVE_SIZE = getattr(settings, 'DISPATCH_WAVE_SIZE', 3)
+WAVE_TIMEOUT_SECONDS = getattr(settings, 'DISPATCH_WAVE_TIMEOUT_SECONDS', 30)
+SEARCH_RADII_KM = tuple(getattr(settings, 'DISPATCH_SEARCH_RADII_KM', (5.0, 8.0, 12.0, 18.0)))
+ACCEPTANCE_WINDOW_DAYS = getattr(settings, 'DISPATCH_ACCEPTANCE_WINDOW_DAYS', 30)
+POLL_INTERVAL_SECONDS = 1.0
+
+
+def recent_acceptance(field_staff_ids, days=ACCEPTANCE_WINDOW_DAYS):
+    """(accepted, offered) counts per mechanic over the last days, in one query"""
+    since = timezone.now() - timedelta(days=days)
+    rows = (
+        DispatchOffer.objects
+        .filter(field_staff_id__in=field_staff_ids, offered_at__gte=since)
+        .values('field_staff_id')
+        .annotate(offered=Count('id'), accepted=Count('id', filter=Q(accepted=True)))
+    )
+    return {row['field_staff_id']: (row['accepted'], row['offered']) for row in rows}
+
+
+class DispatchEngine:
+    def __init__(self, service_request, wave_size=WAVE_SIZE, wave_timeout=WAVE_TIMEOUT_SECONDS,
+                 radii_km=SEARCH_RADII_KM, channel_layer=None):
+        self.service_request = service_request
+        self.wave_size = wave_size
+        self.wave_timeout = wave_timeout
+        self.radii_km = tuple(radii_km)
+        self.channel_layer = channel_layer or get_channel_layer()
+        # Mechanics already offered this request, filled by load_offered/offer_wave
+        self.offered = set()
+        self.closed = False
+
+    @property
+    def radius_km(self):
+        return self.radii_km[0]
+
+    def rank(self, candidates=None, radius_km=None):
+        """
+        Mechanics in range that were not offered the request yet, best first.
+        Each returned instance carries distance_km and dispatch_score.
+        candidates may be a list already returned by FieldStaff.find_nearby
+        for the same radius.
+        """
+        radius_km = radius_km or self.radius_km
+        if candidates is None:
+            if self.service_request.latitude is None or self.service_request.longitude is None:
+                return []
+            candidates = FieldStaff.find_nearby(
+                self.service_request.latitude,
+                self.service_request.longitude,
+                radius_km=radius_km
+            )
+        candidates = [mechanic for mechanic in candidates if mechanic.id not in self.offered]
+        if not candidates:
+            return []
+
+        history = recent_acceptance([mechanic.id for mechanic in candidates])
+        counts = [history.get(mechanic.id, (0, 0)) for mechanic in candidates]
+        scores = score_candidates(
+            [mechanic.distance_km for mechanic in candidates],
+            [mechanic.rating for mechanic in candidates],
+            [mechanic.total_jobs for mechanic in candidates],
+            acceptance_rate([accepted for accepted, _ in counts], [offered for _, offered in counts]),
+            radius_km
+        )
+        ranked = []
+        for index in top_k(scores, len(candidates)).tolist():
+            mechanic = candidates[index]
+            mechanic.dispatch_score = float(scores[index])
+            ranked.append(mechanic)
+        return ranked
+
+    def load_offered(self):
+        self.offered.update(
+            DispatchOffer.objects
+            .filter(service_request=self.service_request)
+            .values_list('field_staff_id', flat=True)
+        )
+
+    def offer_message(self, mechanic, wave, details=None):
+        message = {
+            "request_id": str(self.service_request.id),
+            "reference": self.service_request.reference,
+            "address": self.service_request.address,
+            "location": {
+                "latitude": self.service_request.latitude,
+                "longitude": self.service_request.longitude
+            },
+            "distance_km": round(mechanic.distance_km, 2),
+            "wave": wave,
+            "expires_in": self.wave_timeout
+        }
+        if details:
+            message.update(details)
+        return message
+
+    def offer_wave(self, mechanics, wave, details=None):
+        """
+        Record offers for one wave and return the (group, event) pairs to
+        send. Mechanics already offered this request are skipped.
+        """
+        offered = set(
+            DispatchOffer.objects
+            .filter(service_request=self.service_request, field_staff__in=mechanics)
+            .values_list('field_staff_id', flat=True)
+        )
+        mechanics = [mechanic for mechanic in mechanics if mechanic.id not in offered]
+        self.offered.update(offered)
+        self.offered.update(mechanic.id for mechanic in mechanics)
+        DispatchOffer.objects.bulk_create(
+            [
+                DispatchOffer(
+                    service_request=self.service_request,
+                    field_staff=mechanic,
+                    wave=wave,
+                    score=getattr(mechanic, 'dispatch_score', 0.0),
+                    distance_km=mechanic.distance_km
+                )
+                for mechanic in mechanics
+            ],
+            ignore_conflicts=True
+        )
+        return [
+            (
+                f"mechanic_{mechanic.user_id}",
+                {"type": "service.request", "message": self.offer_message(mechanic, wave, details)}
+            )
+            for mechanic in mechanics
+            if mechanic.user_id is not None
+        ]
+
+    async def send(self, messages):
+        await asyncio.gather(*(
+            self.channel_layer.group_send(group, event) for group, event in messages
+        ))
+
+    def state(self):
+        """(status, id of the accepting mechanic or None) in one query"""
+        accepted = (
+            DispatchOffer.objects
+            .filter(service_request=OuterRef('pk'), accepted=True)
+            .values('field_staff_id')[:1]
+        )
+        return (
+            ServiceRequest.objects
+            .filter(pk=self.service_request.pk)
+            .annotate(accepted_by=Subquery(accepted))
+            .values_list('status', 'accepted_by')
+            .first()
+        ) or (ServiceRequest.STATUS_CANCELLED, None)
+
+    def accepted_by(self):
+        """Id of the mechanic who accepted the request, or None"""
+        return self.state()[1]
+
+    async def check(self):
+        """
+        Id of the accepting mechanic or None. Sets closed once the request
+        is no longer pending: accepted, confirmed or cancelled by an admin,
+        completed. Only pending requests can be accepted, so there is
+        nothing left to offer.
+        """
+        status, accepted = await database_sync_to_async(self.state)()
+        self.closed = status != ServiceRequest.STATUS_PENDING
+        return accepted
+
+    async def wait_for_acceptance(self, timeout):
+        """
+        Poll until a mechanic accepts, the request leaves pending or timeout
+        seconds pass.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            accepted = await self.check()
+            if accepted is not None or self.closed or loop.time() >= deadline:
+                return accepted
+            await asyncio.sleep(min(POLL_INTERVAL_SECONDS, max(deadline - loop.time(), 0)))
+
+    async def run(self, details=None):
+        """
+        Offer the request wave by wave, widening the search ring whenever
+        the current one is used up, until a mechanic accepts, the request is
+        closed or the largest ring is exhausted. Returns the accepting
+        mechanic's id or None.
+        """
+        await database_sync_to_async(self.load_offered)()
+        accepted = await self.check()
+        if accepted is not None or self.closed:
+            return accepted
+        wave = 0
+        for radius_km in self.radii_km:
+            ranked = await database_sync_to_async(self.rank)(None, radius_km)
+            for mechanics in waves(ranked, self.wave_size):
+                wave += 1
+                messages = await database_sync_to_async(self.offer_wave)(mechanics, wave, details)
+                await self.send(messages)
+                accepted = await self.wait_for_acceptance(self.wave_timeout)
+                if accepted is not None or self.closed:
+                    return accepted
+        if not self.closed:
+            await database_sync_to_async(self.cancel_unassigned)()
+            await self.notify_customer_unassigned()
+        return None
+
+    def cancel_unassigned(self):
+        ServiceRequest.objects.filter(
+            pk=self.service_request.pk,
+            status=self.service_request.status
+        ).update(status=ServiceRequest.STATUS_CANCELLED, cancelled_at=timezone.now())
+
+    async def notify_customer_unassigned(self):
+        if self.service_request.user_id is None:
+            return
+        await self.channel_layer.group_send(
+            f"customer_{self.service_request.user_id}",
+            {
+                "type": "service.notification",
+                "message": {
+                    "type": "no_mechanic_available",
+                    "request_id": str(self.service_request.id),
+                    "message": "No mechanics available in your area"
+                }
+            }
+        )
+
+
+def record_response(service_request, mechanic, accepted):
+    """Store a mechanic's answer to an offer"""
+    return DispatchOffer.objects.filter(
+        service_request=service_request,
+        field_staff=mechanic,
+        responded_at__isnull=True
+    ).update(responded_at=timezone.now(), accepted=accepted)
+
+
+# Dispatch tasks in flight in this process, keyed by service request id;
+# also keeps a reference so running tasks are not garbage collected
+_running = {}
+_fallback_loop = None
+_fallback_lock = threading.Lock()
+# (pid, loop) of the ASGI server, set by DispatchLoopMiddleware
+_bound_loop = (None, None)
+
+
+def bind_event_loop(loop):
+    """Use loop for dispatches started from this process"""
+    global _bound_loop
+    _bound_loop = (os.getpid(), loop)
+
+
+class DispatchLoopMiddleware:
+    """
+    ASGI middleware recording the server's event loop, so dispatches
+    started from sync views (run in worker threads) are scheduled on it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        if _bound_loop != (os.getpid(), loop):
+            bind_event_loop(loop)
+        return await self.app(scope, receive, send)
+
+
+def _server_loop():
+    """
+    The ASGI server's event loop, whether we are running on it or in a sync
+    view that the server runs in a worker thread. None under WSGI.
+    """
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    pid, loop = _bound_loop
+    if pid == os.getpid() and loop is not None and loop.is_running():
+        return loop
+    return None
+
+
+def _background_loop():
+    """
+    Event loop on a daemon thread, for callers outside an ASGI server. See
+    the module docstring for what that means under WSGI.
+    """
+    global _fallback_loop
+    with _fallback_lock:
+        if _fallback_loop is None:
+            logger.info("No ASGI server loop in process %s, dispatching on a background thread", os.getpid())
+            _fallback_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_fallback_loop.run_forever, name='mechanic-dispatch', daemon=True
+            ).start()
+        return _fallback_loop
+
+
+async def _dispatch(engine, details):
+    try:
+        return await engine.run(details)
+    except Exception:
+        logger.exception("Dispatch of service request %s failed", engine.service_request.id)
+    finally:
+        _running.pop(engine.service_request.id, None)
+
+
+def _schedule(engine, details):
+    if engine.service_request.id in _running:
+        return
+    _running[engine.service_request.id] = asyncio.ensure_future(_dispatch(engine, details))
+
+
+def start_dispatch(service_request, details=None, **engine_options):
+    """
+    Start dispatching a service request without waiting for it. Safe to call
+    from async code, from a sync view served over ASGI and from plain sync
+    code; a request already being dispatched in this process is left alone.
+    """
+    engine = DispatchEngine(service_request, **engine_options)
+    loop = _server_loop() or _background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        _schedule(engine, details)
+    else:
+        loop.call_soon_threadsafe(_schedule, engine, details)
+    return engine
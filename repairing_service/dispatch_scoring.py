@@ -0,0 +1,77 @@
+"""
+Scoring of mechanic candidates for dispatch.
+
+Pure NumPy functions with no database access, so the ranking can be unit
+tested and benchmarked on its own. Every input is a sequence (or array) with
+one value per candidate and the whole candidate set is scored in one
+vectorized pass.
+"""
+import numpy as np
+
+MAX_RATING = 5.0
+
+DEFAULT_WEIGHTS = {
+    'distance': 0.40,
+    'rating': 0.25,
+    'acceptance': 0.20,
+    'load': 0.15,
+}
+
+# A mechanic with this many completed jobs gets half the load score of an idle one
+LOAD_HALF_JOBS = 50.0
+
+# Prior used to smooth acceptance rates of mechanics with few recent offers
+ACCEPTANCE_PRIOR = 0.5
+ACCEPTANCE_PRIOR_OFFERS = 4.0
+
+
+def acceptance_rate(accepted, offered, prior=ACCEPTANCE_PRIOR, prior_offers=ACCEPTANCE_PRIOR_OFFERS):
+    """
+    Smoothed acceptance rate. A mechanic with no recent offers gets the prior
+    instead of 0 or 1, and the observed rate takes over as offers accumulate.
+    """
+    accepted = np.asarray(accepted, dtype=np.float64)
+    offered = np.asarray(offered, dtype=np.float64)
+    return (accepted + prior * prior_offers) / (offered + prior_offers)
+
+
+def score_candidates(distance_km, rating, total_jobs, acceptance, radius_km,
+                     weights=None, load_half_jobs=LOAD_HALF_JOBS):
+    """
+    Dispatch score of each candidate, higher is better.
+
+    Each component is scaled to 0..1 before weighting:
+    - distance: 1 at the customer, 0 at the edge of the search radius
+    - rating: rating out of MAX_RATING
+    - load: 1 / (1 + total_jobs / load_half_jobs), spreads work across mechanics
+    - acceptance: recent acceptance rate, see acceptance_rate()
+    """
+    weights = weights or DEFAULT_WEIGHTS
+    distance = np.asarray(distance_km, dtype=np.float64)
+    closeness = np.clip(1.0 - distance / float(radius_km), 0.0, 1.0)
+    rating_score = np.clip(np.asarray(rating, dtype=np.float64) / MAX_RATING, 0.0, 1.0)
+    load_score = 1.0 / (1.0 + np.maximum(np.asarray(total_jobs, dtype=np.float64), 0.0) / load_half_jobs)
+    acceptance_score = np.clip(np.asarray(acceptance, dtype=np.float64), 0.0, 1.0)
+    return (
+        weights['distance'] * closeness
+        + weights['rating'] * rating_score
+        + weights['load'] * load_score
+        + weights['acceptance'] * acceptance_score
+    )
+
+
+def top_k(scores, k):
+    """Indices of the k highest scores, best first"""
+    scores = np.asarray(scores, dtype=np.float64)
+    if k <= 0 or scores.size == 0:
+        return np.zeros(0, dtype=np.intp)
+    if k >= scores.size:
+        return np.argsort(-scores, kind='stable')
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    # argpartition leaves the selection unordered
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+def waves(order, wave_size):
+    """Split a ranked sequence into consecutive waves of wave_size"""
+    return [order[start:start + wave_size] for start in range(0, len(order), max(wave_size, 1))]
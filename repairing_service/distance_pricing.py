@@ -0,0 +1,166 @@
+"""
+Distance-based travel fees.
+
+Fees are charged from the customer's nearest active ServiceCenter using that
+center's newest active DistancePricingRule. Each process keeps the centers
+in a NearestPointIndex (KD-tree) so resolving the center is O(log n) and
+queries nothing. The index and the global rule are tagged with the
+'distance_pricing' namespace version; saving or deleting a center or a rule
+bumps it (see repairing_service.signals) and the next lookup rebuilds them.
+
+Without any priced center, the newest active rule that has no center is
+used with its own service center coordinates. It is resolved once and kept
+in the cache, plus a per-process copy.
+
+distance_fees() prices any number of customer points against a rule in one
+vectorized pass; quote_many() finds the nearest centers of a whole batch at
+once and prices each center's points together.
+"""
+import threading
+from collections import namedtuple
+import numpy as np
+from django.core.cache import cache
+from tools.cache_utils import CACHE_TIMES, get_namespace_version, invalidate_namespace
+from utils.geo import NearestPointIndex, distances_from
+from .models import DistancePricingRule, ServiceCenter
+
+NAMESPACE = 'distance_pricing'
+
+# Cached in place of a rule when none is active
+NO_RULE = 'none'
+
+# A resolved price origin: the center (None for a global rule), its rule and coordinates
+Pricing = namedtuple('Pricing', ['center', 'rule', 'latitude', 'longitude'])
+
+_local = None
+_centers = None
+_lock = threading.Lock()
+
+
+def _resolve():
+    return DistancePricingRule.objects.filter(is_active=True, service_center__isnull=True).order_by('-id').first()
+
+
+def active_rule():
+    """The active DistancePricingRule, or None"""
+    global _local
+    version = get_namespace_version(NAMESPACE)
+    local = _local
+    if local is not None and local[0] == version:
+        return local[1]
+
+    with _lock:
+        key = f'distance_pricing_rule_v{version}'
+        rule = cache.get(key)
+        if rule is None:
+            rule = _resolve() or NO_RULE
+            cache.set(key, rule, CACHE_TIMES['STATIC'])
+        rule = rule if isinstance(rule, DistancePricingRule) else None
+        _local = (version, rule)
+    return rule
+
+
+class CenterIndex:
+    """Active centers that have an active rule, with a KD-tree over their locations"""
+
+    def __init__(self, version):
+        self.version = version
+        rules = {}
+        for rule in (
+            DistancePricingRule.objects
+            .filter(is_active=True, service_center__is_active=True)
+            .order_by('service_center_id', '-id')
+        ):
+            rules.setdefault(rule.service_center_id, rule)
+        self.centers = list(ServiceCenter.objects.filter(id__in=rules).order_by('id'))
+        self.rules = [rules[center.id] for center in self.centers]
+        self.index = NearestPointIndex(
+            [center.latitude for center in self.centers],
+            [center.longitude for center in self.centers]
+        )
+
+    def nearest(self, latitude, longitude):
+        position = self.index.nearest(latitude, longitude)
+        if position is None:
+            return None
+        center = self.centers[position]
+        return Pricing(center, self.rules[position], center.latitude, center.longitude)
+
+
+def center_index():
+    """The current CenterIndex, rebuilt after center or rule writes"""
+    global _centers
+    version = get_namespace_version(NAMESPACE)
+    centers = _centers
+    if centers is None or centers.version != version:
+        with _lock:
+            centers = _centers
+            if centers is None or centers.version != version:
+                centers = _centers = CenterIndex(version)
+    return centers
+
+
+def pricing_for(latitude, longitude):
+    """Pricing for a customer location: the nearest priced center, else the global rule, else None"""
+    pricing = center_index().nearest(latitude, longitude)
+    if pricing is not None:
+        return pricing
+    rule = active_rule()
+    if rule is None:
+        return None
+    return Pricing(None, rule, rule.service_center_latitude, rule.service_center_longitude)
+
+
+def quote_many(latitudes, longitudes):
+    """
+    Distances (km), fees and center ids (None for the global rule) for many
+    customer points, each priced from its nearest center. Returns None when
+    no pricing is configured.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    centers = center_index()
+    nearest = centers.index.nearest_many(latitudes, longitudes)
+    if nearest is None:
+        rule = active_rule()
+        if rule is None:
+            return None
+        distances, fees = distance_fees(rule, latitudes, longitudes)
+        return distances, fees, [None] * len(latitudes)
+
+    distances = np.zeros(len(latitudes))
+    fees = np.zeros(len(latitudes))
+    # One vectorized pass per center and its rule
+    for position in np.unique(nearest).tolist():
+        selected = nearest == position
+        center = centers.centers[position]
+        distances[selected], fees[selected] = distance_fees(
+            centers.rules[position], latitudes[selected], longitudes[selected], (center.latitude, center.longitude)
+        )
+    center_ids = np.array([center.id for center in centers.centers])
+    return distances, fees, center_ids[nearest].tolist()
+
+
+def invalidate_rules():
+    global _local, _centers
+    invalidate_namespace(NAMESPACE)
+    _local = _centers = None
+
+
+def distance_fees(rule, latitudes, longitudes, origin=None):
+    """
+    Distances (km) and fees for many customer points as two float arrays.
+    Distances are measured from origin (latitude, longitude), the rule's
+    service center by default. Points inside the free radius cost nothing,
+    the others pay base_charge plus per_km_charge for every km beyond it.
+    """
+    if origin is None:
+        origin = (rule.service_center_latitude, rule.service_center_longitude)
+    distances = distances_from(origin[0], origin[1], latitudes, longitudes)
+    free_radius = float(rule.free_radius_km)
+    fees = np.where(
+        distances <= free_radius,
+        0.0,
+        float(rule.base_charge) + (distances - free_radius) * float(rule.per_km_charge)
+    )
+    return distances, fees
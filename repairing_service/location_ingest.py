@@ -0,0 +1,175 @@
+"""
+In-process buffer for live location pings.
+
+Websocket location updates are queued here instead of being inserted one
+row at a time. The queue is written with a single bulk_create once it holds
+LIVE_LOCATION_FLUSH_POINTS points or its oldest point is older than
+LIVE_LOCATION_FLUSH_INTERVAL_MS, and the latest position of each mechanic
+is applied to FieldStaff with one bulk_update at the same time. Each ping is
+also cached right away as the latest position of its mechanic and service
+request (see repairing_service.positions), so readers never wait for a flush.
+Whatever is still queued is flushed when the process exits cleanly.
+"""
+import atexit
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from .models import FieldStaff, LiveLocation, ServiceRequest
+from .positions import remember_position
+from .spatial import grid_cell
+
+logger = logging.getLogger(__name__)
+
+
+class LocationIngestBuffer:
+    """Thread-safe queue of LiveLocation rows flushed in bulk"""
+
+    def __init__(self, max_points=200, flush_interval_ms=1000, max_pending=50000):
+        self.max_points = max_points
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_pending = max_pending
+        self._points = []
+        self._positions = {}
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, field_staff_id, service_request_id, latitude, longitude, timestamp=None):
+        """
+        Queue one ping. service_request_id may be None, in which case only
+        the mechanic's current position is updated.
+        """
+        timestamp = timestamp or timezone.now()
+        latitude, longitude = float(latitude), float(longitude)
+        with self._lock:
+            if service_request_id is not None:
+                self._points.append(LiveLocation(
+                    field_staff_id=field_staff_id,
+                    service_request_id=service_request_id,
+                    latitude=latitude,
+                    longitude=longitude,
+                    timestamp=timestamp
+                ))
+            self._positions[field_staff_id] = (latitude, longitude, timestamp)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._points) >= self.max_points
+
+        remember_position(field_staff_id, service_request_id, latitude, longitude, timestamp)
+        self._ensure_worker()
+        if full:
+            self.flush()
+
+    def pending(self):
+        with self._lock:
+            return len(self._points)
+
+    def _drain(self):
+        with self._lock:
+            points, positions = self._points, self._positions
+            self._points, self._positions, self._oldest = [], {}, None
+        return points, positions
+
+    def _requeue(self, points, positions):
+        """Put a failed batch back in front of newer points, bounded by max_pending"""
+        with self._lock:
+            self._points = (points + self._points)[-self.max_pending:]
+            for field_staff_id, position in positions.items():
+                self._positions.setdefault(field_staff_id, position)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def flush(self):
+        """Write every queued point. Returns the number of LiveLocation rows inserted."""
+        with self._flush_lock:
+            points, positions = self._drain()
+            if not points and not positions:
+                return 0
+            try:
+                return self._write(points, positions)
+            except Exception:
+                logger.exception("Failed to flush %s live location points, requeueing", len(points))
+                self._requeue(points, positions)
+                return 0
+
+    def _write(self, points, positions):
+        staff = [
+            FieldStaff(
+                id=field_staff_id,
+                latitude=latitude,
+                longitude=longitude,
+                grid_cell=grid_cell(latitude, longitude),
+                location_updated_at=timestamp
+            )
+            for field_staff_id, (latitude, longitude, timestamp) in positions.items()
+        ]
+        # Foreign keys are checked at commit time, so a single ping with an
+        # unknown service request would fail the whole batch; filter first
+        points = self._valid_points(points)
+        with transaction.atomic():
+            LiveLocation.objects.bulk_create(points, batch_size=1000)
+            FieldStaff.objects.bulk_update(
+                staff,
+                ['latitude', 'longitude', 'grid_cell', 'location_updated_at'],
+                batch_size=500
+            )
+        return len(points)
+
+    @staticmethod
+    def _valid_points(points):
+        if not points:
+            return points
+        request_ids = set(ServiceRequest.objects.filter(
+            id__in={point.service_request_id for point in points}
+        ).values_list('id', flat=True))
+        staff_ids = set(FieldStaff.objects.filter(
+            id__in={point.field_staff_id for point in points}
+        ).values_list('id', flat=True))
+        valid = [
+            point for point in points
+            if point.service_request_id in request_ids and point.field_staff_id in staff_ids
+        ]
+        if len(valid) < len(points):
+            logger.warning("Dropped %s live location points with unknown references", len(points) - len(valid))
+        return valid
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='live-location-flusher', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        """Background loop that flushes points once they are older than the interval"""
+        while not self._stop.wait(self.flush_interval / 2):
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval
+            if due:
+                close_old_connections()
+                self.flush()
+                close_old_connections()
+
+    def stop(self):
+        """Stop the background flusher and write whatever is left"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+
+
+location_buffer = LocationIngestBuffer(
+    max_points=getattr(settings, 'LIVE_LOCATION_FLUSH_POINTS', 200),
+    flush_interval_ms=getattr(settings, 'LIVE_LOCATION_FLUSH_INTERVAL_MS', 1000)
+)
+atexit.register(location_buffer.stop)
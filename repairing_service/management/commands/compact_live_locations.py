@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from repairing_service.tracking import (
+    build_track_summary, compact_track, completed_requests_without_summary,
+    completed_tracks_to_compact, delete_expired_points
+)
+
+class Command(BaseCommand):
+    help = 'Simplify completed mechanic tracks and delete raw live locations past the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tolerance-m',
+            type=float,
+            default=10.0,
+            help='Maximum distance in meters between a dropped point and the simplified track (default: 10)'
+        )
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=30,
+            help='Delete raw points of uncompacted tracks older than this many days (default: 30)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows deleted per transaction (default: 5000)'
+        )
+        parser.add_argument(
+            '--min-age-minutes',
+            type=int,
+            default=10,
+            help='Only compact tracks whose summary is at least this old (default: 10)'
+        )
+
+    def handle(self, *args, **options):
+        # Requests completed before summaries existed, or whose summary failed
+        backfilled = 0
+        for service_request_id in completed_requests_without_summary().iterator():
+            build_track_summary(service_request_id)
+            backfilled += 1
+        if backfilled:
+            self.stdout.write(self.style.SUCCESS(f'Built {backfilled} missing track summaries'))
+
+        tracks = 0
+        dropped = 0
+        for summary in completed_tracks_to_compact(options['min_age_minutes']).iterator():
+            dropped += compact_track(summary, options['tolerance_m'], options['batch_size'])
+            tracks += 1
+        self.stdout.write(self.style.SUCCESS(f'Compacted {tracks} tracks, removed {dropped} redundant points'))
+
+        expired = delete_expired_points(options['retention_days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {expired} live locations past the retention window'))
@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from repairing_service.services import BookingTotalService
+
+class Command(BaseCommand):
+    help = 'Set the total of bookings saved with a zero total_amount to the sum of their service prices'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Bookings scanned per transaction (default: 500)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep reconciling every --interval seconds instead of exiting'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=300,
+            help='Seconds between runs when running with --loop (default: 300)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            updated = BookingTotalService.reconcile_zero_totals(batch_size=options['batch_size'])
+            if updated or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Reconciled {updated} booking totals'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,39 @@
+import time
+from django.core.management.base import BaseCommand
+from repairing_service.dashboard_counters import flush, reconcile
+
+class Command(BaseCommand):
+    help = 'Recompute the admin dashboard counters from the tables, correcting any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--flush-only',
+            action='store_true',
+            help='Only move the pending totals from the cache into the counters row, without recomputing'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep reconciling every --interval seconds instead of exiting'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=300,
+            help='Seconds between runs when running with --loop (default: 300)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            if options['flush_only']:
+                moved = flush()
+                if moved or not options['loop']:
+                    self.stdout.write(self.style.SUCCESS(f'Flushed {len(moved)} pending dashboard counters'))
+            else:
+                drift = reconcile()
+                if drift or not options['loop']:
+                    corrected = ', '.join(f'{name} {value:+}' for name, value in sorted(drift.items())) or 'no drift'
+                    self.stdout.write(self.style.SUCCESS(f'Reconciled dashboard counters: {corrected}'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
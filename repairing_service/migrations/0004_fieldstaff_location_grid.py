@@ -0,0 +1,78 @@
+# Generated by Django 5.2 on 2026-10-18 22:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repairing_service", "0003_servicerequest_purchase_type"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fieldstaff",
+            name="current_job",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="assigned_field_staff",
+                to="repairing_service.servicerequest",
+            ),
+        ),
+        migrations.AddField(
+            model_name="fieldstaff",
+            name="grid_cell",
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="fieldstaff",
+            name="is_available",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="fieldstaff",
+            name="latitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="fieldstaff",
+            name="location_updated_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="fieldstaff",
+            name="longitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="fieldstaff",
+            name="rating",
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name="fieldstaff",
+            name="total_jobs",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="fieldstaff",
+            name="user",
+            field=models.OneToOneField(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="fieldstaff",
+            index=models.Index(
+                fields=["grid_cell", "is_available"], name="fieldstaff_grid_cell_idx"
+            ),
+        ),
+    ]
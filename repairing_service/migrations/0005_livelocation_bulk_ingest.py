@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 22:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repairing_service", "0004_fieldstaff_location_grid"),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name="livelocation",
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name="livelocation",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
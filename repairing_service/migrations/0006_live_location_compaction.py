@@ -0,0 +1,82 @@
+# Generated by Django 5.2 on 2026-10-18 22:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repairing_service", "0005_livelocation_bulk_ingest"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrackSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("distance_km", models.FloatField(default=0.0)),
+                ("duration_seconds", models.PositiveIntegerField(default=0)),
+                ("average_speed_kmh", models.FloatField(default=0.0)),
+                (
+                    "point_count",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Raw points when the summary was built"
+                    ),
+                ),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("ended_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "computed_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "compacted_at",
+                    models.DateTimeField(blank=True, db_index=True, null=True),
+                ),
+                (
+                    "compacted_point_count",
+                    models.PositiveIntegerField(blank=True, null=True),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="livelocation",
+            index=models.Index(
+                fields=["service_request", "timestamp"],
+                name="livelocation_request_ts_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="livelocation",
+            index=models.Index(fields=["timestamp"], name="livelocation_ts_idx"),
+        ),
+        migrations.AddField(
+            model_name="tracksummary",
+            name="field_staff",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="repairing_service.fieldstaff",
+            ),
+        ),
+        migrations.AddField(
+            model_name="tracksummary",
+            name="service_request",
+            field=models.OneToOneField(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="track_summary",
+                to="repairing_service.servicerequest",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 22:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repairing_service", "0006_live_location_compaction"),
+        ("vehicle", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="servicerequest",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="servicereq_user_created_idx",
+            ),
+        ),
+    ]
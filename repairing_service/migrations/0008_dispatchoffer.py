@@ -0,0 +1,60 @@
+# Generated by Django 5.2 on 2026-10-18 22:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repairing_service", "0007_servicerequest_user_created_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DispatchOffer",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("wave", models.PositiveSmallIntegerField(default=1)),
+                ("score", models.FloatField(default=0.0)),
+                ("distance_km", models.FloatField(blank=True, null=True)),
+                ("offered_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("responded_at", models.DateTimeField(blank=True, null=True)),
+                ("accepted", models.BooleanField(default=False)),
+                (
+                    "field_staff",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="dispatch_offers",
+                        to="repairing_service.fieldstaff",
+                    ),
+                ),
+                (
+                    "service_request",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="dispatch_offers",
+                        to="repairing_service.servicerequest",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["field_staff", "offered_at"],
+                        name="dispatchoffer_staff_idx",
+                    )
+                ],
+                "unique_together": {("service_request", "field_staff")},
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-18 22:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repairing_service", "0008_dispatchoffer"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ServiceCenter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                ("address", models.TextField(blank=True)),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+                ("is_active", models.BooleanField(default=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="distancepricingrule",
+            name="service_center",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Center this rule prices from; rules without one use the coordinates below",
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="pricing_rules",
+                to="repairing_service.servicecenter",
+            ),
+        ),
+    ]
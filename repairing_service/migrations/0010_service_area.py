@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-18 22:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repairing_service", "0009_service_center"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ServiceArea",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                (
+                    "geojson",
+                    models.JSONField(
+                        help_text="GeoJSON Polygon or MultiPolygon, coordinates as [longitude, latitude]"
+                    ),
+                ),
+                ("is_active", models.BooleanField(default=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "service_center",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="service_areas",
+                        to="repairing_service.servicecenter",
+                    ),
+                ),
+            ],
+        ),
+    ]
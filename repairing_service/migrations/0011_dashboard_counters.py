@@ -0,0 +1,62 @@
+# Generated by Django 5.2 on 2026-10-18 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repairing_service", "0010_service_area"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DashboardCounters",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("users_total", models.IntegerField(default=0)),
+                ("users_active", models.IntegerField(default=0)),
+                ("users_new_30d", models.IntegerField(default=0)),
+                ("vehicles_total", models.IntegerField(default=0)),
+                ("vehicles_for_sale", models.IntegerField(default=0)),
+                ("user_vehicles_total", models.IntegerField(default=0)),
+                ("sell_requests_total", models.IntegerField(default=0)),
+                ("sell_requests_pending", models.IntegerField(default=0)),
+                ("service_requests_total", models.IntegerField(default=0)),
+                ("service_requests_pending", models.IntegerField(default=0)),
+                ("service_requests_completed", models.IntegerField(default=0)),
+                ("subscriptions_active", models.IntegerField(default=0)),
+                ("subscriptions_pending", models.IntegerField(default=0)),
+                ("visits_upcoming", models.IntegerField(default=0)),
+                ("visits_completed", models.IntegerField(default=0)),
+                (
+                    "vehicle_revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "service_revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "trends",
+                    models.JSONField(
+                        blank=True,
+                        default=dict,
+                        help_text="Daily new users and service requests, last 30 days",
+                    ),
+                ),
+                ("reconciled_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name_plural": "Dashboard counters",
+            },
+        ),
+    ]
@@ -4,7 +4,9 @@ from django.dispatch import receiver
 import uuid
 from django.db import connection
 from cloudinary.models import CloudinaryField
-# Removed unused import for django.utils.timezone
+from utils.geo import haversine_km, distances_from
+from utils.loaded_values import LoadedValuesMixin
+from django.utils import timezone
 
 class Feature(models.Model):
     name = models.CharField(max_length=255)
@@ -77,11 +79,14 @@ class Service(models.Model):
         return self.base_price
 
     def get_price(self, manufacturer=None, vehicle_model=None):
-        try:
-            if (manufacturer and vehicle_model):
-                return ServicePrice.objects.get(service=self, manufacturer=manufacturer, vehicle_model=vehicle_model).price
-        except ServicePrice.DoesNotExist:
-            return self.base_price
+        # Served from the in-memory price matrix, falling back to base_price
+        from .price_matrix import price_matrix
+        price = price_matrix.price(
+            self.id,
+            getattr(manufacturer, 'pk', manufacturer),
+            getattr(vehicle_model, 'pk', vehicle_model)
+        )
+        return self.base_price if price is None else price
 
     def __str__(self):
         return self.name
@@ -138,35 +143,88 @@ class CartItem(models.Model):
         return f"{self.quantity} x {self.service.name} in Cart {self.cart.id}"
 
 class FieldStaff(models.Model):
-    def __str__(self):
-        return self.user.username
-
-    def update_location(self, latitude, longitude):
-        self.latitude = latitude
-        self.longitude = longitude
-        self.save()
-
-    def is_within_radius(self, customer_latitude, customer_longitude):
-        # Radius in kilometers
-        radius = 5
-        earth_radius = 6371  # Earth radius in kilometers
-
-        lat1_rad = math.radians(self.latitude)
-        lon1_rad = math.radians(self.longitude)
-        lat2_rad = math.radians(customer_latitude)
-        lon2_rad = math.radians(customer_longitude)
+    user = models.OneToOneField('accounts.User', on_delete=models.CASCADE, null=True, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Spatial grid cell of the current location, see repairing_service.spatial
+    grid_cell = models.BigIntegerField(null=True, blank=True, editable=False)
+    location_updated_at = models.DateTimeField(null=True, blank=True)
+    is_available = models.BooleanField(default=False)
+    current_job = models.ForeignKey(
+        'ServiceRequest',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='assigned_field_staff'
+    )
+    rating = models.FloatField(default=0.0)
+    total_jobs = models.PositiveIntegerField(default=0)
 
-        dlon = lon2_rad - lon1_rad
-        dlat = lat2_rad - lat1_rad
+    class Meta:
+        indexes = [
+            models.Index(fields=['grid_cell', 'is_available'], name='fieldstaff_grid_cell_idx'),
+        ]
 
-        a = math.sin(dlat / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    def __str__(self):
+        return self.user.username if self.user else f"Field staff {self.pk}"
 
-        distance = earth_radius * c
+    def save(self, *args, **kwargs):
+        from .spatial import grid_cell
+        self.grid_cell = grid_cell(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and ('latitude' in update_fields or 'longitude' in update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'grid_cell'}
+        super().save(*args, **kwargs)
 
-        return distance <= radius
+    def update_location(self, latitude, longitude):
+        self.latitude = float(latitude)
+        self.longitude = float(longitude)
+        self.location_updated_at = timezone.now()
+        self.save(update_fields=['latitude', 'longitude', 'grid_cell', 'location_updated_at'])
+        from .positions import remember_position
+        remember_position(self.id, self.current_job_id, self.latitude, self.longitude, self.location_updated_at)
+
+    def distance_to(self, latitude, longitude):
+        """Distance in kilometers from the mechanic's current location"""
+        return haversine_km(self.latitude, self.longitude, latitude, longitude)
+
+    def is_within_radius(self, customer_latitude, customer_longitude, radius=5):
+        # Radius in kilometers
+        if self.latitude is None or self.longitude is None:
+            return False
+        return self.distance_to(customer_latitude, customer_longitude) <= radius
 
-class ServiceRequest(models.Model):
+    @classmethod
+    def find_nearby(cls, latitude, longitude, radius_km=5.0, available_only=True, queryset=None):
+        """
+        Mechanics within radius_km of a point, nearest first.
+        Candidates come from the grid cells around the point (an indexed
+        lookup) and are then refined with the exact distance, which is
+        stored on each returned instance as distance_km.
+        """
+        from .spatial import cells_within
+        candidates = queryset if queryset is not None else cls.objects.all()
+        candidates = candidates.filter(grid_cell__in=cells_within(latitude, longitude, radius_km))
+        if available_only:
+            candidates = candidates.filter(is_available=True, current_job__isnull=True)
+
+        candidates = list(candidates.select_related('user'))
+        if not candidates:
+            return []
+        distances = distances_from(
+            latitude, longitude,
+            [mechanic.latitude for mechanic in candidates],
+            [mechanic.longitude for mechanic in candidates]
+        )
+        nearby = []
+        for mechanic, distance in zip(candidates, distances.tolist()):
+            if distance <= radius_km:
+                mechanic.distance_km = distance
+                nearby.append(mechanic)
+        nearby.sort(key=lambda mechanic: mechanic.distance_km)
+        return nearby
+
+class ServiceRequest(LoadedValuesMixin, models.Model):
     # Add status choices
     STATUS_PENDING = 'pending'
     STATUS_CONFIRMED = 'confirmed'
@@ -191,6 +249,12 @@ class ServiceRequest(models.Model):
         (PURCHASE_TYPE_CART, 'Cart Checkout'),
     ]
 
+    class Meta:
+        indexes = [
+            # Serves the user's bookings list, paginated by (created_at, id)
+            models.Index(fields=['user', '-created_at', '-id'], name='servicereq_user_created_idx'),
+        ]
+
     user = models.ForeignKey('accounts.User', on_delete=models.CASCADE, null=True, blank=True)
     customer_name = models.CharField(max_length=255, null=True, blank=True, default="Customer")
     customer_email = models.EmailField(null=True, blank=True, default="customer@example.com")
@@ -259,6 +323,13 @@ class ServiceRequest(models.Model):
                 return False
         return False
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the loaded status so completion can be detected on save"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
     def __str__(self):
         return f"Service Request {self.reference or self.id}"
 
@@ -271,23 +342,151 @@ class ServiceRequestResponse(models.Model):
     accepted = models.BooleanField(default=False)
     estimated_arrival_time = models.DateTimeField(null=True, blank=True)
 
+class DispatchOffer(models.Model):
+    """A service request offered to one mechanic by the dispatch engine"""
+    class Meta:
+        unique_together = ('service_request', 'field_staff')
+        indexes = [
+            models.Index(fields=['field_staff', 'offered_at'], name='dispatchoffer_staff_idx'),
+        ]
+
+    service_request = models.ForeignKey(ServiceRequest, on_delete=models.CASCADE, related_name='dispatch_offers')
+    field_staff = models.ForeignKey(FieldStaff, on_delete=models.CASCADE, related_name='dispatch_offers')
+    wave = models.PositiveSmallIntegerField(default=1)
+    score = models.FloatField(default=0.0)
+    distance_km = models.FloatField(null=True, blank=True)
+    offered_at = models.DateTimeField(default=timezone.now)
+    responded_at = models.DateTimeField(null=True, blank=True)
+    accepted = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"Offer of {self.service_request} to {self.field_staff} (wave {self.wave})"
+
 class LiveLocation(models.Model):
+    # One row per location ping; rows are usually written in bulk by
+    # repairing_service.location_ingest, so timestamp is the ping time
     class Meta:
-        unique_together = ('field_staff', 'service_request')
+        indexes = [
+            models.Index(fields=['service_request', 'timestamp'], name='livelocation_request_ts_idx'),
+            models.Index(fields=['timestamp'], name='livelocation_ts_idx'),
+        ]
 
     field_staff = models.ForeignKey(FieldStaff, on_delete=models.CASCADE)
     service_request = models.ForeignKey(ServiceRequest, on_delete=models.CASCADE)
     latitude = models.FloatField()
     longitude = models.FloatField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
+
+class TrackSummary(models.Model):
+    """
+    Precomputed statistics of a service request's mechanic track, built once
+    when the request completes. Also records whether the stored track has
+    been simplified by the compaction job.
+    """
+    service_request = models.OneToOneField(ServiceRequest, on_delete=models.CASCADE, related_name='track_summary')
+    field_staff = models.ForeignKey(FieldStaff, on_delete=models.SET_NULL, null=True, blank=True)
+    distance_km = models.FloatField(default=0.0)
+    duration_seconds = models.PositiveIntegerField(default=0)
+    average_speed_kmh = models.FloatField(default=0.0)
+    point_count = models.PositiveIntegerField(default=0, help_text="Raw points when the summary was built")
+    started_at = models.DateTimeField(null=True, blank=True)
+    ended_at = models.DateTimeField(null=True, blank=True)
+    computed_at = models.DateTimeField(default=timezone.now)
+    compacted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    compacted_point_count = models.PositiveIntegerField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Track of {self.service_request}: {self.distance_km:.2f} km"
+
+class DashboardCounters(models.Model):
+    """
+    Totals shown on the admin dashboards, as a single row (pk=1). Saves and
+    deletes of the counted models add their difference to pending totals in
+    the cache, which flushes move here (see repairing_service.dashboard_counters);
+    the reconcile_dashboard_counters command recomputes everything, including
+    the time-windowed counters and the daily trends.
+    """
+    users_total = models.IntegerField(default=0)
+    users_active = models.IntegerField(default=0)
+    users_new_30d = models.IntegerField(default=0)
+    vehicles_total = models.IntegerField(default=0)
+    vehicles_for_sale = models.IntegerField(default=0)
+    user_vehicles_total = models.IntegerField(default=0)
+    sell_requests_total = models.IntegerField(default=0)
+    sell_requests_pending = models.IntegerField(default=0)
+    service_requests_total = models.IntegerField(default=0)
+    service_requests_pending = models.IntegerField(default=0)
+    service_requests_completed = models.IntegerField(default=0)
+    subscriptions_active = models.IntegerField(default=0)
+    subscriptions_pending = models.IntegerField(default=0)
+    visits_upcoming = models.IntegerField(default=0)
+    visits_completed = models.IntegerField(default=0)
+    vehicle_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    service_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    trends = models.JSONField(default=dict, blank=True, help_text="Daily new users and service requests, last 30 days")
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Dashboard counters"
+
+    def __str__(self):
+        return f"Dashboard counters (reconciled {self.reconciled_at})"
+
+class ServiceCenter(models.Model):
+    """
+    A workshop mechanics are sent from. Travel fees are charged from the
+    customer's nearest active center using that center's pricing rule, see
+    repairing_service.distance_pricing.
+    """
+    name = models.CharField(max_length=100)
+    address = models.TextField(blank=True)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+class ServiceArea(models.Model):
+    """
+    Area we serve, as a GeoJSON Polygon or MultiPolygon (a Feature wrapping
+    one is accepted too). Requests outside every active area are rejected,
+    see repairing_service.service_areas. With no active areas every location
+    is served.
+    """
+    name = models.CharField(max_length=100)
+    service_center = models.ForeignKey(
+        ServiceCenter, on_delete=models.SET_NULL, null=True, blank=True, related_name='service_areas'
+    )
+    geojson = models.JSONField(help_text="GeoJSON Polygon or MultiPolygon, coordinates as [longitude, latitude]")
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from .service_areas import polygons_of
+        try:
+            polygons_of(self.geojson)
+        except ValueError as e:
+            raise ValidationError({'geojson': str(e)})
 
 class DistancePricingRule(models.Model):
     def __str__(self):
+        if self.service_center_id:
+            return f"Distance Pricing Rule for {self.service_center} (Active: {self.is_active})"
         return f"Distance Pricing Rule (Active: {self.is_active})"
 
     class Meta:
         verbose_name_plural = "Distance Pricing Rules"
 
+    service_center = models.ForeignKey(
+        ServiceCenter, on_delete=models.CASCADE, null=True, blank=True, related_name='pricing_rules',
+        help_text="Center this rule prices from; rules without one use the coordinates below"
+    )
     is_active = models.BooleanField(default=True)
     service_center_latitude = models.FloatField(default=0.0, help_text="Latitude of the service center")
     service_center_longitude = models.FloatField(default=0.0, help_text="Longitude of the service center")
@@ -297,10 +496,9 @@ class DistancePricingRule(models.Model):
 
     @classmethod
     def get_active_rule(cls):
-        try:
-            return cls.objects.get(is_active=True)
-        except cls.DoesNotExist:
-            return None
+        # Cached; the newest rule wins when several are active
+        from .distance_pricing import active_rule
+        return active_rule()
 
     def calculate_charges(self, customer_latitude, customer_longitude):
         """Calculate distance-based charges"""
@@ -325,21 +523,8 @@ class DistancePricingRule(models.Model):
         
     def calculate_distance(self, lat1, lon1, lat2, lon2):
         """Calculate distance between two points using Haversine formula"""
-        import math
-        
-        # Convert to radians
-        lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-        
-        # Haversine formula
-        dlon = lon2 - lon1
-        dlat = lat2 - lat1
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.asin(math.sqrt(a))
-        r = 6371  # Radius of earth in kilometers
-        
-        return c * r
+        return haversine_km(lat1, lon1, lat2, lon2)
 
-import math
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
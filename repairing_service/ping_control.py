@@ -0,0 +1,130 @@
+"""
+Rate control for the location pings a mechanic's websocket sends.
+
+Each connection owns a PingGate that classifies every ping:
+
+- dropped: the same coordinates as the previous ping, sent again before
+  LIVE_LOCATION_MIN_INTERVAL_SECONDS has passed;
+- accepted: broadcast to the customer right away, at most once per
+  LIVE_LOCATION_BROADCAST_INTERVAL_MS;
+- coalesced: arrived sooner than that; the consumer broadcasts only the
+  latest such point once the interval is over.
+
+Independently of the broadcast, a ping is persisted (queued in
+repairing_service.location_ingest) only when the mechanic moved at least
+LIVE_LOCATION_MIN_DISTANCE_M or LIVE_LOCATION_MIN_INTERVAL_SECONDS passed
+since the last persisted ping.
+
+ping_counters counts the three outcomes. Counts are kept per process and
+added to shared cache counters every few seconds, so totals() reports all
+workers.
+"""
+import threading
+import time
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import cache
+from utils.geo import haversine_km
+
+ACCEPTED = 'accepted'
+COALESCED = 'coalesced'
+DROPPED = 'dropped'
+OUTCOMES = (ACCEPTED, COALESCED, DROPPED)
+
+BROADCAST_INTERVAL = getattr(settings, 'LIVE_LOCATION_BROADCAST_INTERVAL_MS', 1000) / 1000.0
+MIN_DISTANCE_M = getattr(settings, 'LIVE_LOCATION_MIN_DISTANCE_M', 10.0)
+MIN_INTERVAL = getattr(settings, 'LIVE_LOCATION_MIN_INTERVAL_SECONDS', 15.0)
+
+# Coordinates closer than this (about 10 cm) are the same point
+COORDINATE_DECIMALS = 6
+
+Decision = namedtuple('Decision', ['outcome', 'persist'])
+
+
+class PingGate:
+    """Broadcast and persistence decisions for one mechanic's pings"""
+
+    def __init__(self, broadcast_interval=BROADCAST_INTERVAL, min_distance_m=MIN_DISTANCE_M, min_interval=MIN_INTERVAL):
+        self.broadcast_interval = broadcast_interval
+        self.min_distance_km = min_distance_m / 1000.0
+        self.min_interval = min_interval
+        self._last_point = None
+        self._last_point_at = None
+        self._persisted = None
+        self._persisted_at = None
+        self._broadcast_at = None
+
+    def check(self, latitude, longitude, now=None):
+        now = time.monotonic() if now is None else now
+        latitude, longitude = float(latitude), float(longitude)
+        point = (round(latitude, COORDINATE_DECIMALS), round(longitude, COORDINATE_DECIMALS))
+        if point == self._last_point and now - self._last_point_at < self.min_interval:
+            return Decision(DROPPED, False)
+        self._last_point, self._last_point_at = point, now
+
+        persist = (
+            self._persisted is None
+            or now - self._persisted_at >= self.min_interval
+            or haversine_km(self._persisted[0], self._persisted[1], latitude, longitude) >= self.min_distance_km
+        )
+        if persist:
+            self._persisted, self._persisted_at = (latitude, longitude), now
+
+        if self._broadcast_at is None or now - self._broadcast_at >= self.broadcast_interval:
+            self._broadcast_at = now
+            return Decision(ACCEPTED, persist)
+        return Decision(COALESCED, persist)
+
+    def broadcast_delay(self, now=None):
+        """Seconds until a coalesced ping may be broadcast"""
+        if self._broadcast_at is None:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        return max(self._broadcast_at + self.broadcast_interval - now, 0.0)
+
+    def broadcasted(self, now=None):
+        """Record that the coalesced ping was sent"""
+        self._broadcast_at = time.monotonic() if now is None else now
+
+
+class PingCounters:
+    """Outcome counts, published to the cache in batches"""
+
+    def __init__(self, publish_interval=5.0):
+        self.publish_interval = publish_interval
+        self._pending = dict.fromkeys(OUTCOMES, 0)
+        self._published_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(outcome):
+        return f'location_pings_{outcome}'
+
+    def add(self, outcome):
+        with self._lock:
+            self._pending[outcome] += 1
+            due = time.monotonic() - self._published_at >= self.publish_interval
+        if due:
+            self.publish()
+
+    def publish(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = dict.fromkeys(OUTCOMES, 0)
+            self._published_at = time.monotonic()
+        for outcome, count in pending.items():
+            if count:
+                cache.add(self.key(outcome), 0, None)
+                try:
+                    cache.incr(self.key(outcome), count)
+                except ValueError:
+                    cache.set(self.key(outcome), count, None)
+
+    def totals(self):
+        """Counts across every process, including this one's unpublished ones"""
+        self.publish()
+        stored = cache.get_many([self.key(outcome) for outcome in OUTCOMES])
+        return {outcome: stored.get(self.key(outcome), 0) for outcome in OUTCOMES}
+
+
+ping_counters = PingCounters()
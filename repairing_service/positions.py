@@ -0,0 +1,95 @@
+"""
+Latest known position per service request and per mechanic.
+
+The ingest path writes every ping here as it arrives, so tracking reads are
+a cache lookup instead of a query against the growing LiveLocation table.
+On a miss the position is read once from the database (an indexed
+ORDER BY timestamp DESC LIMIT 1 for a service request, the FieldStaff row
+for a mechanic) and put back in the cache.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from .models import FieldStaff, LiveLocation
+
+POSITION_TIMEOUT = getattr(settings, 'LIVE_LOCATION_CACHE_TIMEOUT', 60 * 60 * 6)
+
+
+def request_position_key(service_request_id):
+    return f'live_position_request_{service_request_id}'
+
+
+def staff_position_key(field_staff_id):
+    return f'live_position_staff_{field_staff_id}'
+
+
+def position_payload(field_staff_id, service_request_id, latitude, longitude, timestamp):
+    return {
+        'field_staff': field_staff_id,
+        'service_request': service_request_id,
+        'latitude': latitude,
+        'longitude': longitude,
+        'timestamp': timestamp,
+    }
+
+
+def remember_position(field_staff_id, service_request_id, latitude, longitude, timestamp):
+    """Store a ping as the latest position of its mechanic and service request"""
+    payload = position_payload(field_staff_id, service_request_id, latitude, longitude, timestamp)
+    entries = {staff_position_key(field_staff_id): payload}
+    if service_request_id is not None:
+        entries[request_position_key(service_request_id)] = payload
+    cache.set_many(entries, POSITION_TIMEOUT)
+
+
+def _newer(cached, payload):
+    return cached is None or cached['timestamp'] <= payload['timestamp']
+
+
+def request_position(service_request_id):
+    """Latest position of the mechanic on a service request, or None"""
+    key = request_position_key(service_request_id)
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
+
+    location = (
+        LiveLocation.objects
+        .filter(service_request_id=service_request_id)
+        .order_by('-timestamp', '-id')
+        .values_list('field_staff_id', 'latitude', 'longitude', 'timestamp')
+        .first()
+    )
+    if location is None:
+        return None
+    field_staff_id, latitude, longitude, timestamp = location
+    payload = position_payload(field_staff_id, service_request_id, latitude, longitude, timestamp)
+    # A ping may have been cached while we were reading
+    cached = cache.get(key)
+    if not _newer(cached, payload):
+        return cached
+    cache.set(key, payload, POSITION_TIMEOUT)
+    return payload
+
+
+def staff_position(field_staff_id):
+    """Latest position of a mechanic, or None if it never reported one"""
+    key = staff_position_key(field_staff_id)
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
+
+    staff = (
+        FieldStaff.objects
+        .filter(id=field_staff_id, location_updated_at__isnull=False)
+        .values_list('current_job_id', 'latitude', 'longitude', 'location_updated_at')
+        .first()
+    )
+    if staff is None:
+        return None
+    current_job_id, latitude, longitude, timestamp = staff
+    payload = position_payload(field_staff_id, current_job_id, latitude, longitude, timestamp)
+    cached = cache.get(key)
+    if not _newer(cached, payload):
+        return cached
+    cache.set(key, payload, POSITION_TIMEOUT)
+    return payload
@@ -0,0 +1,98 @@
+"""
+In-memory matrix of service prices per vehicle.
+
+Every process keeps the full price list in memory, keyed by
+(service_id, manufacturer_id, vehicle_model_id), with the service's base
+price as the fallback. It is loaded with a single query (services LEFT JOIN
+their ServicePrice rows) and tagged with the 'service_prices' cache
+namespace version. Writes to Service or ServicePrice bump that version
+(see repairing_service.signals), and every process reloads its copy the
+next time it reads a price under a newer version.
+"""
+import threading
+from collections import namedtuple
+from tools.cache_utils import get_namespace_version, invalidate_namespace
+from .models import Service
+
+NAMESPACE = 'service_prices'
+
+# base_prices, names: service_id -> value
+# custom: (service_id, manufacturer_id, vehicle_model_id) -> (price, ServicePrice id)
+# by_model: vehicle_model_id -> {service_id: (price, ServicePrice id)}
+Matrix = namedtuple('Matrix', ['version', 'base_prices', 'names', 'custom', 'by_model'])
+
+
+class PriceMatrix:
+    def __init__(self):
+        self._matrix = None
+        self._lock = threading.Lock()
+
+    def _load(self, version):
+        rows = Service.objects.values_list(
+            'id', 'name', 'base_price',
+            'serviceprice__id', 'serviceprice__manufacturer_id',
+            'serviceprice__vehicle_model_id', 'serviceprice__price'
+        )
+        base_prices, names, custom, by_model = {}, {}, {}, {}
+        for service_id, name, base_price, price_id, manufacturer_id, vehicle_model_id, price in rows:
+            base_prices[service_id] = base_price
+            names[service_id] = name
+            if price_id is None:
+                continue
+            custom[(service_id, manufacturer_id, vehicle_model_id)] = (price, price_id)
+            if vehicle_model_id is not None:
+                by_model.setdefault(vehicle_model_id, {})[service_id] = (price, price_id)
+        return Matrix(version, base_prices, names, custom, by_model)
+
+    def _current(self):
+        version = get_namespace_version(NAMESPACE)
+        matrix = self._matrix
+        if matrix is None or matrix.version != version:
+            with self._lock:
+                matrix = self._matrix
+                if matrix is None or matrix.version != version:
+                    matrix = self._matrix = self._load(version)
+        return matrix
+
+    def lookup(self, service_id, manufacturer_id=None, vehicle_model_id=None):
+        """
+        (price, ServicePrice id) for a service on a vehicle. Falls back to
+        (base price, None) when there is no specific price and returns None
+        if the service does not exist.
+        """
+        matrix = self._current()
+        service_id = int(service_id)
+        manufacturer_id = int(manufacturer_id) if manufacturer_id else None
+        vehicle_model_id = int(vehicle_model_id) if vehicle_model_id else None
+        found = matrix.custom.get((service_id, manufacturer_id, vehicle_model_id))
+        if found is not None:
+            return found
+        if service_id not in matrix.base_prices:
+            return None
+        return matrix.base_prices[service_id], None
+
+    def price(self, service_id, manufacturer_id=None, vehicle_model_id=None):
+        found = self.lookup(service_id, manufacturer_id, vehicle_model_id)
+        return found[0] if found is not None else None
+
+    def prices_for_model(self, vehicle_model_id):
+        """Price of every service for one vehicle model, ordered by service id"""
+        matrix = self._current()
+        custom = matrix.by_model.get(int(vehicle_model_id), {})
+        return [
+            {
+                'service': service_id,
+                'service_name': matrix.names[service_id],
+                'price': str(custom.get(service_id, (base_price,))[0]),
+                'is_custom_price': service_id in custom,
+            }
+            for service_id, base_price in sorted(matrix.base_prices.items())
+        ]
+
+    def invalidate(self):
+        """Make every process reload the matrix on its next read"""
+        invalidate_namespace(NAMESPACE)
+        self._matrix = None
+
+
+price_matrix = PriceMatrix()
@@ -86,7 +86,14 @@ class CartSerializer(serializers.ModelSerializer):
 class FieldStaffSerializer(serializers.ModelSerializer):
     class Meta:
         model = FieldStaff
-        fields = '__all__'
+        fields = [
+            'id', 'user', 'latitude', 'longitude', 'location_updated_at', 'is_available', 'current_job',
+            'rating', 'total_jobs'
+        ]
+        # Maintained by the location ingest, dispatch and job completion, never by API clients
+        read_only_fields = [
+            'latitude', 'longitude', 'location_updated_at', 'is_available', 'current_job', 'rating', 'total_jobs'
+        ]
 
 class ServiceRequestSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,147 @@
+"""
+Service-area membership tests against GeoJSON polygons.
+
+Each process keeps the active ServiceArea polygons with their bounding boxes
+and a grid over the globe (AREA_GRID_DEGREES cells) mapping every cell to
+the polygons whose bounding box overlaps it. A lookup only ray-casts the
+few polygons registered in the point's cell, with the point-in-polygon test
+vectorized over all edges (utils.geo.points_in_rings). The index is tagged
+with the 'service_areas' namespace version; ServiceArea writes bump it (see
+repairing_service.signals) and the next lookup rebuilds it.
+
+When no area is active every location is considered served.
+"""
+import math
+import threading
+import numpy as np
+from tools.cache_utils import get_namespace_version, invalidate_namespace
+from utils.geo import points_in_rings
+from .models import ServiceArea
+
+NAMESPACE = 'service_areas'
+
+AREA_GRID_DEGREES = 0.5
+
+
+def _ring(coordinates):
+    ring = np.asarray(coordinates, dtype=np.float64)
+    if ring.ndim != 2 or ring.shape[0] < 4 or ring.shape[1] < 2:
+        raise ValueError("Each ring needs at least four [longitude, latitude] positions")
+    if not np.isfinite(ring[:, :2]).all():
+        raise ValueError("Coordinates must be numbers")
+    return ring[:, :2]
+
+
+def polygons_of(geojson):
+    """Polygons of a GeoJSON geometry as lists of rings; raises ValueError if it is not a (Multi)Polygon"""
+    if isinstance(geojson, dict) and geojson.get('type') == 'Feature':
+        geojson = geojson.get('geometry')
+    if not isinstance(geojson, dict):
+        raise ValueError("Expected a GeoJSON object")
+    kind, coordinates = geojson.get('type'), geojson.get('coordinates')
+    try:
+        if kind == 'Polygon':
+            return [[_ring(ring) for ring in coordinates]]
+        if kind == 'MultiPolygon':
+            return [[_ring(ring) for ring in polygon] for polygon in coordinates]
+    except TypeError:
+        raise ValueError("Malformed coordinates")
+    raise ValueError("Only Polygon and MultiPolygon geometries are supported")
+
+
+def _cell(latitude, longitude):
+    return int(math.floor(latitude / AREA_GRID_DEGREES)), int(math.floor(longitude / AREA_GRID_DEGREES))
+
+
+class AreaIndex:
+    def __init__(self, version):
+        self.version = version
+        # One entry per polygon: (area id, rings, (min_lon, min_lat, max_lon, max_lat))
+        self.polygons = []
+        self.grid = {}
+        for area_id, geojson in ServiceArea.objects.filter(is_active=True).values_list('id', 'geojson'):
+            try:
+                polygons = polygons_of(geojson)
+            except ValueError:
+                continue
+            for rings in polygons:
+                outer = rings[0]
+                box = (outer[:, 0].min(), outer[:, 1].min(), outer[:, 0].max(), outer[:, 1].max())
+                self._register(len(self.polygons), box)
+                self.polygons.append((area_id, rings, box))
+
+    def _register(self, position, box):
+        first_row, first_column = _cell(box[1], box[0])
+        last_row, last_column = _cell(box[3], box[2])
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                self.grid.setdefault((row, column), []).append(position)
+
+    def area_at(self, latitude, longitude):
+        """Id of an active area containing the point, or None"""
+        for position in self.grid.get(_cell(latitude, longitude), ()):
+            area_id, rings, (min_lon, min_lat, max_lon, max_lat) = self.polygons[position]
+            if min_lon <= longitude <= max_lon and min_lat <= latitude <= max_lat:
+                if points_in_rings([latitude], [longitude], rings)[0]:
+                    return area_id
+        return None
+
+    def areas_at(self, latitudes, longitudes):
+        """Area id per point (0 where outside every area) as an integer array"""
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        found = np.zeros(len(latitudes), dtype=np.int64)
+        rows = np.floor(latitudes / AREA_GRID_DEGREES).astype(np.int64)
+        columns = np.floor(longitudes / AREA_GRID_DEGREES).astype(np.int64)
+        candidates = set()
+        for cell in set(zip(rows.tolist(), columns.tolist())):
+            candidates.update(self.grid.get(cell, ()))
+        for position in sorted(candidates):
+            area_id, rings, (min_lon, min_lat, max_lon, max_lat) = self.polygons[position]
+            pending = np.flatnonzero(
+                (found == 0)
+                & (longitudes >= min_lon) & (longitudes <= max_lon)
+                & (latitudes >= min_lat) & (latitudes <= max_lat)
+            )
+            if pending.size:
+                inside = points_in_rings(latitudes[pending], longitudes[pending], rings)
+                found[pending[inside]] = area_id
+        return found
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def area_index():
+    global _index
+    version = get_namespace_version(NAMESPACE)
+    index = _index
+    if index is None or index.version != version:
+        with _lock:
+            index = _index
+            if index is None or index.version != version:
+                index = _index = AreaIndex(version)
+    return index
+
+
+def is_served(latitude, longitude):
+    """Whether a location is inside an active service area (always true when none are defined)"""
+    index = area_index()
+    if not index.polygons:
+        return True
+    return index.area_at(float(latitude), float(longitude)) is not None
+
+
+def served_mask(latitudes, longitudes):
+    """is_served for many points at once, as a boolean array"""
+    index = area_index()
+    if not index.polygons:
+        return np.ones(len(latitudes), dtype=bool)
+    return index.areas_at(latitudes, longitudes) != 0
+
+
+def invalidate_areas():
+    global _index
+    invalidate_namespace(NAMESPACE)
+    _index = None
@@ -1,11 +1,17 @@
+import asyncio
 from django.db import transaction
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+from channels.db import database_sync_to_async
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-from .models import ServiceRequest, FieldStaff, ServiceRequestResponse, LiveLocation, DistancePricingRule
-from math import sin, cos, sqrt, atan2, radians
+from .models import ServiceRequest, FieldStaff, ServiceRequestResponse, DispatchOffer
+from .location_ingest import location_buffer
+from .dashboard_counters import record_update
+from .dispatch import record_response, start_dispatch
+from .distance_pricing import distance_fees, pricing_for
+from utils.geo import haversine_km
 import json
 
 class ServiceRequestManager:
@@ -14,258 +20,344 @@ class ServiceRequestManager:
         self.channel_layer = get_channel_layer()
 
     def find_nearby_mechanics(self, max_distance=5.0):
-        """Find available mechanics within the specified radius"""
-        customer_location = self.service_request.location
-        available_mechanics = FieldStaff.objects.filter(
-            is_available=True,
-            current_job__isnull=True
+        """Find available mechanics within the specified radius, nearest first"""
+        if self.service_request.latitude is None or self.service_request.longitude is None:
+            return []
+        return FieldStaff.find_nearby(
+            self.service_request.latitude,
+            self.service_request.longitude,
+            radius_km=max_distance
         )
-        
-        nearby_mechanics = [
-            mechanic for mechanic in available_mechanics
-            if mechanic.is_within_radius(
-                customer_location['latitude'],
-                customer_location['longitude']
-            )
-        ]
-        return nearby_mechanics
 
     def calculate_distance(self, lat1, lon1, lat2, lon2):
         """Calculate distance between two points in kilometers"""
-        R = 6371  # Earth's radius in kilometers
-
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-
-        dlon = lon2 - lon1
-        dlat = lat2 - lat1
-
-        a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlon / 2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1 - a))
-        distance = R * c
-
-        return distance
+        return haversine_km(lat1, lon1, lat2, lon2)
 
     def calculate_distance_charges(self):
         """Calculate any additional charges based on distance"""
-        # Get active pricing rule
-        pricing_rule = DistancePricingRule.get_active_rule()
-        if not pricing_rule:
-            return 0, 0, None  # No charge if no rule is set
-        
-        # Get customer and service center locations
-        customer_lat = self.service_request.location.get('latitude')
-        customer_lng = self.service_request.location.get('longitude')
+        if self.service_request.latitude is None or self.service_request.longitude is None:
+            return 0, 0, None
         
-        # Use a default service center location or get from settings
-        # This should be configured in your application
-        service_center_lat = 28.6139  # Example: Delhi coordinates
-        service_center_lng = 77.2090  # Change to your actual service center
+        # Nearest service center and its pricing rule
+        pricing = pricing_for(self.service_request.latitude, self.service_request.longitude)
+        if pricing is None:
+            return 0, 0, None  # No charge if no rule is set
+        pricing_rule = pricing.rule
         
-        # Calculate distance
-        distance_km = self.calculate_distance(
-            customer_lat, customer_lng,
-            service_center_lat, service_center_lng
+        distances, fees = distance_fees(
+            pricing_rule,
+            [self.service_request.latitude],
+            [self.service_request.longitude],
+            (pricing.latitude, pricing.longitude)
         )
-        
-        # Check if distance is within the maximum service range
-        if distance_km > pricing_rule.max_distance_km:
-            return distance_km, 0, {
-                "status": "out_of_range",
-                "message": f"Location is beyond our service area of {pricing_rule.max_distance_km}km"
-            }
-        
-        # Calculate additional charges
-        additional_charges = pricing_rule.calculate_charges(distance_km)
+        distance_km, additional_charges = float(distances[0]), round(float(fees[0]), 2)
         
         return distance_km, additional_charges, {
             "status": "ok",
-            "free_distance_km": pricing_rule.free_distance_km,
+            "free_distance_km": float(pricing_rule.free_radius_km),
             "distance_km": distance_km,
-            "additional_charges": float(additional_charges),
-            "price_per_km": float(pricing_rule.price_per_km)
+            "additional_charges": additional_charges,
+            "price_per_km": float(pricing_rule.per_km_charge)
         }
 
-    def notify_nearby_mechanics(self):
-        """Send notifications to nearby mechanics about new service request"""
-        nearby_mechanics = self.find_nearby_mechanics()
-        
-        if not nearby_mechanics:
-            self.service_request.status = 'CANCELLED'
-            self.service_request.save()
-            self._notify_customer({
+    # Channel sends. Every operation below does its database work first and
+    # returns the (group, event) pairs to deliver; they are then sent
+    # concurrently, with one hand-off to the event loop for sync callers.
+
+    async def asend(self, messages):
+        """Send every (group, event) pair concurrently"""
+        await asyncio.gather(*(
+            self.channel_layer.group_send(group, event) for group, event in messages
+        ))
+
+    def send(self, messages):
+        if messages:
+            async_to_sync(self.asend)(messages)
+
+    def _customer_message(self, message):
+        """(group, event) notifying the customer, or None for a request without a user"""
+        if self.service_request.user_id is None:
+            return None
+        return (
+            f"customer_{self.service_request.user_id}",
+            {
                 "type": "service.notification",
-                "message": "No mechanics available in your area"
-            })
-            return False
+                "message": message
+            }
+        )
+
+    def _notify_customer(self, message):
+        """Send notification to customer"""
+        self.send([m for m in [self._customer_message(message)] if m])
+
+    def _other_mechanics_messages(self, accepted_mechanic):
+        """
+        Tell every other mechanic the request was offered to that it is no
+        longer available. The list comes from the dispatch offers, so no
+        proximity search is run again.
+        """
+        user_ids = (
+            DispatchOffer.objects
+            .filter(service_request=self.service_request, field_staff__user__isnull=False)
+            .exclude(field_staff=accepted_mechanic)
+            .values_list('field_staff__user_id', flat=True)
+        )
+        return [
+            (
+                f"mechanic_{user_id}",
+                {
+                    "type": "service.cancelled",
+                    "message": {
+                        "request_id": str(self.service_request.id),
+                        "reason": "Request accepted by another mechanic"
+                    }
+                }
+            )
+            for user_id in user_ids
+        ]
+
+    def _notify_other_mechanics(self, accepted_mechanic):
+        """Notify other mechanics that the request is no longer available"""
+        self.send(self._other_mechanics_messages(accepted_mechanic))
+
+    # Operations: _prepare_* run the database part and return messages
 
+    def _prepare_dispatch(self):
         # Calculate distance-based charges
         distance_km, additional_charges, pricing_info = self.calculate_distance_charges()
         
         # Prepare customer and vehicle information for the notification
-        customer = self.service_request.customer
         customer_info = {
-            "name": customer.get_full_name(),
-            "phone_number": self.service_request.phone_number,
+            "name": self.service_request.customer_name,
+            "phone_number": self.service_request.customer_phone,
             "address": self.service_request.address,
-            "location": self.service_request.location
+            "location": {
+                "latitude": self.service_request.latitude,
+                "longitude": self.service_request.longitude
+            }
         }
         
         # Get vehicle details
         vehicle_info = {}
         if self.service_request.vehicle_model:
             vehicle_info["model"] = self.service_request.vehicle_model.name
-        if self.service_request.vehicle_manufacturer:
-            vehicle_info["manufacturer"] = self.service_request.vehicle_manufacturer.name
+        if self.service_request.manufacturer:
+            vehicle_info["manufacturer"] = self.service_request.manufacturer.name
 
+        messages = []
         # Notify customer about distance-based pricing
         if pricing_info and additional_charges > 0:
-            self._notify_customer({
+            messages.append(self._customer_message({
                 "type": "distance_pricing",
                 "message": f"Your location is {distance_km:.1f} km away. Additional travel charges of ₹{additional_charges:.2f} will apply.",
                 "pricing_details": pricing_info
-            })
+            }))
 
-        for mechanic in nearby_mechanics:
-            async_to_sync(self.channel_layer.group_send)(
-                f"mechanic_{mechanic.user.id}",
-                {
-                    "type": "service.request",
-                    "message": {
-                        "request_id": str(self.service_request.id),
-                        "service_type": self.service_request.service_type,
-                        "description": self.service_request.description,
-                        "customer": customer_info,
-                        "vehicle": vehicle_info,
-                        "distance": {
-                            "kilometers": distance_km,
-                            "additional_charges": float(additional_charges)
-                        },
-                        "created_at": self.service_request.created_at.isoformat()
-                    }
-                }
-            )
+        details = {
+            "services": list(self.service_request.services.values_list('name', flat=True)),
+            "notes": self.service_request.notes,
+            "customer": customer_info,
+            "vehicle": vehicle_info,
+            "distance": {
+                "kilometers": distance_km,
+                "additional_charges": float(additional_charges)
+            },
+            "created_at": self.service_request.created_at.isoformat()
+        }
+        return details, [m for m in messages if m]
+
+    def notify_nearby_mechanics(self):
+        """
+        Start offering the new service request to nearby mechanics.
+        The offers run in the background (see repairing_service.dispatch):
+        the search widens from 5 km on timeouts and the request is only
+        cancelled once the largest radius has been tried.
+        """
+        details, messages = self._prepare_dispatch()
+        self.send(messages)
+        start_dispatch(self.service_request, details, channel_layer=self.channel_layer)
         return True
 
-    def handle_mechanic_response(self, mechanic, response, estimated_arrival_time=None):
-        """Handle mechanic's response to service request"""
+    async def anotify_nearby_mechanics(self):
+        details, messages = await database_sync_to_async(self._prepare_dispatch)()
+        await self.asend(messages)
+        start_dispatch(self.service_request, details, channel_layer=self.channel_layer)
+        return True
+
+    def _prepare_mechanic_response(self, mechanic, response, estimated_arrival_time=None):
+        """Store the response; returns (accepted, messages)"""
         with transaction.atomic():
-            # Create or update response
-            service_response, created = ServiceRequestResponse.objects.update_or_create(
+            # A wave offers the request to several mechanics at once: the
+            # accept that moves the row out of pending wins, later ones lose
+            won = response == 'ACCEPT' and ServiceRequest.objects.filter(
+                pk=self.service_request.pk,
+                status=ServiceRequest.STATUS_PENDING
+            ).update(status=ServiceRequest.STATUS_CONFIRMED, updated_at=timezone.now()) == 1
+
+            ServiceRequestResponse.objects.update_or_create(
                 service_request=self.service_request,
                 field_staff=mechanic,
                 defaults={
-                    'response': response,
+                    'accepted': won,
                     'estimated_arrival_time': estimated_arrival_time
                 }
             )
+            record_response(self.service_request, mechanic, won)
+            if not won:
+                return False, []
 
-            if response == 'ACCEPT':
-                if self.service_request.status == 'PENDING':
-                    self.service_request.status = 'ACCEPTED'
-                    mechanic.is_available = False
-                    mechanic.current_job = self.service_request
-                    mechanic.save()
-                    self.service_request.save()
-                    
-                    # Notify customer
-                    self._notify_customer({
-                        "message": "Mechanic has accepted your request",
-                        "mechanic": {
-                            "name": mechanic.user.get_full_name(),
-                            "rating": mechanic.rating,
-                            "estimated_arrival": estimated_arrival_time
-                        }
-                    })
-                    
-                    # Notify other mechanics that request is taken
-                    self._notify_other_mechanics(mechanic)
-                    
-                    return True
-            return False
+            self.service_request.status = ServiceRequest.STATUS_CONFIRMED
+            record_update(ServiceRequest, self.service_request, status=ServiceRequest.STATUS_PENDING)
+            mechanic.is_available = False
+            mechanic.current_job = self.service_request
+            # Only the assignment: the instance may be cached by a websocket
+            # connection and hold a stale position
+            mechanic.save(update_fields=['is_available', 'current_job'])
+            
+            messages = [
+                # Notify customer
+                self._customer_message({
+                    "message": "Mechanic has accepted your request",
+                    "mechanic": {
+                        "name": mechanic.user.get_full_name() if mechanic.user else str(mechanic),
+                        "rating": mechanic.rating,
+                        "estimated_arrival": estimated_arrival_time
+                    }
+                }),
+                # Notify other mechanics that request is taken
+                *self._other_mechanics_messages(mechanic)
+            ]
+        return True, [m for m in messages if m]
 
-    def start_tracking(self, mechanic, latitude, longitude):
-        """Start GPS tracking for the mechanic"""
-        if self.service_request.status != 'ACCEPTED':
-            raise ValidationError("Cannot start tracking - request not accepted")
+    def handle_mechanic_response(self, mechanic, response, estimated_arrival_time=None):
+        """Handle mechanic's response to service request"""
+        accepted, messages = self._prepare_mechanic_response(mechanic, response, estimated_arrival_time)
+        self.send(messages)
+        return accepted
 
-        LiveLocation.objects.create(
-            field_staff=mechanic,
-            service_request=self.service_request,
-            latitude=latitude,
-            longitude=longitude
+    async def ahandle_mechanic_response(self, mechanic, response, estimated_arrival_time=None):
+        accepted, messages = await database_sync_to_async(self._prepare_mechanic_response)(
+            mechanic, response, estimated_arrival_time
         )
+        await self.asend(messages)
+        return accepted
+
+    def _prepare_start_tracking(self, mechanic, latitude, longitude):
+        if self.service_request.status != ServiceRequest.STATUS_CONFIRMED:
+            raise ValidationError("Cannot start tracking - request not accepted")
+
+        location_buffer.add(mechanic.id, self.service_request.id, latitude, longitude)
         
-        self.service_request.status = 'IN_PROGRESS'
+        self.service_request.status = ServiceRequest.STATUS_IN_PROGRESS
         self.service_request.save()
         
-        self._notify_customer({
+        return [m for m in [self._customer_message({
             "message": "Mechanic is on the way",
             "location": {
                 "latitude": latitude,
                 "longitude": longitude
             }
-        })
+        })] if m]
 
-    def update_tracking(self, mechanic, latitude, longitude):
-        """Update mechanic's location"""
-        if self.service_request.status != 'IN_PROGRESS':
-            return
-
-        LiveLocation.objects.create(
-            field_staff=mechanic,
-            service_request=self.service_request,
-            latitude=latitude,
-            longitude=longitude
-        )
+    def start_tracking(self, mechanic, latitude, longitude):
+        """Start GPS tracking for the mechanic"""
+        self.send(self._prepare_start_tracking(mechanic, latitude, longitude))
+
+    async def astart_tracking(self, mechanic, latitude, longitude):
+        messages = await database_sync_to_async(self._prepare_start_tracking)(mechanic, latitude, longitude)
+        await self.asend(messages)
+
+    def _prepare_update_tracking(self, mechanic, latitude, longitude):
+        if self.service_request.status != ServiceRequest.STATUS_IN_PROGRESS:
+            return []
+
+        location_buffer.add(mechanic.id, self.service_request.id, latitude, longitude)
         
-        self._notify_customer({
+        return [m for m in [self._customer_message({
             "type": "location_update",
             "location": {
                 "latitude": latitude,
                 "longitude": longitude
             }
-        })
+        })] if m]
 
-    def complete_service(self, mechanic, service_cost):
-        """Mark service as completed"""
+    def update_tracking(self, mechanic, latitude, longitude):
+        """Update mechanic's location"""
+        self.send(self._prepare_update_tracking(mechanic, latitude, longitude))
+
+    async def aupdate_tracking(self, mechanic, latitude, longitude):
+        messages = await database_sync_to_async(self._prepare_update_tracking)(mechanic, latitude, longitude)
+        await self.asend(messages)
+
+    def _prepare_complete_service(self, mechanic, service_cost):
         with transaction.atomic():
-            self.service_request.status = 'COMPLETED'
+            self.service_request.status = ServiceRequest.STATUS_COMPLETED
             self.service_request.completion_time = timezone.now()
             self.service_request.service_cost = service_cost
             self.service_request.save()
             
             mechanic.is_available = True
             mechanic.current_job = None
+            mechanic.save(update_fields=['is_available', 'current_job'])
+            FieldStaff.objects.filter(pk=mechanic.pk).update(total_jobs=F('total_jobs') + 1)
             mechanic.total_jobs += 1
-            mechanic.save()
             
-            self._notify_customer({
-                "message": "Service completed",
-                "cost": str(service_cost)
-            })
+        return [m for m in [self._customer_message({
+            "message": "Service completed",
+            "cost": str(service_cost)
+        })] if m]
 
-    def _notify_customer(self, message):
-        """Send notification to customer"""
-        async_to_sync(self.channel_layer.group_send)(
-            f"customer_{self.service_request.customer.id}",
-            {
-                "type": "service.notification",
-                "message": message
-            }
+    def complete_service(self, mechanic, service_cost):
+        """Mark service as completed"""
+        self.send(self._prepare_complete_service(mechanic, service_cost))
+
+    async def acomplete_service(self, mechanic, service_cost):
+        messages = await database_sync_to_async(self._prepare_complete_service)(mechanic, service_cost)
+        await self.asend(messages)
+
+class BookingTotalService:
+    """
+    Fixes bookings saved with a zero total_amount even though their services
+    have prices. Runs in the background so the bookings list never writes.
+    """
+
+    @staticmethod
+    @transaction.atomic
+    def reconcile_batch(after_id, batch_size):
+        """
+        Set the total of up to batch_size zero-total bookings with id > after_id
+        to the sum of their services' base prices.
+        Returns (bookings scanned, bookings updated, last id scanned).
+        """
+        rows = list(
+            ServiceRequest.objects
+            .filter(total_amount=0, id__gt=after_id)
+            .order_by('id')
+            .annotate(service_total=Sum('services__base_price'))
+            .values_list('id', 'service_total')[:batch_size]
         )
+        if not rows:
+            return 0, 0, after_id
 
-    def _notify_other_mechanics(self, accepted_mechanic):
-        """Notify other mechanics that the request is no longer available"""
-        nearby_mechanics = self.find_nearby_mechanics()
-        for mechanic in nearby_mechanics:
-            if mechanic != accepted_mechanic:
-                async_to_sync(self.channel_layer.group_send)(
-                    f"mechanic_{mechanic.user.id}",
-                    {
-                        "type": "service.cancelled",
-                        "message": {
-                            "request_id": str(self.service_request.id),
-                            "reason": "Request accepted by another mechanic"
-                        }
-                    }
-                )
\ No newline at end of file
+        totals = {booking_id: service_total for booking_id, service_total in rows if service_total}
+        if totals:
+            # total_amount=0 is rechecked so a total set meanwhile is not overwritten
+            ServiceRequest.objects.filter(id__in=totals, total_amount=0).update(
+                total_amount=Case(
+                    *[When(id=booking_id, then=Value(total)) for booking_id, total in totals.items()],
+                    output_field=DecimalField(max_digits=10, decimal_places=2)
+                )
+            )
+        return len(rows), len(totals), rows[-1][0]
+
+    @staticmethod
+    def reconcile_zero_totals(batch_size=500):
+        """Reconcile every zero-total booking, batch by batch. Returns the number updated."""
+        after_id = 0
+        updated = 0
+        while True:
+            scanned, batch_updated, after_id = BookingTotalService.reconcile_batch(after_id, batch_size)
+            updated += batch_updated
+            if scanned < batch_size:
+                break
+        return updated
@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from accounts.models import User
+from marketplace.models import SellRequest, Vehicle, VehiclePurchase
+from subscription_plan.models import SubscriptionRequest, VisitSchedule
+from vehicle.models import Manufacturer, UserVehicle, VehicleModel, VehicleType
+from .models import (
+    DispatchOffer, DistancePricingRule, Feature, FieldStaff, Service, ServiceArea, ServiceCategory, ServiceCenter,
+    ServicePrice, ServiceRequest
+)
+
+
+@receiver(post_save, sender=ServiceRequest)
+def summarize_completed_track(sender, instance, created, **kwargs):
+    """Precompute the mechanic's track summary once, when a request becomes completed"""
+    if instance.status != ServiceRequest.STATUS_COMPLETED:
+        return
+    if getattr(instance, '_loaded_status', None) == ServiceRequest.STATUS_COMPLETED:
+        return
+    instance._loaded_status = instance.status
+
+    from .tracking import build_track_summary
+    service_request_id = instance.id
+    transaction.on_commit(lambda: build_track_summary(service_request_id))
+
+
+@receiver([post_save, post_delete], sender=Service)
+@receiver([post_save, post_delete], sender=ServicePrice)
+def invalidate_price_matrix(sender, **kwargs):
+    """Reload the in-memory price matrix once the write is committed"""
+    from .price_matrix import price_matrix
+    transaction.on_commit(price_matrix.invalidate)
+
+
+@receiver([post_save, post_delete], sender=ServiceCategory)
+@receiver([post_save, post_delete], sender=Service)
+@receiver([post_save, post_delete], sender=Feature)
+@receiver([post_save, post_delete], sender=ServicePrice)
+@receiver([post_save, post_delete], sender=Manufacturer)
+@receiver([post_save, post_delete], sender=VehicleModel)
+@receiver([post_save, post_delete], sender=VehicleType)
+@receiver(m2m_changed, sender=Service.features.through)
+@receiver(m2m_changed, sender=Service.manufacturers.through)
+@receiver(m2m_changed, sender=Service.vehicles_models.through)
+def invalidate_catalog_snapshot(sender, **kwargs):
+    """Rebuild the catalog snapshot on the next read once the write is committed"""
+    if kwargs.get('action', 'post_').startswith('pre_'):
+        return
+    from .catalog import invalidate_catalog
+    transaction.on_commit(invalidate_catalog)
+
+
+@receiver([post_save, post_delete], sender=DistancePricingRule)
+@receiver([post_save, post_delete], sender=ServiceCenter)
+def invalidate_distance_pricing(sender, **kwargs):
+    """Rebuild the center index and resolve the pricing rules again once the write is committed"""
+    from .distance_pricing import invalidate_rules
+    transaction.on_commit(invalidate_rules)
+
+
+@receiver([post_save, post_delete], sender=ServiceArea)
+def invalidate_service_areas(sender, **kwargs):
+    """Rebuild the service-area index once the write is committed"""
+    from .service_areas import invalidate_areas
+    transaction.on_commit(invalidate_areas)
+
+
+@receiver([post_save, post_delete], sender=FieldStaff)
+@receiver([post_save, post_delete], sender=DispatchOffer)
+def invalidate_mechanic_assignments(sender, instance, **kwargs):
+    """Tell the mechanic's websocket connections to reload the requests they may act on"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'current_job' not in update_fields:
+        return
+    if sender is FieldStaff:
+        user_id = instance.user_id
+    else:
+        user_id = FieldStaff.objects.filter(pk=instance.field_staff_id).values_list('user_id', flat=True).first()
+    if user_id is None:
+        return
+
+    from .consumers import invalidate_assignments
+    transaction.on_commit(lambda: invalidate_assignments(user_id))
+
+
+@receiver([pre_save, post_save, post_delete], sender=User)
+@receiver([pre_save, post_save, post_delete], sender=Vehicle)
+@receiver([pre_save, post_save, post_delete], sender=UserVehicle)
+@receiver([pre_save, post_save, post_delete], sender=SellRequest)
+@receiver([pre_save, post_save, post_delete], sender=ServiceRequest)
+@receiver([pre_save, post_save, post_delete], sender=VehiclePurchase)
+@receiver([pre_save, post_save, post_delete], sender=SubscriptionRequest)
+@receiver([pre_save, post_save, post_delete], sender=VisitSchedule)
+def update_dashboard_counters(sender, instance, signal, **kwargs):
+    """Track the write's effect on the admin dashboard totals, published once it commits"""
+    if kwargs.get('raw'):
+        return
+    from . import dashboard_counters
+    if signal is pre_save:
+        dashboard_counters.remember_before_save(sender, instance, kwargs.get('update_fields'))
+    elif signal is post_save:
+        dashboard_counters.record_save(sender, instance, kwargs.get('update_fields'))
+    else:
+        dashboard_counters.record_delete(sender, instance)
@@ -0,0 +1,63 @@
+"""
+Fixed-grid spatial index for mechanic locations.
+
+The globe is divided into square cells of GRID_CELL_DEGREES on each side and
+every FieldStaff row stores the integer id of the cell it is in. A radius
+search only has to look at the cells overlapping the search circle's bounding
+box, which is an indexed IN lookup, before refining with the exact distance.
+"""
+import math
+
+# About 2.2 km north-south; east-west width shrinks with cos(latitude)
+GRID_CELL_DEGREES = 0.02
+GRID_ROWS = int(round(180 / GRID_CELL_DEGREES))
+GRID_COLUMNS = int(round(360 / GRID_CELL_DEGREES))
+
+# Same Earth radius as the haversine distances the candidates are refined with
+KM_PER_DEGREE_LATITUDE = 6371.0 * math.pi / 180
+# Closer to a pole than this, the search box spans every longitude
+POLAR_LATITUDE = 89.9
+
+
+def _row(latitude):
+    return min(max(int(math.floor((latitude + 90) / GRID_CELL_DEGREES)), 0), GRID_ROWS - 1)
+
+
+def _column(longitude):
+    return int(math.floor((longitude + 180) / GRID_CELL_DEGREES)) % GRID_COLUMNS
+
+
+def grid_cell(latitude, longitude):
+    """Return the grid cell id for a coordinate, or None if it is missing"""
+    if latitude is None or longitude is None:
+        return None
+    return _row(float(latitude)) * GRID_COLUMNS + _column(float(longitude))
+
+
+def cells_within(latitude, longitude, radius_km):
+    """
+    Return the ids of every grid cell that may contain points within
+    radius_km of the coordinate (the cells covering its bounding box).
+    """
+    latitude = float(latitude)
+    longitude = float(longitude)
+    lat_delta = radius_km / KM_PER_DEGREE_LATITUDE
+    # Use the latitude closest to a pole inside the box, where cells are narrowest
+    widest_lat = abs(latitude) + lat_delta
+    if widest_lat < POLAR_LATITUDE:
+        lon_delta = radius_km / (KM_PER_DEGREE_LATITUDE * math.cos(math.radians(widest_lat)))
+
+    first_row, last_row = _row(latitude - lat_delta), _row(latitude + lat_delta)
+    if widest_lat >= POLAR_LATITUDE or lon_delta >= 180:
+        # The circle reaches over (or next to) a pole
+        columns = range(GRID_COLUMNS)
+    else:
+        first_column = int(math.floor((longitude - lon_delta + 180) / GRID_CELL_DEGREES))
+        last_column = int(math.floor((longitude + lon_delta + 180) / GRID_CELL_DEGREES))
+        columns = sorted({column % GRID_COLUMNS for column in range(first_column, last_column + 1)})
+
+    return [
+        row * GRID_COLUMNS + column
+        for row in range(first_row, last_row + 1)
+        for column in columns
+    ]
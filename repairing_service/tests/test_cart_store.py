@@ -0,0 +1,121 @@
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def services():
+    from repairing_service.models import Service, ServiceCategory
+
+    category = ServiceCategory.objects.create(name='Engine', slug='engine')
+    return [
+        Service.objects.create(
+            name=f'Service {i}', slug=f'service-{i}', category=category, description='',
+            base_price=Decimal('150.00') * (i + 1), duration='1h', warranty='30 days'
+        )
+        for i in range(3)
+    ]
+
+
+@pytest.mark.django_db
+def test_anonymous_cart_stays_out_of_the_database_until_checkout(services):
+    from rest_framework.test import APIClient
+    from accounts.models import User
+    from repairing_service.models import Cart, CartItem, ServiceRequest
+
+    client = APIClient()
+    cart_id = client.post(reverse('create-cart')).json()['id']
+    for service in services:
+        client.post(reverse('add-to-cart', args=[cart_id]), {'service_id': service.id, 'quantity': 2}, format='json')
+    added = client.post(reverse('add-to-cart', args=[cart_id]), {'service_id': services[0].id}, format='json').json()
+
+    assert added['cart']['total_items'] == 3
+    assert added['cart']['total_quantity'] == 7
+    assert Decimal(added['cart']['total_amount']) == Decimal('1950.00')
+    assert not Cart.objects.exists() and not CartItem.objects.exists()
+
+    with CaptureQueriesContext(connection) as context:
+        detail = client.get(reverse('cart-detail', args=[cart_id]))
+    assert detail.json() == added['cart']
+    # Only the session lookup touches the database
+    assert not any('repairing_service_cart' in query['sql'] for query in context.captured_queries)
+
+    user = User.objects.create_user(username='customer', email='customer@example.com', password='x')
+    client.force_authenticate(user)
+    response = client.post(reverse('create-booking'), {'cart_id': cart_id, 'profile': {'name': 'Customer'}}, format='json')
+
+    assert response.status_code == 201
+    booking = ServiceRequest.objects.get(id=response.json()['id'])
+    assert booking.total_amount == Decimal('1950.00')
+    assert booking.services.count() == 3
+    assert not Cart.objects.exists()
+
+
+@pytest.mark.django_db
+def test_user_cart_edits_are_written_behind(services):
+    from accounts.models import User
+    from repairing_service.cart_store import cart_store
+    from repairing_service.models import CartItem
+
+    user = User.objects.create_user(username='customer', email='customer@example.com', password='x')
+    cart = cart_store.create(user)
+    cart, first = cart_store.add_item(cart['id'], services[0], 1)
+    cart, _ = cart_store.add_item(cart['id'], services[1], 3)
+    assert not CartItem.objects.filter(cart_id=cart['id']).exists()
+
+    cart_store.update_item(cart['id'], first, quantity=0)
+    assert cart_store.flush() == 1
+    assert list(CartItem.objects.filter(cart_id=cart['id']).values_list('service_id', 'quantity')) == [(services[1].id, 3)]
+    assert cart_store.get(cart['id'])['total_amount'] == '900.00'
+
+
+@pytest.mark.django_db
+def test_busy_cart_is_refused_and_other_holders_keep_their_lock(services):
+    from django.core.cache import cache
+    from rest_framework.test import APIClient
+    from repairing_service.cart_store import CartBusy, cart_store
+
+    cart = cart_store.create()
+    lock_key = f"cart_store_{cart['id']}_lock"
+    cache.set(lock_key, 'other-holder', 5)
+
+    with pytest.raises(CartBusy):
+        with cart_store._locked(cart['id'], wait=0.05):
+            pytest.fail('ran without the lock')
+    assert cache.get(lock_key) == 'other-holder'
+
+    client = APIClient()
+    response = client.delete(reverse('clear-cart', args=[cart['id']]))
+    assert response.status_code == 409
+
+    # A holder whose lock expired and was taken over does not release the new one
+    cache.delete(lock_key)
+    with cart_store._locked(cart['id']):
+        cache.set(lock_key, 'next-holder', 5)
+    assert cache.get(lock_key) == 'next-holder'
+
+
+@pytest.mark.django_db
+def test_unreachable_cache_fails_fast(services, monkeypatch):
+    import time
+    from django.core.cache import cache
+    from repairing_service.cart_store import CartBusy, cart_store
+
+    cart = cart_store.create()
+    # What django-redis does with IGNORE_EXCEPTIONS when Redis is down
+    monkeypatch.setattr(cache, 'add', lambda *args, **kwargs: None)
+    started = time.monotonic()
+    with pytest.raises(CartBusy):
+        cart_store.add_item(cart['id'], services[0], 1)
+    assert time.monotonic() - started < 0.5
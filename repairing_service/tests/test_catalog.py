@@ -0,0 +1,66 @@
+import gzip
+import json
+import pytest
+from decimal import Decimal
+from django.urls import reverse
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    from repairing_service.catalog import invalidate_catalog
+
+    cache.clear()
+    invalidate_catalog()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def catalog():
+    from repairing_service.models import Feature, Service, ServiceCategory, ServicePrice
+    from vehicle.models import Manufacturer, VehicleModel, VehicleType
+
+    category = ServiceCategory.objects.create(name='Engine', slug='engine')
+    service = Service.objects.create(
+        name='Oil change', slug='oil-change', category=category, description='',
+        base_price=Decimal('300.00'), duration='1h', warranty='30 days'
+    )
+    service.features.add(Feature.objects.create(name='Synthetic oil'))
+    vehicle_type = VehicleType.objects.create(name='Bike')
+    manufacturer = Manufacturer.objects.create(name='Hero')
+    # bulk_create skips the post_save hook that rewrites setup_vehicle_data.py
+    vehicle_model, = VehicleModel.objects.bulk_create([
+        VehicleModel(name='Splendor', manufacturer=manufacturer, vehicle_type=vehicle_type)
+    ])
+    ServicePrice.objects.create(service=service, manufacturer=manufacturer, vehicle_model=vehicle_model, price=Decimal('350.00'))
+    return service, vehicle_model
+
+
+@pytest.mark.django_db
+def test_catalog_snapshot_is_compressed_and_revalidated_with_etag(catalog, django_capture_on_commit_callbacks):
+    from rest_framework.test import APIClient
+
+    service, vehicle_model = catalog
+    client = APIClient()
+    url = reverse('service-catalog')
+
+    response = client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+    assert response['Content-Encoding'] == 'gzip'
+    body = json.loads(gzip.decompress(response.content))
+    # post_migrate also seeds a 'General Services' category
+    category, = [category for category in body['categories'] if category['slug'] == 'engine']
+    assert category['services'][0]['features'] == [{'id': service.features.get().id, 'name': 'Synthetic oil'}]
+    assert body['price_overrides'] == {str(vehicle_model.id): {str(service.id): '350.00'}}
+    assert json.loads(client.get(url).content) == body
+
+    etag = response['ETag']
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    with django_capture_on_commit_callbacks(execute=True):
+        service.name = 'Full oil change'
+        service.save()
+
+    changed = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert changed.status_code == 200
+    assert changed['ETag'] != etag
@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+
+
+def test_group_messages_reach_sockets_held_by_another_worker(tmp_path):
+    from tools.channel_layers import SQLiteChannelLayer
+
+    path = tmp_path / 'channels.sqlite3'
+    # Each worker process builds its own layer on the shared file
+    consumer_worker = SQLiteChannelLayer(path=path)
+    view_worker = SQLiteChannelLayer(path=path)
+
+    async def scenario():
+        channel = await consumer_worker.new_channel()
+        await consumer_worker.group_add('mechanic_7', channel)
+        await view_worker.group_send('mechanic_7', {'type': 'service.notification', 'data': {'id': 1}})
+        await view_worker.group_send('mechanic_7', {'type': 'service.notification', 'data': {'id': 2}})
+        first = await asyncio.wait_for(consumer_worker.receive(channel), 5)
+        second = await asyncio.wait_for(consumer_worker.receive(channel), 5)
+
+        await consumer_worker.group_discard('mechanic_7', channel)
+        await view_worker.group_send('mechanic_7', {'type': 'service.notification', 'data': {'id': 3}})
+        await view_worker.send(channel, {'type': 'service.cancelled'})
+        third = await asyncio.wait_for(consumer_worker.receive(channel), 5)
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert first == {'type': 'service.notification', 'data': {'id': 1}}
+    assert second['data'] == {'id': 2}
+    # Left the group, so only the direct message arrives
+    assert third == {'type': 'service.cancelled'}
+
+
+def test_payloads_keep_the_types_json_lacks(tmp_path):
+    import datetime
+    import uuid
+    from decimal import Decimal
+    from tools.channel_layers import SQLiteChannelLayer
+
+    layer = SQLiteChannelLayer(path=tmp_path / 'channels.sqlite3')
+    message = {
+        'type': 'service.notification',
+        'data': {
+            'amount': Decimal('1499.50'),
+            'created_at': datetime.datetime(2025, 3, 1, 9, 30, tzinfo=datetime.timezone.utc),
+            'date': datetime.date(2025, 3, 1),
+            'slot': datetime.time(9, 30),
+            'eta': datetime.timedelta(minutes=25),
+            'request_id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'signature': b'\x00\xffraw',
+            'items': [(1, 2), {Decimal('0.5')}],
+        },
+    }
+
+    async def scenario():
+        channel = await layer.new_channel()
+        await layer.group_add('customer_3', channel)
+        await layer.group_send('customer_3', message)
+        # Channels not created by new_channel() take the direct path
+        await layer.send('worker.direct', message)
+        return (
+            await asyncio.wait_for(layer.receive(channel), 5),
+            await asyncio.wait_for(layer.receive('worker.direct'), 5),
+        )
+
+    grouped, direct = asyncio.run(scenario())
+    expected = dict(message['data'], items=[[1, 2], [Decimal('0.5')]])
+    assert grouped['data'] == direct['data'] == expected
+    assert type(grouped['data']['created_at']) is datetime.datetime
+    assert grouped['data']['created_at'].tzinfo is not None
+
+    async def unsupported():
+        await layer.send('worker.direct', {'type': 'x', 'value': object()})
+
+    with pytest.raises(TypeError, match='object'):
+        asyncio.run(unsupported())
@@ -0,0 +1,110 @@
+import json
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+
+
+@pytest.fixture
+def in_memory_layer(settings):
+    settings.CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+@pytest.fixture
+def mechanic_job():
+    from accounts.models import User
+    from repairing_service.models import DispatchOffer, FieldStaff, ServiceRequest
+
+    customer = User.objects.create_user(username='customer', email='customer@example.com', password='x')
+    mechanic = FieldStaff.objects.create(
+        user=User.objects.create_user(username='mechanic', email='mechanic@field.repairmybike.in', password='x'),
+        latitude=28.61, longitude=77.20, is_available=True
+    )
+    offered, other = ServiceRequest.objects.bulk_create([
+        ServiceRequest(user=customer, reference='RMB-WS-1', latitude=28.61, longitude=77.20),
+        ServiceRequest(user=customer, reference='RMB-WS-2', latitude=28.62, longitude=77.21),
+    ])
+    DispatchOffer.objects.create(service_request=offered, field_staff=mechanic, distance_km=1.0)
+    return mechanic, offered, other
+
+
+@pytest.mark.django_db
+def test_mechanic_is_resolved_once_per_connection(in_memory_layer, mechanic_job, monkeypatch):
+    from asgiref.testing import ApplicationCommunicator
+    from channels.db import database_sync_to_async
+    from channels.layers import get_channel_layer
+    from repairing_service.consumers import ServiceRequestConsumer
+    from repairing_service.location_ingest import location_buffer
+    from repairing_service.models import DispatchOffer
+
+    mechanic, offered, other = mechanic_job
+    pings = []
+    monkeypatch.setattr(location_buffer, 'add', lambda *args: pings.append(args))
+    monkeypatch.setattr(location_buffer, 'flush', lambda: None)
+
+    moves = iter(range(100))
+
+    def ping(service_request):
+        # About 110 m apart, so every ping is stored
+        return {
+            'type': 'location_update', 'service_request_id': service_request.id,
+            'customer_id': service_request.user_id, 'latitude': 28.6 + next(moves) / 1000, 'longitude': 77.2,
+        }
+
+    async def scenario():
+        communicator = ApplicationCommunicator(
+            ServiceRequestConsumer.as_asgi(),
+            {'type': 'websocket', 'path': '/ws/service-requests/', 'headers': [], 'user': mechanic.user}
+        )
+        await communicator.send_input({'type': 'websocket.connect'})
+        assert (await communicator.receive_output(1))['type'] == 'websocket.accept'
+
+        phase[0] = 'pings'
+        for _ in range(5):
+            await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps(ping(offered))})
+        await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps(ping(other))})
+        assert await communicator.receive_nothing()
+        phase[0] = 'invalidated'
+
+        # An offer made elsewhere is picked up after the explicit invalidation
+        await database_sync_to_async(DispatchOffer.objects.create)(
+            service_request=other, field_staff=mechanic, distance_km=2.0
+        )
+        await get_channel_layer().group_send(f'mechanic_{mechanic.user_id}', {'type': 'assignments.changed'})
+        await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps(ping(other))})
+        assert await communicator.receive_nothing()
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(1)
+
+    phase = ['connect']
+    queries = []
+
+    def record(execute, sql, params, many, context):
+        queries.append((phase[0], sql))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(record):
+        async_to_sync(scenario)()
+
+    # The mechanic is loaded on connect, their authorized requests on the
+    # first ping, and nothing else runs per ping
+    assert len([sql for name, sql in queries if name == 'connect']) == 1
+    assert len([sql for name, sql in queries if name == 'pings']) == 2
+    assert [args[1] for args in pings] == [offered.id] * 5 + [other.id]
+
+
+@pytest.mark.django_db
+def test_assignment_changes_invalidate_connections(mechanic_job, django_capture_on_commit_callbacks, monkeypatch):
+    from repairing_service import consumers
+
+    mechanic, offered, other = mechanic_job
+    invalidated = []
+    monkeypatch.setattr(consumers, 'invalidate_assignments', invalidated.append)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        mechanic.update_location(28.7, 77.3)
+    assert invalidated == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        mechanic.current_job = offered
+        mechanic.save(update_fields=['current_job'])
+    assert invalidated == [mechanic.user_id]
@@ -0,0 +1,69 @@
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+@pytest.fixture
+def services():
+    from repairing_service.models import Service, ServiceCategory
+
+    category = ServiceCategory.objects.create(name='Engine', slug='engine')
+    return [
+        Service.objects.create(
+            name=f'Service {i}', slug=f'service-{i}', category=category, description='',
+            base_price=Decimal('100.00') * (i + 1), duration='1h', warranty='30 days'
+        )
+        for i in range(20)
+    ]
+
+
+@pytest.fixture
+def user():
+    from accounts.models import User
+
+    return User.objects.create_user(username='customer', email='customer@example.com', password='x')
+
+
+def book_cart(user, services, quantity=1):
+    from rest_framework.test import APIClient
+    from repairing_service.models import Cart, CartItem
+
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.bulk_create([CartItem(cart=cart, service=service, quantity=quantity) for service in services])
+    client = APIClient()
+    client.force_authenticate(user)
+    with CaptureQueriesContext(connection) as context:
+        response = client.post(
+            reverse('create-booking'),
+            {'cart_id': cart.id, 'distanceFee': '25.50', 'profile': {'name': 'Customer'}},
+            format='json'
+        )
+    return response, len(context.captured_queries), cart.id
+
+
+@pytest.mark.django_db
+def test_cart_booking_round_trips_do_not_grow_with_cart_size(services, user):
+    from repairing_service.models import Cart, ServiceRequest
+
+    small, small_queries, small_cart = book_cart(user, services[:1])
+    large, large_queries, large_cart = book_cart(user, services, quantity=2)
+    print(f"DB round trips per booking: {small_queries} (1 item), {large_queries} (20 items)")
+
+    assert small.status_code == large.status_code == 201
+    assert small_queries == large_queries
+    assert not Cart.objects.filter(id__in=[small_cart, large_cart]).exists()
+
+    booking = ServiceRequest.objects.get(id=large.json()['id'])
+    assert booking.total_amount == Decimal('42025.50')
+    assert booking.services.count() == 20
+
+
+@pytest.mark.django_db
+def test_empty_cart_is_rejected_without_a_booking(services, user):
+    from repairing_service.models import ServiceRequest
+
+    response, _, _ = book_cart(user, [])
+    assert response.status_code == 400
+    assert not ServiceRequest.objects.exists()
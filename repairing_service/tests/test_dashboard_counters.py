@@ -0,0 +1,179 @@
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.mark.django_db
+def test_counters_follow_writes_and_status_transitions(django_capture_on_commit_callbacks):
+    from accounts.models import User
+    from repairing_service.dashboard_counters import dashboard_counters, reconcile
+    from repairing_service.models import ServiceRequest
+
+    reconcile()
+    with django_capture_on_commit_callbacks(execute=True):
+        customer = User.objects.create_user(username='customer', email='customer@example.com', password='x')
+        service_request = ServiceRequest.objects.create(
+            user=customer, reference='RMB-DASH', total_amount=Decimal('450.00')
+        )
+    counters = dashboard_counters()
+    assert counters['users_total'] == 1
+    assert counters['users_new_30d'] == 1
+    assert counters['service_requests_total'] == 1
+    assert counters['service_requests_pending'] == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        service_request.status = ServiceRequest.STATUS_COMPLETED
+        service_request.save(update_fields=['status'])
+    counters = dashboard_counters()
+    assert counters['service_requests_pending'] == 0
+    assert counters['service_requests_completed'] == 1
+    assert counters['service_revenue'] == Decimal('450.00')
+
+    # Saves that touch no counted field do not write the counters row
+    with CaptureQueriesContext(connection) as queries:
+        customer.save(update_fields=['last_login'])
+    assert not [query for query in queries if 'dashboardcounters' in query['sql']]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        service_request.delete()
+    counters = dashboard_counters()
+    assert counters['service_requests_total'] == 0
+    assert counters['service_revenue'] == 0
+
+
+@pytest.mark.django_db
+def test_reconcile_corrects_drift_and_reads_are_cached():
+    from rest_framework.test import APIClient
+    from accounts.models import User
+    from repairing_service.dashboard_counters import reconcile
+    from repairing_service.models import ServiceRequest
+
+    admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', is_staff=True)
+    ServiceRequest.objects.bulk_create([
+        ServiceRequest(user=admin, reference=f'RMB-BULK-{number}') for number in range(3)
+    ])
+    # bulk_create sends no signals; reconciliation picks the rows up
+    assert reconcile()['service_requests_total'] == 3
+
+    client = APIClient()
+    client.force_authenticate(admin)
+    assert client.get(reverse('admin-dashboard-statistics')).json()['totalServices'] == 3
+    with CaptureQueriesContext(connection) as queries:
+        statistics = client.get(reverse('admin-dashboard-statistics')).json()
+    assert statistics['pendingRepairRequests'] == 3
+    assert not [query for query in queries if 'count(' in query['sql'].lower()]
+    assert reconcile() == {}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_writes_do_not_touch_the_counters_row_until_flushed():
+    from django.db import transaction
+    from accounts.models import User
+    from repairing_service.dashboard_counters import dashboard_counters, flush, reconcile
+    from repairing_service.models import DashboardCounters, ServiceRequest
+
+    reconcile()
+    customer = User.objects.create_user(username='customer', email='customer@example.com', password='x')
+    service_request = ServiceRequest.objects.create(user=customer, reference='RMB-PENDING', total_amount=Decimal('99.50'))
+    loaded = ServiceRequest.objects.get(pk=service_request.pk)
+
+    with CaptureQueriesContext(connection) as queries:
+        with transaction.atomic():
+            loaded.status = ServiceRequest.STATUS_COMPLETED
+            loaded.save()
+    # Neither a row lock on the counters nor a re-read of the request
+    assert not [query for query in queries if 'dashboardcounters' in query['sql']]
+    assert not [
+        query for query in queries
+        if query['sql'].startswith('SELECT') and 'FROM "repairing_service_servicerequest"' in query['sql']
+    ]
+
+    counters = dashboard_counters()
+    assert counters['service_requests_total'] == 1
+    assert counters['service_requests_completed'] == 1
+    assert counters['service_revenue'] == Decimal('99.50')
+    assert DashboardCounters.objects.get().service_requests_total == 0
+
+    assert flush() == {
+        'users_total': 1, 'users_active': 1, 'users_new_30d': 1,
+        'service_requests_total': 1, 'service_requests_completed': 1, 'service_revenue': Decimal('99.50'),
+    }
+    row = DashboardCounters.objects.get()
+    assert (row.service_requests_total, row.service_revenue) == (1, Decimal('99.50'))
+    assert dashboard_counters()['service_revenue'] == Decimal('99.50')
+    assert flush() == {}
+    assert reconcile() == {}
+
+
+@pytest.mark.django_db
+def test_saves_diff_against_values_refreshed_from_the_database(django_capture_on_commit_callbacks):
+    from repairing_service.dashboard_counters import dashboard_counters, reconcile
+    from repairing_service.models import ServiceRequest
+
+    # Only instances read from the database carry a baseline
+    assert not hasattr(ServiceRequest(reference='RMB-NEW'), '_loaded_values')
+    service_request = ServiceRequest.objects.create(reference='RMB-REFRESH', total_amount=Decimal('80.00'))
+    reconcile()
+
+    loaded = ServiceRequest.objects.get(pk=service_request.pk)
+    ServiceRequest.objects.filter(pk=loaded.pk).update(status=ServiceRequest.STATUS_COMPLETED)
+    reconcile()
+    loaded.refresh_from_db(fields=['status'])
+    with django_capture_on_commit_callbacks(execute=True):
+        loaded.notes = 'Paid in cash'
+        loaded.save()
+    counters = dashboard_counters()
+    assert (counters['service_requests_completed'], counters['service_requests_pending']) == (1, 0)
+    assert counters['service_revenue'] == Decimal('80.00')
+
+    # Saving the same instance again diffs against what the last save wrote
+    with django_capture_on_commit_callbacks(execute=True):
+        loaded.status = ServiceRequest.STATUS_CANCELLED
+        loaded.save()
+        loaded.save()
+    counters = dashboard_counters()
+    assert (counters['service_requests_completed'], counters['service_revenue']) == (0, 0)
+    assert reconcile() == {}
+
+
+@pytest.mark.django_db
+def test_a_row_read_before_a_flush_is_not_served_after_it(django_capture_on_commit_callbacks):
+    from django.core.cache import cache
+    from repairing_service import dashboard_counters as counters
+    from repairing_service.models import DashboardCounters, ServiceRequest
+
+    with django_capture_on_commit_callbacks(execute=True):
+        ServiceRequest.objects.create(reference='RMB-FIRST')
+    with django_capture_on_commit_callbacks(execute=True):
+        # Without a row a flush counts everything instead
+        assert counters.flush() == {}
+    assert DashboardCounters.objects.get().service_requests_total == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        ServiceRequest.objects.create(reference='RMB-SECOND')
+    # A slow reader picks up the version and the row before the flush...
+    version = cache.get(counters.VERSION_KEY)
+    stale = DashboardCounters.objects.filter(pk=counters.ROW_ID).values().first()
+    with django_capture_on_commit_callbacks(execute=True):
+        assert counters.flush() == {'service_requests_total': 1, 'service_requests_pending': 1}
+    # ...and caches it after the flush committed
+    cache.set(counters.CACHE_KEY, {'version': version, 'row': stale})
+    assert counters.dashboard_counters()['service_requests_total'] == 2
+
+    # Totals a flush or reconcile took are never taken again
+    with django_capture_on_commit_callbacks(execute=True):
+        ServiceRequest.objects.create(reference='RMB-THIRD')
+    with django_capture_on_commit_callbacks(execute=True):
+        assert counters.reconcile() == {}
+    assert counters.flush() == {}
+    assert counters.dashboard_counters()['service_requests_total'] == 3
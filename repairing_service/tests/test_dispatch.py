@@ -0,0 +1,159 @@
+import asyncio
+import pytest
+from asgiref.sync import sync_to_async
+
+
+@pytest.fixture
+def customer():
+    from accounts.models import User
+
+    return User.objects.create_user(username='customer', email='customer@example.com', password='x')
+
+
+@pytest.fixture
+def ring(customer):
+    """A pending request with one mechanic at 3, 7 and 11 km due north"""
+    from accounts.models import User
+    from repairing_service.models import FieldStaff, ServiceRequest
+
+    service_request = ServiceRequest.objects.create(user=customer, reference='RMB-DISPATCH', latitude=28.6, longitude=77.2)
+    mechanics = [
+        FieldStaff.objects.create(
+            user=User.objects.create_user(username=f'mechanic{km}', email=f'mechanic{km}@field.repairmybike.in', password='x'),
+            latitude=28.6 + km / 111.2, longitude=77.2, is_available=True, rating=4.5
+        )
+        for km in (3, 7, 11)
+    ]
+    return service_request, mechanics
+
+
+@pytest.fixture
+def layer():
+    from channels.layers import InMemoryChannelLayer
+
+    return InMemoryChannelLayer()
+
+
+def engine_for(service_request, layer):
+    from repairing_service.dispatch import DispatchEngine
+
+    return DispatchEngine(service_request, wave_size=1, wave_timeout=0.2, radii_km=(5, 8, 12), channel_layer=layer)
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    from repairing_service import dispatch
+
+    monkeypatch.setattr(dispatch, 'POLL_INTERVAL_SECONDS', 0.05)
+
+
+def offers(service_request):
+    from repairing_service.models import DispatchOffer
+
+    return list(
+        DispatchOffer.objects.filter(service_request=service_request)
+        .order_by('wave').values_list('field_staff_id', 'wave')
+    )
+
+
+async def listen(layer, group):
+    channel = await layer.new_channel()
+    await layer.group_add(group, channel)
+    return channel
+
+
+@pytest.mark.django_db(transaction=True)
+def test_search_widens_ring_by_ring_then_cancels(ring, layer):
+    service_request, mechanics = ring
+    engine = engine_for(service_request, layer)
+
+    async def run():
+        channel = await listen(layer, f'customer_{service_request.user_id}')
+        offered = [await listen(layer, f'mechanic_{mechanic.user_id}') for mechanic in mechanics]
+        assert await asyncio.wait_for(engine.run(), timeout=5) is None
+        waves = [(await layer.receive(c))['message']['wave'] for c in offered]
+        return waves, await layer.receive(channel)
+
+    waves, notice = asyncio.run(run())
+    # One mechanic per wave, each only once the smaller ring was used up
+    assert offers(service_request) == [(mechanic.id, wave) for wave, mechanic in enumerate(mechanics, 1)]
+    assert waves == [1, 2, 3]
+
+    # Nobody accepted within any timeout: the request is cancelled and the customer told
+    service_request.refresh_from_db()
+    assert service_request.status == service_request.STATUS_CANCELLED
+    assert notice['message']['type'] == 'no_mechanic_available'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_acceptance_stops_the_waves(ring, layer):
+    from repairing_service.dispatch import record_response
+    from repairing_service.models import ServiceRequest
+
+    service_request, mechanics = ring
+    engine = engine_for(service_request, layer)
+
+    async def run():
+        task = asyncio.ensure_future(engine.run())
+        await asyncio.sleep(0.1)
+        await sync_to_async(record_response)(service_request, mechanics[0], True)
+        await sync_to_async(ServiceRequest.objects.filter(pk=service_request.pk).update)(
+            status=ServiceRequest.STATUS_CONFIRMED
+        )
+        return await asyncio.wait_for(task, timeout=5)
+
+    assert asyncio.run(run()) == mechanics[0].id
+    assert offers(service_request) == [(mechanics[0].id, 1)]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('status', ['confirmed', 'in_progress', 'cancelled'])
+def test_request_leaving_pending_stops_the_waves(ring, layer, status):
+    from repairing_service.models import ServiceRequest
+
+    service_request, mechanics = ring
+    engine = engine_for(service_request, layer)
+
+    async def run():
+        task = asyncio.ensure_future(engine.run())
+        await asyncio.sleep(0.1)
+        # An admin confirms or cancels the request while the first wave waits
+        await sync_to_async(ServiceRequest.objects.filter(pk=service_request.pk).update)(status=status)
+        return await asyncio.wait_for(task, timeout=5)
+
+    assert asyncio.run(run()) is None
+    assert engine.closed
+    assert offers(service_request) == [(mechanics[0].id, 1)]
+    service_request.refresh_from_db()
+    assert service_request.status == status
+
+
+@pytest.mark.django_db(transaction=True)
+def test_request_not_pending_is_never_offered(ring, layer):
+    from repairing_service.models import ServiceRequest
+
+    service_request, _ = ring
+    ServiceRequest.objects.filter(pk=service_request.pk).update(status=ServiceRequest.STATUS_CONFIRMED)
+
+    assert asyncio.run(engine_for(service_request, layer).run()) is None
+    assert offers(service_request) == []
+
+
+@pytest.mark.django_db
+def test_sync_callers_use_the_bound_server_loop(monkeypatch):
+    from repairing_service import dispatch
+
+    monkeypatch.setattr(dispatch, '_bound_loop', (None, None))
+    assert dispatch._server_loop() is None
+
+    seen = {}
+
+    async def app(scope, receive, send):
+        # What a sync view sees from its worker thread
+        seen['loop'] = await sync_to_async(dispatch._server_loop, thread_sensitive=False)()
+        seen['running'] = asyncio.get_running_loop()
+
+    asyncio.run(dispatch.DispatchLoopMiddleware(app)({'type': 'http'}, None, None))
+    assert seen['loop'] is seen['running']
+    # Once the server loop stops it is not used any more
+    assert dispatch._server_loop() is None
@@ -0,0 +1,43 @@
+import numpy as np
+from repairing_service.dispatch_scoring import acceptance_rate, score_candidates, top_k, waves
+
+
+def test_closer_mechanic_scores_higher_all_else_equal():
+    scores = score_candidates([1.0, 4.0], [4.5, 4.5], [10, 10], [0.5, 0.5], radius_km=5.0)
+    assert scores[0] > scores[1]
+
+
+def test_each_component_moves_the_score():
+    base = dict(distance_km=[2.0, 2.0], rating=[4.0, 4.0], total_jobs=[20, 20], acceptance=[0.5, 0.5])
+    for field, better, worse in [
+        ('rating', 5.0, 3.0),
+        ('total_jobs', 0, 200),
+        ('acceptance', 0.9, 0.1),
+    ]:
+        inputs = dict(base, **{field: [better, worse]})
+        scores = score_candidates(radius_km=5.0, **inputs)
+        assert scores[0] > scores[1], field
+
+
+def test_scores_are_bounded_by_weights():
+    scores = score_candidates([0.0, 50.0], [10.0, -1.0], [0, 10 ** 6], [2.0, -1.0], radius_km=5.0)
+    assert np.all(scores >= 0.0) and np.all(scores <= 1.0 + 1e-9)
+    assert scores[0] == 1.0
+
+
+def test_acceptance_rate_is_smoothed_towards_prior():
+    rates = acceptance_rate([0, 0, 40], [0, 1, 40])
+    assert rates[0] == 0.5
+    assert 0.0 < rates[1] < 0.5
+    assert rates[2] > 0.95
+
+
+def test_top_k_returns_best_first():
+    scores = np.array([0.2, 0.9, 0.5, 0.7, 0.1])
+    assert top_k(scores, 3).tolist() == [1, 3, 2]
+    assert top_k(scores, 10).tolist() == [1, 3, 2, 0, 4]
+    assert top_k(scores, 0).tolist() == []
+
+
+def test_waves_split_ranked_list():
+    assert waves([5, 4, 3, 2, 1], 2) == [[5, 4], [3, 2], [1]]
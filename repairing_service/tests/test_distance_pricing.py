@@ -0,0 +1,142 @@
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+@pytest.fixture
+def clear_cache():
+    from django.core.cache import cache
+    from repairing_service.distance_pricing import invalidate_rules
+
+    cache.clear()
+    invalidate_rules()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def rules(clear_cache):
+    from repairing_service.models import DistancePricingRule
+
+    # Two active rules used to raise MultipleObjectsReturned
+    return DistancePricingRule.objects.bulk_create([
+        DistancePricingRule(service_center_latitude=0.0, service_center_longitude=0.0),
+        DistancePricingRule(
+            service_center_latitude=28.6139, service_center_longitude=77.2090,
+            free_radius_km=Decimal('5.00'), base_charge=Decimal('50.00'), per_km_charge=Decimal('10.00')
+        ),
+    ])
+
+
+@pytest.mark.django_db
+def test_newest_active_rule_is_resolved_once(rules):
+    from repairing_service.models import DistancePricingRule
+
+    assert DistancePricingRule.get_active_rule().id == rules[1].id
+    with CaptureQueriesContext(connection) as context:
+        DistancePricingRule.get_active_rule()
+    assert len(context.captured_queries) == 0
+
+
+@pytest.mark.django_db
+def test_batch_fees_match_single_fee(rules, django_capture_on_commit_callbacks):
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    points = [[28.6139, 77.2090], [28.70, 77.10], [28.40, 77.30], [28.90, 77.60]]
+    batch = client.post(reverse('calculate-distance-fee-batch'), {'points': points}, format='json').json()
+
+    assert batch['fees'][0] == 0
+    assert all(fee > 50 for fee in batch['fees'][1:])
+    for (latitude, longitude), distance, fee in zip(points, batch['distances'], batch['fees']):
+        single = client.post(
+            reverse('calculate-distance-fee'),
+            {'user_latitude': latitude, 'user_longitude': longitude},
+            format='json'
+        ).json()
+        assert single['distance'] == distance
+        assert single['fee'] == fee
+
+    with django_capture_on_commit_callbacks(execute=True):
+        rules[1].delete()
+    moved = client.post(reverse('calculate-distance-fee-batch'), {'points': points}, format='json').json()
+    assert moved['distances'] != batch['distances']
+    assert client.post(reverse('calculate-distance-fee-batch'), {'points': [[1.0]]}, format='json').status_code == 400
+
+
+@pytest.fixture
+def centers():
+    from repairing_service.models import DistancePricingRule, ServiceCenter
+
+    centers = ServiceCenter.objects.bulk_create([
+        ServiceCenter(name='Delhi', latitude=28.6139, longitude=77.2090),
+        ServiceCenter(name='Mumbai', latitude=19.0760, longitude=72.8777),
+        ServiceCenter(name='Bengaluru', latitude=12.9716, longitude=77.5946),
+    ])
+    DistancePricingRule.objects.bulk_create([
+        DistancePricingRule(service_center=center, free_radius_km=Decimal('3.00'), base_charge=base, per_km_charge=Decimal('10.00'))
+        for center, base in zip(centers, [Decimal('50.00'), Decimal('70.00'), Decimal('60.00')])
+    ])
+    return centers
+
+
+@pytest.mark.django_db
+def test_fees_are_charged_from_the_nearest_center(rules, centers):
+    from rest_framework.test import APIClient
+    from repairing_service.distance_pricing import pricing_for
+
+    assert pricing_for(19.10, 72.90).center.name == 'Mumbai'
+    with CaptureQueriesContext(connection) as context:
+        assert pricing_for(12.90, 77.60).center.name == 'Bengaluru'
+    assert len(context.captured_queries) == 0
+
+    client = APIClient()
+    single = client.post(reverse('calculate-distance-fee'), {'user_latitude': 19.10, 'user_longitude': 72.90}, format='json').json()
+    assert single['service_center'] == centers[1].id
+    assert 70 < single['fee'] < 120
+
+    batch = client.post(
+        reverse('calculate-distance-fee-batch'),
+        {'points': [[28.62, 77.21], [19.10, 72.90], [13.00, 77.60]]},
+        format='json'
+    ).json()
+    assert batch['service_centers'] == [center.id for center in centers]
+    assert batch['fees'][0] == 0
+    assert batch['fees'][1] == single['fee']
+
+
+def test_nearest_many_matches_single_lookups():
+    import numpy as np
+    from utils.geo import BRUTE_FORCE_POINTS, NearestPointIndex
+
+    generator = np.random.default_rng(7)
+    targets = generator.uniform([-60, -180], [60, 180], size=(500, 2))
+    for count in (3, BRUTE_FORCE_POINTS + 44):
+        points = generator.uniform([-60, -180], [60, 180], size=(count, 2))
+        index = NearestPointIndex(points[:, 0], points[:, 1])
+        expected = [index.nearest(latitude, longitude) for latitude, longitude in targets.tolist()]
+        assert index.nearest_many(targets[:, 0], targets[:, 1]).tolist() == expected
+    assert NearestPointIndex([], []).nearest_many([1.0], [2.0]) is None
+
+
+@pytest.mark.django_db
+def test_batch_quotes_resolve_the_index_once(rules, centers, monkeypatch):
+    import numpy as np
+    from repairing_service import distance_pricing
+
+    distance_pricing.center_index()
+    lookups = []
+    version = distance_pricing.get_namespace_version
+    monkeypatch.setattr(distance_pricing, 'get_namespace_version', lambda *args: lookups.append(args) or version(*args))
+
+    latitudes = np.tile([28.62, 19.10, 13.00], 2000)
+    longitudes = np.tile([77.21, 72.90, 77.60], 2000)
+    with CaptureQueriesContext(connection) as context:
+        distances, fees, center_ids = distance_pricing.quote_many(latitudes, longitudes)
+    assert len(lookups) == 1
+    assert len(context.captured_queries) == 0
+    assert center_ids[:3] == [center.id for center in centers]
+    single = distance_pricing.pricing_for(19.10, 72.90)
+    assert fees[1] == distance_pricing.distance_fees(single.rule, [19.10], [72.90], (single.latitude, single.longitude))[1][0]
@@ -0,0 +1,46 @@
+import pytest
+from django.urls import reverse
+
+
+@pytest.fixture
+def mechanic():
+    from accounts.models import User
+    from repairing_service.models import FieldStaff
+
+    return FieldStaff.objects.create(
+        user=User.objects.create_user(username='mechanic', email='mechanic@field.repairmybike.in', password='x'),
+        latitude=28.6, longitude=77.2, is_available=True, rating=3.5
+    )
+
+
+@pytest.mark.django_db
+def test_field_staff_api_is_closed_to_non_staff(mechanic):
+    from rest_framework.test import APIClient
+    from accounts.models import User
+
+    client = APIClient()
+    assert client.get(reverse('field-staff-list')).status_code in (401, 403)
+    assert client.patch(
+        reverse('field-staff-detail', args=[mechanic.id]), {'rating': 5.0}, format='json'
+    ).status_code in (401, 403)
+
+    client.force_authenticate(User.objects.create_user(username='customer', email='customer@example.com', password='x'))
+    assert client.get(reverse('field-staff-list')).status_code == 403
+    assert client.get(reverse('field-staff-current-location', args=[mechanic.id])).status_code == 403
+
+
+@pytest.mark.django_db
+def test_staff_cannot_write_dispatch_fields(mechanic):
+    from rest_framework.test import APIClient
+    from accounts.models import User
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='admin', email='admin@example.com', password='x', is_staff=True))
+    response = client.patch(
+        reverse('field-staff-detail', args=[mechanic.id]),
+        {'rating': 5.0, 'latitude': 1.0, 'is_available': False}, format='json'
+    )
+    assert response.status_code == 200
+    mechanic.refresh_from_db()
+    assert (mechanic.rating, mechanic.latitude, mechanic.is_available) == (3.5, 28.6, True)
+    assert 'grid_cell' not in response.json()
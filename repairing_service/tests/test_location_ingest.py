@@ -0,0 +1,54 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.fixture
+def buffer(monkeypatch):
+    from repairing_service.location_ingest import LocationIngestBuffer
+
+    buffer = LocationIngestBuffer(max_points=5, flush_interval_ms=60000)
+    # Flushes happen on demand only, on the test's own connection
+    monkeypatch.setattr(buffer, '_ensure_worker', lambda: None)
+    return buffer
+
+
+@pytest.mark.django_db
+def test_buffered_pings_are_written_in_one_batch(buffer):
+    from repairing_service.models import FieldStaff, LiveLocation, ServiceRequest
+
+    mechanic = FieldStaff.objects.create(latitude=28.5, longitude=77.1)
+    service_request = ServiceRequest.objects.create(reference='RMB-INGEST')
+
+    for step in range(4):
+        buffer.add(mechanic.id, service_request.id, 28.6 + step / 1000, 77.2)
+    assert LiveLocation.objects.count() == 0
+    assert buffer.pending() == 4
+
+    with CaptureQueriesContext(connection) as queries:
+        assert buffer.flush() == 4
+    inserts = [query for query in queries if query['sql'].startswith('INSERT') and 'livelocation' in query['sql']]
+    assert len(inserts) == 1
+    assert LiveLocation.objects.filter(service_request=service_request).count() == 4
+    assert buffer.pending() == 0
+
+    # The mechanic's row gets the latest position only
+    mechanic.refresh_from_db()
+    assert (mechanic.latitude, mechanic.longitude) == (28.603, 77.2)
+    assert mechanic.grid_cell is not None
+
+
+@pytest.mark.django_db
+def test_full_buffer_flushes_and_unknown_requests_are_dropped(buffer):
+    from repairing_service.models import FieldStaff, LiveLocation, ServiceRequest
+
+    mechanic = FieldStaff.objects.create()
+    service_request = ServiceRequest.objects.create(reference='RMB-INGEST')
+
+    buffer.add(mechanic.id, service_request.id + 1000, 28.6, 77.2)
+    for step in range(4):
+        buffer.add(mechanic.id, service_request.id, 28.6 + step / 1000, 77.2)
+    # The fifth point reached max_points and flushed the queue
+    assert buffer.pending() == 0
+    assert LiveLocation.objects.count() == 4
+    assert not LiveLocation.objects.exclude(service_request=service_request).exists()
@@ -0,0 +1,93 @@
+import functools
+import json
+import pytest
+from asgiref.sync import async_to_sync
+from django.urls import reverse
+
+
+@pytest.fixture(autouse=True)
+def clear_cache(settings):
+    from django.core.cache import cache
+    from repairing_service.ping_control import ping_counters
+
+    settings.CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+    # Counts from earlier tests still waiting in this process go too
+    ping_counters.publish()
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.mark.django_db
+def test_gate_coalesces_broadcasts_and_thins_out_writes():
+    from repairing_service.ping_control import ACCEPTED, COALESCED, DROPPED, PingGate
+
+    gate = PingGate(broadcast_interval=1.0, min_distance_m=10.0, min_interval=15.0)
+    assert gate.check(28.6, 77.2, now=0.0) == (ACCEPTED, True)
+    assert gate.check(28.6, 77.2, now=0.1) == (DROPPED, False)
+    # About 1 m away: not worth a row
+    assert gate.check(28.60001, 77.2, now=0.2) == (COALESCED, False)
+    assert gate.check(28.601, 77.2, now=0.5) == (COALESCED, True)
+    assert gate.broadcast_delay(now=0.5) == 0.5
+    assert gate.check(28.60101, 77.2, now=1.2) == (ACCEPTED, False)
+    # A stationary mechanic still reports once per minimum interval
+    assert gate.check(28.60101, 77.2, now=16.3) == (ACCEPTED, True)
+
+
+@pytest.mark.django_db
+def test_consumer_sends_the_latest_ping_per_interval(monkeypatch):
+    from asgiref.testing import ApplicationCommunicator
+    from channels.layers import get_channel_layer
+    from rest_framework.test import APIClient
+    from accounts.models import User
+    from repairing_service import consumers
+    from repairing_service.location_ingest import location_buffer
+    from repairing_service.models import DispatchOffer, FieldStaff, ServiceRequest
+    from repairing_service.ping_control import PingGate, ping_counters
+
+    customer = User.objects.create_user(username='customer', email='customer@example.com', password='x')
+    mechanic = FieldStaff.objects.create(
+        user=User.objects.create_user(username='mechanic', email='mechanic@field.repairmybike.in', password='x'),
+        latitude=28.6, longitude=77.2
+    )
+    service_request = ServiceRequest.objects.create(user=customer, reference='RMB-PING', latitude=28.6, longitude=77.2)
+    DispatchOffer.objects.create(service_request=service_request, field_staff=mechanic)
+
+    stored = []
+    monkeypatch.setattr(location_buffer, 'add', lambda *args: stored.append(args))
+    monkeypatch.setattr(location_buffer, 'flush', lambda: None)
+    monkeypatch.setattr(consumers, 'PingGate', functools.partial(PingGate, broadcast_interval=0.05))
+    points = [(28.6, 77.2), (28.6, 77.2), (28.60005, 77.2), (28.602, 77.2), (28.603, 77.2)]
+
+    async def scenario():
+        layer = get_channel_layer()
+        customer_channel = await layer.new_channel()
+        await layer.group_add(f'customer_{customer.id}', customer_channel)
+
+        communicator = ApplicationCommunicator(
+            consumers.ServiceRequestConsumer.as_asgi(),
+            {'type': 'websocket', 'path': '/ws/service-requests/', 'headers': [], 'user': mechanic.user}
+        )
+        await communicator.send_input({'type': 'websocket.connect'})
+        assert (await communicator.receive_output(1))['type'] == 'websocket.accept'
+        for latitude, longitude in points:
+            await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps({
+                'type': 'location_update', 'service_request_id': service_request.id,
+                'customer_id': customer.id, 'latitude': latitude, 'longitude': longitude,
+            })})
+        first = await layer.receive(customer_channel)
+        last = await layer.receive(customer_channel)
+        assert await communicator.receive_nothing(0.2)
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(1)
+        return first, last
+
+    first, last = async_to_sync(scenario)()
+    assert first['message']['latitude'] == 28.6
+    assert last['message']['latitude'] == 28.603
+    assert [args[2] for args in stored] == [28.6, 28.602, 28.603]
+    assert ping_counters.totals() == {'accepted': 1, 'coalesced': 3, 'dropped': 1}
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='admin', email='admin@example.com', password='x', is_staff=True))
+    assert client.get(reverse('admin-location-ping-stats')).json()['dropped'] == 1
@@ -0,0 +1,126 @@
+import pytest
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def job():
+    from repairing_service.models import FieldStaff, LiveLocation, ServiceRequest
+
+    mechanic = FieldStaff.objects.create(latitude=28.5, longitude=77.1)
+    service_request = ServiceRequest.objects.create(reference='RMB-POSITION')
+    started = timezone.now() - timedelta(minutes=5)
+    LiveLocation.objects.bulk_create([
+        LiveLocation(
+            field_staff=mechanic, service_request=service_request,
+            latitude=28.6 + step / 1000, longitude=77.2, timestamp=started + timedelta(minutes=step)
+        )
+        for step in range(3)
+    ])
+    return mechanic, service_request
+
+
+@pytest.mark.django_db
+def test_request_position_reads_the_database_once(job, django_assert_num_queries):
+    from repairing_service.positions import request_position
+
+    mechanic, service_request = job
+    with django_assert_num_queries(1):
+        position = request_position(service_request.id)
+    assert (position['field_staff'], position['latitude']) == (mechanic.id, 28.602)
+
+    with django_assert_num_queries(0):
+        assert request_position(service_request.id) == position
+    assert request_position(service_request.id + 1000) is None
+
+
+@pytest.mark.django_db
+def test_ingest_replaces_the_cached_position_before_any_flush(job, monkeypatch, django_assert_num_queries):
+    from repairing_service.location_ingest import LocationIngestBuffer
+    from repairing_service.models import LiveLocation
+    from repairing_service.positions import request_position, staff_position
+
+    mechanic, service_request = job
+    request_position(service_request.id)
+    buffer = LocationIngestBuffer(max_points=100, flush_interval_ms=60000)
+    monkeypatch.setattr(buffer, '_ensure_worker', lambda: None)
+
+    buffer.add(mechanic.id, service_request.id, 28.7, 77.3)
+    assert LiveLocation.objects.count() == 3
+    with django_assert_num_queries(0):
+        assert (request_position(service_request.id)['latitude'], staff_position(mechanic.id)['latitude']) == (28.7, 28.7)
+
+    # Pings without a job only move the mechanic
+    buffer.add(mechanic.id, None, 28.8, 77.3)
+    assert request_position(service_request.id)['latitude'] == 28.7
+    assert staff_position(mechanic.id)['service_request'] is None
+
+
+@pytest.mark.django_db
+def test_staff_position_falls_back_to_the_mechanic_row(job, django_assert_num_queries):
+    from repairing_service.models import FieldStaff
+    from repairing_service.positions import staff_position
+
+    mechanic, service_request = job
+    assert staff_position(mechanic.id) is None
+
+    mechanic.current_job = service_request
+    mechanic.save()
+    FieldStaff.objects.filter(id=mechanic.id).update(latitude=28.65, longitude=77.25, location_updated_at=timezone.now())
+    with django_assert_num_queries(1):
+        position = staff_position(mechanic.id)
+    assert (position['latitude'], position['longitude'], position['service_request']) == (28.65, 77.25, service_request.id)
+    with django_assert_num_queries(0):
+        assert staff_position(mechanic.id) == position
+    assert staff_position(FieldStaff.objects.create().id) is None
+
+    # Moving the mechanic directly replaces the cached position too
+    mechanic.update_location(28.66, 77.26)
+    with django_assert_num_queries(0):
+        assert staff_position(mechanic.id)['latitude'] == 28.66
+
+
+@pytest.mark.django_db
+def test_a_slow_database_read_does_not_replace_a_newer_ping(job, monkeypatch):
+    from repairing_service import positions
+
+    mechanic, service_request = job
+    newer = positions.position_payload(mechanic.id, service_request.id, 28.9, 77.9, timezone.now())
+    reads = iter([None, newer])
+    # A ping lands in the cache between the miss and the database read
+    monkeypatch.setattr(positions.cache, 'get', lambda key: next(reads))
+    monkeypatch.setattr(positions.cache, 'set', lambda *args: pytest.fail('stale position written'))
+    assert positions.request_position(service_request.id) == newer
+
+
+@pytest.mark.django_db
+def test_live_location_endpoint_serves_and_refreshes_the_cache(job, django_assert_max_num_queries):
+    from rest_framework.test import APIClient
+    from repairing_service.models import ServiceRequest
+
+    mechanic, service_request = job
+    client = APIClient()
+    url = reverse('live-location', args=[service_request.id])
+    assert client.get(url).json()['latitude'] == 28.602
+    with django_assert_max_num_queries(0):
+        assert client.get(url).json()['latitude'] == 28.602
+
+    response = client.put(url, {
+        'field_staff': mechanic.id, 'service_request': service_request.id,
+        'latitude': 28.61, 'longitude': 77.21,
+    }, format='json')
+    assert response.status_code == 200, response.content
+    assert client.get(url).json()['latitude'] == 28.61
+
+    other = ServiceRequest.objects.create(reference='RMB-NOWHERE')
+    assert client.get(reverse('live-location', args=[other.id])).status_code == 404
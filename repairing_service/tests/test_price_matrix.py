@@ -0,0 +1,82 @@
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def catalog():
+    from repairing_service.models import Service, ServiceCategory, ServicePrice
+    from vehicle.models import Manufacturer, VehicleModel, VehicleType
+
+    category = ServiceCategory.objects.create(name='Engine', slug='engine')
+    services = [
+        Service.objects.create(
+            name=f'Service {i}', slug=f'service-{i}', category=category, description='',
+            base_price=Decimal('100.00'), duration='1h', warranty='30 days'
+        )
+        for i in range(10)
+    ]
+    vehicle_type = VehicleType.objects.create(name='Bike')
+    manufacturer = Manufacturer.objects.create(name='Hero')
+    # bulk_create skips the post_save hook that rewrites setup_vehicle_data.py
+    vehicle_model, = VehicleModel.objects.bulk_create([
+        VehicleModel(name='Splendor', manufacturer=manufacturer, vehicle_type=vehicle_type)
+    ])
+    ServicePrice.objects.bulk_create([
+        ServicePrice(service=service, manufacturer=manufacturer, vehicle_model=vehicle_model, price=Decimal('120.00') + i)
+        for i, service in enumerate(services[:5])
+    ])
+    return services, manufacturer, vehicle_model
+
+
+@pytest.mark.django_db
+def test_model_prices_come_from_one_matrix_load(catalog):
+    from rest_framework.test import APIClient
+    from repairing_service.price_matrix import price_matrix
+
+    services, manufacturer, vehicle_model = catalog
+    price_matrix.invalidate()
+    client = APIClient()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(reverse('vehicle-model-service-prices', args=[vehicle_model.id]))
+        for service in services:
+            service.get_price(manufacturer, vehicle_model)
+    # The vehicle model lookup and one matrix load
+    assert len(context.captured_queries) == 2
+
+    prices = response.json()['prices']
+    assert len(prices) == 10
+    assert prices[0] == {'service': services[0].id, 'service_name': 'Service 0', 'price': '120.00', 'is_custom_price': True}
+    assert prices[9]['price'] == '100.00' and not prices[9]['is_custom_price']
+    assert services[3].get_price(manufacturer, vehicle_model) == Decimal('123.00')
+    assert services[3].get_price() == Decimal('100.00')
+
+
+@pytest.mark.django_db
+def test_price_writes_reload_the_matrix(catalog, django_capture_on_commit_callbacks):
+    from rest_framework.test import APIClient
+    from repairing_service.models import ServicePrice
+
+    services, manufacturer, vehicle_model = catalog
+    url = reverse('service-price-detail', args=[services[7].id])
+    params = {'manufacturer_id': manufacturer.id, 'vehicle_model_id': vehicle_model.id}
+    client = APIClient()
+    assert client.get(url, params).json()['is_custom_price'] is False
+
+    with django_capture_on_commit_callbacks(execute=True):
+        ServicePrice.objects.create(service=services[7], manufacturer=manufacturer, vehicle_model=vehicle_model, price=Decimal('99.00'))
+
+    detail = client.get(url, params).json()
+    assert detail['price'] == '99.00' and detail['is_custom_price'] is True
+    assert client.get(reverse('service-price-detail', args=[999999])).status_code == 404
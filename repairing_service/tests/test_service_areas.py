@@ -0,0 +1,90 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+# Square around central Delhi with a square hole in the middle
+DELHI = {
+    'type': 'Polygon',
+    'coordinates': [
+        [[77.0, 28.4], [77.4, 28.4], [77.4, 28.8], [77.0, 28.8], [77.0, 28.4]],
+        [[77.15, 28.55], [77.25, 28.55], [77.25, 28.65], [77.15, 28.65], [77.15, 28.55]],
+    ],
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    from repairing_service.service_areas import invalidate_areas
+
+    cache.clear()
+    invalidate_areas()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def area():
+    from repairing_service.models import ServiceArea
+
+    return ServiceArea.objects.create(name='Delhi', geojson={'type': 'Feature', 'geometry': DELHI})
+
+
+@pytest.mark.django_db
+def test_out_of_area_requests_are_rejected_before_database_work(area):
+    from rest_framework.test import APIClient
+    from accounts.models import User
+    from repairing_service.service_areas import is_served, served_mask
+    from utils.geo import points_in_rings
+
+    inside = points_in_rings([28.5, 28.6, 28.9, 28.6], [77.1, 77.2, 77.1, 76.9], DELHI['coordinates'])
+    assert inside.tolist() == [True, False, False, False]
+    assert is_served(28.5, 77.1) and not is_served(19.07, 72.87)
+    assert served_mask([28.5, 28.6, 19.07], [77.1, 77.2, 72.87]).tolist() == [True, False, False]
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='customer', email='customer@example.com', password='x'))
+    with CaptureQueriesContext(connection) as context:
+        booking = client.post(
+            reverse('create-booking'),
+            {'cart_id': 1, 'latitude': 19.07, 'longitude': 72.87, 'profile': {'name': 'Customer'}},
+            format='json'
+        )
+    assert booking.status_code == 400
+    assert booking.json()['code'] == 'out_of_service_area'
+    assert len(context.captured_queries) == 0
+
+    fee = client.post(reverse('calculate-distance-fee'), {'user_latitude': 28.6, 'user_longitude': 77.2}, format='json')
+    assert fee.status_code == 400
+
+    batch = client.post(
+        reverse('calculate-distance-fee-batch'), {'points': [[28.5, 77.1], [28.6, 77.2]]}, format='json'
+    ).json()
+    assert batch['in_service_area'] == [True, False]
+    assert batch['fees'] == [0, None]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('value', ['nan', 'inf', '-Infinity'])
+def test_non_finite_coordinates_are_rejected(area, value):
+    from rest_framework.test import APIClient
+    from accounts.models import User
+
+    client = APIClient()
+    fee = client.post(reverse('calculate-distance-fee'), {'user_latitude': value, 'user_longitude': 77.2}, format='json')
+    assert fee.status_code == 400
+    assert fee.json()['error'] == 'Invalid coordinates provided'
+    fee = client.post(reverse('calculate-distance-fee'), {
+        'user_latitude': 28.5, 'user_longitude': 77.1, 'provider_latitude': value
+    }, format='json')
+    assert fee.status_code == 400
+
+    client.force_authenticate(User.objects.create_user(username='customer', email='customer@example.com', password='x'))
+    booking = client.post(
+        reverse('create-booking'),
+        {'cart_id': 1, 'latitude': 28.5, 'longitude': value, 'profile': {'name': 'Customer'}},
+        format='json'
+    )
+    assert booking.status_code == 400
+    assert booking.json()['error'] == 'Invalid coordinates provided'
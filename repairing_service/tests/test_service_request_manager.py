@@ -0,0 +1,83 @@
+import pytest
+from asgiref.sync import async_to_sync
+
+
+@pytest.fixture
+def offered_request():
+    from accounts.models import User
+    from repairing_service.models import DispatchOffer, FieldStaff, ServiceRequest
+
+    customer = User.objects.create_user(username='customer', email='customer@example.com', password='x')
+    service_request = ServiceRequest.objects.create(user=customer, reference='RMB-ASYNC', latitude=28.61, longitude=77.20)
+    mechanics = [
+        FieldStaff.objects.create(
+            user=User.objects.create_user(username=f'mechanic{i}', email=f'mechanic{i}@field.repairmybike.in', password='x'),
+            latitude=28.61, longitude=77.20, is_available=True
+        )
+        for i in range(3)
+    ]
+    DispatchOffer.objects.bulk_create([
+        DispatchOffer(service_request=service_request, field_staff=mechanic, wave=1, distance_km=1.0)
+        for mechanic in mechanics
+    ])
+    return service_request, mechanics
+
+
+@pytest.mark.django_db
+def test_acceptance_notifies_offered_mechanics_without_a_new_search(offered_request, monkeypatch):
+    from channels.layers import InMemoryChannelLayer
+    from repairing_service.models import FieldStaff, ServiceRequest
+    from repairing_service.services import ServiceRequestManager
+
+    service_request, mechanics = offered_request
+    monkeypatch.setattr(FieldStaff, 'find_nearby', classmethod(lambda *args, **kwargs: pytest.fail('searched again')))
+
+    layer = InMemoryChannelLayer()
+    channels = {}
+
+    async def join():
+        for group in [f'customer_{service_request.user_id}'] + [f'mechanic_{m.user_id}' for m in mechanics]:
+            channels[group] = await layer.new_channel()
+            await layer.group_add(group, channels[group])
+
+    async def receive(group):
+        return await layer.receive(channels[group])
+
+    async_to_sync(join)()
+    manager = ServiceRequestManager(service_request)
+    manager.channel_layer = layer
+    assert async_to_sync(manager.ahandle_mechanic_response)(mechanics[0], 'ACCEPT') is True
+
+    service_request.refresh_from_db()
+    assert service_request.status == ServiceRequest.STATUS_CONFIRMED
+    assert async_to_sync(receive)(f'customer_{service_request.user_id}')['type'] == 'service.notification'
+    for mechanic in mechanics[1:]:
+        event = async_to_sync(receive)(f'mechanic_{mechanic.user_id}')
+        assert event['type'] == 'service.cancelled'
+
+    # The sync facade behaves the same
+    assert ServiceRequestManager(service_request).handle_mechanic_response(mechanics[1], 'ACCEPT') is False
+
+
+@pytest.mark.django_db
+def test_concurrent_accepts_assign_one_mechanic(offered_request, settings):
+    from repairing_service.models import DispatchOffer, FieldStaff, ServiceRequest, ServiceRequestResponse
+    from repairing_service.services import ServiceRequestManager
+
+    settings.CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+    service_request, mechanics = offered_request
+    # Both managers loaded the request while it was still pending
+    first = ServiceRequestManager(ServiceRequest.objects.get(pk=service_request.pk))
+    second = ServiceRequestManager(ServiceRequest.objects.get(pk=service_request.pk))
+
+    assert first.handle_mechanic_response(mechanics[0], 'ACCEPT') is True
+    assert second.handle_mechanic_response(mechanics[1], 'ACCEPT') is False
+
+    assert list(FieldStaff.objects.filter(current_job=service_request)) == [mechanics[0]]
+    assert FieldStaff.objects.get(pk=mechanics[1].pk).is_available
+    assert dict(ServiceRequestResponse.objects.values_list('field_staff_id', 'accepted')) == {
+        mechanics[0].id: True, mechanics[1].id: False
+    }
+    assert dict(
+        DispatchOffer.objects.filter(responded_at__isnull=False).values_list('field_staff_id', 'accepted')
+    ) == {mechanics[0].id: True, mechanics[1].id: False}
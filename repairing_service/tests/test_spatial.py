@@ -0,0 +1,123 @@
+import math
+import random
+import pytest
+from repairing_service.spatial import GRID_CELL_DEGREES, cells_within, grid_cell
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Reference great-circle distance in km, kept independent of utils.geo"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+def point_at(latitude, longitude, distance_km, bearing_degrees):
+    """Destination point along a great circle"""
+    lat, lon, bearing = map(math.radians, (latitude, longitude, bearing_degrees))
+    angular = distance_km / 6371.0
+    lat2 = math.asin(math.sin(lat) * math.cos(angular) + math.cos(lat) * math.sin(angular) * math.cos(bearing))
+    lon2 = lon + math.atan2(
+        math.sin(bearing) * math.sin(angular) * math.cos(lat), math.cos(angular) - math.sin(lat) * math.sin(lat2)
+    )
+    return math.degrees(lat2), (math.degrees(lon2) + 540) % 360 - 180
+
+
+@pytest.mark.parametrize('center', [
+    (28.6139, 77.2090),
+    # On a cell corner
+    (28.6, 77.2),
+    (0.0, 0.0),
+    # Either side of the antimeridian
+    (10.0, 179.995),
+    (-33.9, -179.999),
+    # Near the poles, where cells are narrow
+    (89.95, 45.0),
+    (-89.5, -120.0),
+    (72.0, 179.9),
+])
+@pytest.mark.parametrize('radius_km', [0.5, 5.0, 25.0])
+def test_cells_cover_every_point_within_the_radius(center, radius_km):
+    rng = random.Random(hash((center, radius_km)))
+    cells = set(cells_within(*center, radius_km))
+    assert len(cells) == len(cells_within(*center, radius_km))
+
+    for _ in range(400):
+        # Points just inside the circle, where a too-small box would miss them
+        latitude, longitude = point_at(*center, radius_km * rng.uniform(0.9, 0.999), rng.uniform(0, 360))
+        assert haversine(*center, latitude, longitude) <= radius_km
+        assert grid_cell(latitude, longitude) in cells
+
+
+def test_cell_boundaries_belong_to_one_cell():
+    assert grid_cell(28.6, 77.2) != grid_cell(28.6 - 1e-9, 77.2)
+    assert grid_cell(28.6, 77.2) != grid_cell(28.6, 77.2 - 1e-9)
+    assert grid_cell(28.6 + GRID_CELL_DEGREES / 2, 77.2 + GRID_CELL_DEGREES / 2) == grid_cell(28.6, 77.2)
+    # Longitude wraps around and latitude is clamped at the poles
+    assert grid_cell(10.0, 180.0) == grid_cell(10.0, -180.0)
+    assert grid_cell(90.0, 10.0) == grid_cell(90.0 - 1e-9, 10.0)
+    assert grid_cell(-90.0, 10.0) == grid_cell(-90.0 + 1e-9, 10.0)
+    assert grid_cell(None, 10.0) is None
+
+
+def test_antimeridian_search_wraps_to_the_other_side():
+    east, west = grid_cell(10.0, 179.999), grid_cell(10.0, -179.999)
+    assert {east, west} <= set(cells_within(10.0, 179.999, 1.0))
+    assert {east, west} <= set(cells_within(10.0, -179.999, 1.0))
+
+
+def test_search_near_a_pole_covers_every_longitude():
+    cells = set(cells_within(89.99, 0.0, 5.0))
+    assert {grid_cell(89.995, longitude) for longitude in range(-180, 180, 7)} <= cells
+
+
+@pytest.fixture
+def mechanics():
+    from repairing_service.models import FieldStaff, ServiceRequest
+
+    rng = random.Random(7)
+    job = ServiceRequest.objects.create(reference='RMB-SPATIAL')
+    centers = [(28.6139, 77.2090), (10.0, 179.995), (89.9, 0.0)]
+    created = []
+    for latitude, longitude in centers:
+        for index in range(60):
+            point = point_at(latitude, longitude, rng.uniform(0, 12), rng.uniform(0, 360))
+            created.append(FieldStaff.objects.create(
+                latitude=point[0], longitude=point[1],
+                is_available=index % 5 != 0,
+                current_job=job if index % 7 == 0 else None
+            ))
+    return created
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('center', [(28.6139, 77.2090), (10.0, -179.999), (89.93, 10.0)])
+@pytest.mark.parametrize('available_only', [True, False])
+def test_find_nearby_matches_a_brute_force_scan(mechanics, center, available_only):
+    from repairing_service.models import FieldStaff
+
+    radius_km = 5.0
+    expected = sorted(
+        (haversine(*center, mechanic.latitude, mechanic.longitude), mechanic.id)
+        for mechanic in mechanics
+        if haversine(*center, mechanic.latitude, mechanic.longitude) <= radius_km
+        and (not available_only or (mechanic.is_available and mechanic.current_job_id is None))
+    )
+    assert expected
+
+    nearby = FieldStaff.find_nearby(*center, radius_km=radius_km, available_only=available_only)
+    assert [mechanic.id for mechanic in nearby] == [mechanic_id for _, mechanic_id in expected]
+    for mechanic, (distance, _) in zip(nearby, expected):
+        assert mechanic.distance_km == pytest.approx(distance, abs=1e-3)
+        assert mechanic.distance_km <= radius_km
+
+
+@pytest.mark.django_db
+def test_find_nearby_respects_the_radius_cutoff():
+    from repairing_service.models import FieldStaff
+
+    inside = FieldStaff.objects.create(latitude=28.6 + 0.0448, longitude=77.2, is_available=True)
+    outside = FieldStaff.objects.create(latitude=28.6 + 0.0452, longitude=77.2, is_available=True)
+    assert haversine(28.6, 77.2, inside.latitude, 77.2) < 5.0 < haversine(28.6, 77.2, outside.latitude, 77.2)
+
+    assert [mechanic.id for mechanic in FieldStaff.find_nearby(28.6, 77.2, radius_km=5.0)] == [inside.id]
+    assert FieldStaff.find_nearby(0.0, 0.0, radius_km=5.0) == []
@@ -0,0 +1,82 @@
+import io
+import pytest
+from datetime import timedelta
+
+
+def l_shaped_track():
+    """North for five points then east for five, with about 3 m of jitter"""
+    lats = [28.600, 28.601, 28.602, 28.603, 28.604, 28.605, 28.605, 28.605, 28.605, 28.605, 28.605]
+    lons = [77.200, 77.20003, 77.200, 77.20003, 77.200, 77.200, 77.201, 77.202, 77.203, 77.204, 77.205]
+    return lats, lons
+
+
+def test_simplify_keeps_endpoints_and_corners_within_tolerance():
+    from utils.geo import simplify_track
+
+    lats, lons = l_shaped_track()
+    assert simplify_track(lats, lons, tolerance_m=10.0).nonzero()[0].tolist() == [0, 5, 10]
+    # A tolerance below the jitter keeps the jittered points as well
+    assert simplify_track(lats, lons, tolerance_m=1.0).nonzero()[0].tolist() == [0, 1, 2, 3, 4, 5, 10]
+    assert simplify_track([28.6, 28.7], [77.2, 77.2], tolerance_m=10.0).tolist() == [True, True]
+    assert simplify_track([], [], tolerance_m=10.0).tolist() == []
+
+
+@pytest.fixture
+def completed_track(monkeypatch):
+    from django.utils import timezone
+    from repairing_service.location_ingest import location_buffer
+    from repairing_service.models import FieldStaff, LiveLocation, ServiceRequest
+
+    monkeypatch.setattr(location_buffer, 'flush', lambda: 0)
+    mechanic = FieldStaff.objects.create()
+    service_request = ServiceRequest.objects.create(reference='RMB-TRACK', status=ServiceRequest.STATUS_COMPLETED)
+    started = timezone.now() - timedelta(minutes=30)
+    lats, lons = l_shaped_track()
+    LiveLocation.objects.bulk_create([
+        LiveLocation(
+            field_staff=mechanic, service_request=service_request, latitude=latitude, longitude=longitude,
+            timestamp=started + timedelta(minutes=step)
+        )
+        for step, (latitude, longitude) in enumerate(zip(lats, lons))
+    ])
+    return mechanic, service_request
+
+
+@pytest.mark.django_db
+def test_track_summary_from_raw_points(completed_track):
+    from repairing_service.tracking import build_track_summary
+
+    mechanic, service_request = completed_track
+    summary = build_track_summary(service_request.id)
+    assert summary.field_staff_id == mechanic.id
+    assert summary.point_count == 11
+    assert summary.duration_seconds == 600
+    # About 555 m north, then about 488 m east
+    assert summary.distance_km == pytest.approx(1.04, abs=0.01)
+    assert summary.average_speed_kmh == pytest.approx(summary.distance_km * 6, abs=0.01)
+
+
+@pytest.mark.django_db
+def test_compaction_command_simplifies_and_expires_points(completed_track):
+    from django.core.management import call_command
+    from django.utils import timezone
+    from repairing_service.models import LiveLocation, ServiceRequest
+    from repairing_service.tracking import build_track_summary
+
+    mechanic, service_request = completed_track
+    build_track_summary(service_request.id)
+    open_request = ServiceRequest.objects.create(reference='RMB-OPEN')
+    old = timezone.now() - timedelta(days=40)
+    LiveLocation.objects.bulk_create([
+        LiveLocation(field_staff=mechanic, service_request=open_request, latitude=28.6, longitude=77.2, timestamp=old),
+        LiveLocation(field_staff=mechanic, service_request=open_request, latitude=28.6, longitude=77.2,
+                     timestamp=timezone.now()),
+    ])
+
+    call_command('compact_live_locations', '--min-age-minutes', '0', '--retention-days', '30', stdout=io.StringIO())
+
+    kept = LiveLocation.objects.filter(service_request=service_request).order_by('timestamp')
+    assert [(point.latitude, point.longitude) for point in kept] == [(28.6, 77.2), (28.605, 77.2), (28.605, 77.205)]
+    service_request.track_summary.refresh_from_db()
+    assert service_request.track_summary.compacted_point_count == 3
+    assert LiveLocation.objects.filter(service_request=open_request).count() == 1
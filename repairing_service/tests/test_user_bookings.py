@@ -0,0 +1,95 @@
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+@pytest.fixture
+def catalog():
+    from repairing_service.models import Service, ServiceCategory
+    from vehicle.models import Manufacturer, VehicleModel, VehicleType
+
+    category = ServiceCategory.objects.create(name='Engine', slug='engine')
+    services = [
+        Service.objects.create(
+            name=f'Service {i}', slug=f'service-{i}', category=category, description='',
+            base_price=Decimal('250.00'), duration='1h', warranty='30 days'
+        )
+        for i in range(2)
+    ]
+    vehicle_type = VehicleType.objects.create(name='Bike')
+    manufacturer = Manufacturer.objects.create(name='Hero')
+    # bulk_create skips the post_save hook that rewrites setup_vehicle_data.py
+    vehicle_model, = VehicleModel.objects.bulk_create([
+        VehicleModel(name='Splendor', manufacturer=manufacturer, vehicle_type=vehicle_type)
+    ])
+    return services, vehicle_type, manufacturer, vehicle_model
+
+
+def create_bookings(user, count, catalog):
+    from repairing_service.models import ServiceRequest
+
+    services, vehicle_type, manufacturer, vehicle_model = catalog
+    bookings = ServiceRequest.objects.bulk_create([
+        ServiceRequest(
+            user=user, reference=f'RMB-{user.id}-{i}', vehicle_type=vehicle_type,
+            manufacturer=manufacturer, vehicle_model=vehicle_model
+        )
+        for i in range(count)
+    ])
+    Through = ServiceRequest.services.through
+    Through.objects.bulk_create([
+        Through(servicerequest_id=booking.id, service_id=service.id)
+        for booking in bookings for service in services
+    ])
+    return bookings
+
+
+def count_queries(user, page_size):
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(user)
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(reverse('user-bookings'), {'page_size': page_size})
+    assert response.status_code == 200
+    return len(context.captured_queries), response.json()
+
+
+@pytest.mark.django_db
+def test_user_bookings_query_count_is_constant(catalog):
+    from accounts.models import User
+
+    one = User.objects.create_user(username='one', email='one@example.com', password='x')
+    many = User.objects.create_user(username='many', email='many@example.com', password='x')
+    create_bookings(one, 1, catalog)
+    create_bookings(many, 500, catalog)
+
+    single_queries, single = count_queries(one, 100)
+    many_queries, page = count_queries(many, 100)
+
+    assert single_queries == many_queries
+    assert len(single['results']) == 1
+    assert len(page['results']) == 100 and page['next']
+    booking = page['results'][0]
+    assert booking['vehicle']['model_name'] == 'Splendor'
+    assert len(booking['services']) == 2
+
+
+@pytest.mark.django_db
+def test_user_bookings_get_does_not_write_zero_totals(catalog):
+    from accounts.models import User
+    from repairing_service.services import BookingTotalService
+
+    user = User.objects.create_user(username='user', email='user@example.com', password='x')
+    booking, = create_bookings(user, 1, catalog)
+
+    _, page = count_queries(user, 20)
+    assert page['results'][0]['total_amount'] == '500.0'
+    booking.refresh_from_db()
+    assert booking.total_amount == 0
+
+    assert BookingTotalService.reconcile_zero_totals() == 1
+    booking.refresh_from_db()
+    assert booking.total_amount == Decimal('500.00')
@@ -0,0 +1,131 @@
+"""
+Track summaries, compaction and retention for LiveLocation.
+
+A TrackSummary (distance travelled, duration, average speed) is computed
+once when a service request completes. The compaction job later replaces a
+completed track's raw points with a Douglas-Peucker simplification that
+stays within a configurable error, and raw points older than the retention
+window are deleted in batches.
+"""
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from utils.geo import segment_distances, simplify_track
+from .models import LiveLocation, ServiceRequest, TrackSummary
+
+
+def _load_track(service_request_id):
+    return list(
+        LiveLocation.objects
+        .filter(service_request_id=service_request_id)
+        .order_by('timestamp', 'id')
+        .values_list('id', 'field_staff_id', 'latitude', 'longitude', 'timestamp')
+    )
+
+
+def build_track_summary(service_request_id):
+    """Compute and store the TrackSummary of a service request from its raw points"""
+    from .location_ingest import location_buffer
+
+    # Make sure the last buffered pings of the job are in the table
+    location_buffer.flush()
+    points = _load_track(service_request_id)
+
+    values = {
+        'field_staff_id': None,
+        'distance_km': 0.0,
+        'duration_seconds': 0,
+        'average_speed_kmh': 0.0,
+        'point_count': len(points),
+        'started_at': None,
+        'ended_at': None,
+        'computed_at': timezone.now(),
+    }
+    if points:
+        lats = [point[2] for point in points]
+        lons = [point[3] for point in points]
+        distance_km = float(segment_distances(lats, lons).sum())
+        started_at, ended_at = points[0][4], points[-1][4]
+        duration = int((ended_at - started_at).total_seconds())
+        values.update({
+            'field_staff_id': points[-1][1],
+            'distance_km': round(distance_km, 3),
+            'duration_seconds': duration,
+            'average_speed_kmh': round(distance_km / (duration / 3600.0), 2) if duration else 0.0,
+            'started_at': started_at,
+            'ended_at': ended_at,
+        })
+
+    summary, _ = TrackSummary.objects.update_or_create(
+        service_request_id=service_request_id,
+        defaults=values
+    )
+    return summary
+
+
+def compact_track(summary, tolerance_m=10.0, batch_size=5000):
+    """
+    Replace a completed track's raw points with its Douglas-Peucker
+    simplification. Returns the number of points deleted.
+    """
+    points = _load_track(summary.service_request_id)
+    keep = simplify_track(
+        [point[2] for point in points],
+        [point[3] for point in points],
+        tolerance_m
+    )
+    drop_ids = [point[0] for point, kept in zip(points, keep.tolist()) if not kept]
+
+    for offset in range(0, len(drop_ids), batch_size):
+        with transaction.atomic():
+            LiveLocation.objects.filter(id__in=drop_ids[offset:offset + batch_size]).delete()
+
+    summary.compacted_at = timezone.now()
+    summary.compacted_point_count = len(points) - len(drop_ids)
+    summary.save(update_fields=['compacted_at', 'compacted_point_count'])
+    return len(drop_ids)
+
+
+def completed_tracks_to_compact(min_age_minutes=10):
+    """Summaries of completed requests that have not been compacted yet"""
+    settled_before = timezone.now() - timedelta(minutes=min_age_minutes)
+    return TrackSummary.objects.filter(
+        compacted_at__isnull=True,
+        computed_at__lt=settled_before,
+        service_request__status=ServiceRequest.STATUS_COMPLETED
+    )
+
+
+def completed_requests_without_summary():
+    return ServiceRequest.objects.filter(
+        status=ServiceRequest.STATUS_COMPLETED,
+        track_summary__isnull=True,
+        livelocation__isnull=False
+    ).distinct().values_list('id', flat=True)
+
+
+def delete_expired_points(retention_days, batch_size=5000):
+    """
+    Delete raw points older than the retention window, batch by batch.
+    Simplified tracks of compacted requests are kept.
+    Returns the number of rows deleted.
+    """
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    expired = (
+        LiveLocation.objects
+        .filter(timestamp__lt=cutoff)
+        .exclude(service_request__track_summary__compacted_at__isnull=False)
+        .order_by('timestamp')
+        .values_list('id', flat=True)
+    )
+    deleted = 0
+    while True:
+        ids = list(expired[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            count, _ = LiveLocation.objects.filter(id__in=ids).delete()
+        deleted += count
+        if len(ids) < batch_size:
+            break
+    return deleted
@@ -10,6 +10,8 @@ from .views.views import (
     ServiceCategoryListView,
     ServiceListByCategoryView,
     ServicePriceDetailView,
+    VehicleModelServicePricesView,
+    ServiceCatalogView,
     CartDetailView,
     RemoveCartItemView,
     AddToCartView,
@@ -19,6 +21,7 @@ from .views.views import (
     ServiceRequestResponseDetailView,
     LiveLocationView,
     CalculateDistanceFeeView,
+    CalculateDistanceFeesBatchView,
     UpdateCartItemView,
     ClearCartView,
     CreateBookingView,
@@ -40,6 +43,7 @@ from .views.chatbot import (
 # Import admin views
 from .views.admin_views import (
     AdminDashboardStatisticsView, 
+    AdminLocationPingStatsView,
     AdminNotificationsView, 
     AdminRequestsView, 
     AdminRequestStatusUpdateView
@@ -57,7 +61,9 @@ urlpatterns = [
     path('vehicle-models/', VehicleModelListView.as_view(), name='vehicle-model-list'),
     path('service-categories/', ServiceCategoryListView.as_view(), name='service-category-list'),
     path('services/', ServiceListByCategoryView.as_view(), name='service-list'),
-    path('service-price/<uuid:service_id>/', ServicePriceDetailView.as_view(), name='service-price-detail'),
+    path('catalog/', ServiceCatalogView.as_view(), name='service-catalog'),
+    path('service-price/<int:service_id>/', ServicePriceDetailView.as_view(), name='service-price-detail'),
+    path('vehicle-models/<int:vehicle_model_id>/service-prices/', VehicleModelServicePricesView.as_view(), name='vehicle-model-service-prices'),
     
     # Cart related endpoints
     path('cart/create/', create_cart, name='create-cart'),
@@ -90,6 +96,7 @@ urlpatterns = [
     
     # Utility endpoints
     path('calculate-distance-fee/', CalculateDistanceFeeView.as_view(), name='calculate-distance-fee'),
+    path('calculate-distance-fee/batch/', CalculateDistanceFeesBatchView.as_view(), name='calculate-distance-fee-batch'),
     path('pricing-plans/', PricingPlanListView.as_view(), name='pricing-plans'),
     
     # Chatbot endpoints
@@ -101,6 +108,9 @@ urlpatterns = [
     path('admin/dashboard/statistics/', 
          AdminDashboardStatisticsView.as_view(), 
          name='admin-dashboard-statistics'),
+    path('admin/tracking/pings/',
+         AdminLocationPingStatsView.as_view(),
+         name='admin-location-ping-stats'),
     path('admin/notifications/', 
          AdminNotificationsView.as_view(), 
          name='admin-notifications'),
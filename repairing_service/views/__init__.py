@@ -18,6 +18,7 @@ from .views import (
     ServiceRequestResponseDetailView,
     LiveLocationView,
     CalculateDistanceFeeView,
+    CalculateDistanceFeesBatchView,
     UpdateCartItemView,
     ClearCartView,
     CreateBookingView,
@@ -34,6 +35,7 @@ from .chatbot import chatbot_webhook, analyze_intent, get_chat_history
 # Import admin views
 from .admin_views import (
     AdminDashboardStatisticsView,
+    AdminLocationPingStatsView,
     AdminNotificationsView,
     AdminRequestsView,
     AdminRequestStatusUpdateView
@@ -57,6 +59,7 @@ __all__ = [
     'ServiceRequestResponseDetailView',
     'LiveLocationView',
     'CalculateDistanceFeeView',
+    'CalculateDistanceFeesBatchView',
     'UpdateCartItemView',
     'ClearCartView',
     'chatbot_webhook',
@@ -70,6 +73,7 @@ __all__ = [
     'CancelServiceNowView',
     # Admin views
     'AdminDashboardStatisticsView',
+    'AdminLocationPingStatsView',
     'AdminNotificationsView',
     'AdminRequestsView',
     'AdminRequestStatusUpdateView'
@@ -2,7 +2,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from django.db.models import Sum, Count
+from django.db.models import Count
 from django.utils import timezone
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
@@ -10,7 +10,7 @@ import json
 import uuid
 from django.contrib.auth import get_user_model
 
-from marketplace.models import Vehicle, SellRequest, Notification, VehiclePurchase
+from marketplace.models import SellRequest, Notification
 from accounts.models import User, UserProfile
 from repairing_service.models import ServiceRequest
 
@@ -25,30 +25,8 @@ class AdminDashboardStatisticsView(APIView):
     def get(self, request):
         """Get dashboard statistics data"""
         try:
-            # Get user counts
-            total_users = User.objects.count()
-            total_vehicles = Vehicle.objects.count()
-            total_sell_requests = SellRequest.objects.count()
-            total_service_requests = ServiceRequest.objects.count()
-            pending_sell_requests = SellRequest.objects.filter(status='PENDING').count()
-            pending_repair_requests = ServiceRequest.objects.filter(status='PENDING').count()
-            
-            # Calculate revenue (this is a simplified example)
-            vehicle_revenue = VehiclePurchase.objects.aggregate(total=Sum('price'))['total'] or 0
-            service_revenue = ServiceRequest.objects.filter(status='COMPLETED').aggregate(total=Sum('total_amount'))['total'] or 0
-            total_revenue = vehicle_revenue + service_revenue
-            
-            statistics = {
-                'totalUsers': total_users,
-                'totalVehicles': total_vehicles,
-                'totalSales': total_sell_requests,
-                'totalServices': total_service_requests,
-                'pendingSellRequests': pending_sell_requests,
-                'pendingRepairRequests': pending_repair_requests,
-                'totalRevenue': f'₹{total_revenue:,.2f}'
-            }
-            
-            return Response(statistics)
+            from repairing_service.dashboard_counters import dashboard_statistics
+            return Response(dashboard_statistics())
         
         except Exception as e:
             return Response(
@@ -57,6 +35,17 @@ class AdminDashboardStatisticsView(APIView):
             )
 
 
+class AdminLocationPingStatsView(APIView):
+    """
+    API endpoint for live location ping counters (accepted, coalesced, dropped)
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        from repairing_service.ping_control import ping_counters
+        return Response(ping_counters.totals())
+
+
 class AdminNotificationsView(APIView):
     """
     API endpoint for admin notifications
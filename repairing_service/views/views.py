@@ -1,43 +1,72 @@
 from rest_framework import generics, viewsets, status
 from rest_framework.generics import CreateAPIView, ListAPIView
+from rest_framework.pagination import CursorPagination
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.decorators import api_view
-from rest_framework.permissions import AllowAny, IsAuthenticated
-from ..models import Feature, ServiceCategory, Service, ServicePrice, Cart, CartItem, FieldStaff, ServiceRequest, ServiceRequestResponse, LiveLocation, DistancePricingRule, PricingPlan, AdditionalService
+from rest_framework.decorators import action, api_view
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from ..models import Feature, ServiceCategory, Service, ServicePrice, Cart, CartItem, FieldStaff, ServiceRequest, ServiceRequestResponse, LiveLocation, PricingPlan, AdditionalService
 from ..serializers import ServicePriceSerializer, ServiceSerializer, ServiceCategorySerializer, FeatureSerializer, CartSerializer, CartItemSerializer, FieldStaffSerializer, ServiceRequestSerializer, ServiceRequestResponseSerializer, LiveLocationSerializer, PricingPlanSerializer, AdditionalServiceSerializer
 from django.shortcuts import render, get_object_or_404
-from vehicle.models import Manufacturer, VehicleModel, VehicleType
+from vehicle.models import Manufacturer, VehicleModel
 from vehicle.serializers import VehicleModelSerializer, ManufacturerSerializer
 from accounts.models import User
+import gzip
+import math
 import uuid
+import numpy as np
+from decimal import Decimal
 import datetime
 import json
-from django.http import Http404
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
 from django.utils import timezone
 from rest_framework.renderers import JSONRenderer
-from django.db.models import Q
+from django.db.models import Count, DecimalField, F, Prefetch, Q, Sum
 from django.db import transaction
-from rest_framework import serializers
+from ..positions import remember_position, request_position, staff_position
+from ..cart_store import CartBusy, cart_store
+from ..price_matrix import price_matrix
+from ..catalog import catalog_snapshot
+from ..distance_pricing import distance_fees, pricing_for, quote_many
+from ..service_areas import is_served, served_mask
 
 # Add this new API view for creating carts
+def service_area_error(latitude, longitude):
+    """
+    Error response when a location is invalid or outside every service area,
+    None when it is served or was not given. Uses the in-memory area index only.
+    """
+    if latitude in (None, '') or longitude in (None, ''):
+        return None
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        latitude = longitude = math.nan
+    # float() also accepts 'nan' and 'inf'
+    if not (math.isfinite(latitude) and math.isfinite(longitude)):
+        return Response({"error": "Invalid coordinates provided"}, status=status.HTTP_400_BAD_REQUEST)
+    if not is_served(latitude, longitude):
+        return Response(
+            {"error": "Sorry, this location is outside our service area", "code": "out_of_service_area"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return None
+
 @api_view(['POST'])
 def create_cart(request):
     """Create a new cart and return its ID"""
     print(f"[DEBUG] Creating cart for user: {request.user.username if request.user.is_authenticated else 'anonymous'}")
     
-    # Create the cart with user if authenticated
-    cart = Cart.objects.create(
-        user=request.user if request.user.is_authenticated else None,
-        status='active'  # Explicitly set status to active
-    )
+    # Anonymous carts live in the cart store only until they check out
+    cart = cart_store.create(request.user if request.user.is_authenticated else None)
     
     # Store cart ID in session
-    request.session['cart_id'] = cart.id
-    print(f"[DEBUG] Created cart with ID: {cart.id}")
+    request.session['cart_id'] = cart['id']
+    print(f"[DEBUG] Created cart with ID: {cart['id']}")
     
     return Response({
-        "id": cart.id,
+        "id": cart['id'],
         "status": "success",
         "message": "Cart created successfully"
     }, status=status.HTTP_201_CREATED)
@@ -85,45 +114,80 @@ class ServicePriceDetailView(generics.RetrieveAPIView):
         manufacturer_id = self.request.query_params.get('manufacturer_id')
         vehicle_model_id = self.request.query_params.get('vehicle_model_id')
         
+        # Specific price for this combination, or the service's base price
         try:
-            # First get the service by ID
-            service = Service.objects.get(id=service_id)
-            
-            try:
-                # Then try to get the specific price for this combination
-                return ServicePrice.objects.get(
-                    service=service,
-                    manufacturer_id=manufacturer_id,
-                    vehicle_model_id=vehicle_model_id
-                )
-            except ServicePrice.DoesNotExist:
-                # If no specific price exists, create a temporary ServicePrice object
-                temp_price = ServicePrice(
-                    service=service,
-                    manufacturer_id=manufacturer_id,
-                    vehicle_model_id=vehicle_model_id,
-                    price=service.base_price
-                )
-                return temp_price
-                
-        except Service.DoesNotExist:
+            found = price_matrix.lookup(service_id, manufacturer_id, vehicle_model_id)
+        except ValueError:
+            raise Http404("Invalid manufacturer or vehicle model")
+        if found is None:
             raise Http404(f"Service with ID {service_id} does not exist")
+        price, price_id = found
+        
+        # Unsaved (id None) when it is the base price
+        return ServicePrice(
+            id=price_id,
+            service_id=int(service_id),
+            manufacturer_id=manufacturer_id or None,
+            vehicle_model_id=vehicle_model_id or None,
+            price=price
+        )
+
+class VehicleModelServicePricesView(APIView):
+    permission_classes = [AllowAny]
+    renderer_classes = [JSONRenderer]
+    
+    def get(self, request, vehicle_model_id):
+        """Price of every service for one vehicle model"""
+        manufacturer_id = VehicleModel.objects.filter(id=vehicle_model_id).values_list('manufacturer_id', flat=True).first()
+        if manufacturer_id is None:
+            raise Http404("Vehicle model not found")
+        
+        return Response({
+            "vehicle_model": vehicle_model_id,
+            "manufacturer": manufacturer_id,
+            "prices": price_matrix.prices_for_model(vehicle_model_id)
+        })
+
+class ServiceCatalogView(APIView):
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        """
+        Whole service catalog in one gzip-compressed JSON document.
+        Clients send back the ETag in If-None-Match and get a 304 until the
+        catalog changes.
+        """
+        snapshot = catalog_snapshot()
+        etag = f'"{snapshot.etag}"'
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+            response = HttpResponse(snapshot.body, content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(gzip.decompress(snapshot.body), content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        response['Vary'] = 'Accept-Encoding'
+        return response
 
 class CartDetailView(generics.RetrieveAPIView):
     serializer_class = CartSerializer
     permission_classes = [AllowAny]
     renderer_classes = [JSONRenderer]
-    def get_object(self):
-        cart_id = self.kwargs['cart_id']
-        return get_object_or_404(Cart, id=cart_id)
+    def retrieve(self, request, *args, **kwargs):
+        cart = cart_store.get(self.kwargs['cart_id'])
+        if cart is None:
+            raise Http404("Cart not found")
+        return Response(cart_store.render(cart))
 
 class RemoveCartItemView(generics.DestroyAPIView):
     permission_classes = [AllowAny]
     renderer_classes = [JSONRenderer]
     def delete(self, request, *args, **kwargs):
-        cart_item_id = self.kwargs['cart_item_id']
-        cart_item = get_object_or_404(CartItem, id=cart_item_id)
-        cart_item.delete()
+        if not cart_store.remove_item(self.kwargs['cart_item_id']):
+            raise Http404("Cart item not found")
         return Response({"status": "success"})
 
 class AddToCartView(generics.CreateAPIView):
@@ -133,7 +197,8 @@ class AddToCartView(generics.CreateAPIView):
     def create(self, request, *args, **kwargs):
         try:
             cart_id = self.kwargs['cart_id']
-            cart = get_object_or_404(Cart, id=cart_id)
+            if cart_store.get(cart_id) is None:
+                return Response({"error": "Cart not found"}, status=status.HTTP_404_NOT_FOUND)
             
             # Validate required fields
             if 'service_id' not in request.data:
@@ -153,7 +218,7 @@ class AddToCartView(generics.CreateAPIView):
         
             try:
                 # Try to get service by ID
-                service = Service.objects.get(id=service_id)
+                service = Service.objects.only('id', 'name', 'base_price').get(id=service_id)
             except Service.DoesNotExist:
                 # If service doesn't exist but we have a name, create a temporary one
                 if 'service_name' in request.data:
@@ -175,24 +240,20 @@ class AddToCartView(generics.CreateAPIView):
                         status=status.HTTP_404_NOT_FOUND
                     )
             
-            # Handle unique constraint by using get_or_create
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart, service=service,
-                defaults={'quantity': quantity}
-            )
-            
-            if not created:
-                cart_item.quantity += quantity
-                cart_item.save()
+            # Adding a service already in the cart increases its quantity
+            cart, cart_item_id = cart_store.add_item(cart_id, service, quantity)
+            if cart is None:
+                return Response({"error": "Cart not found"}, status=status.HTTP_404_NOT_FOUND)
                 
             # Return the updated cart data
-            serializer = CartSerializer(cart)
             return Response({
                 "status": "success", 
-                "cart_item_id": cart_item.id,
-                "cart": serializer.data
+                "cart_item_id": cart_item_id,
+                "cart": cart_store.render(cart)
             })
             
+        except CartBusy:
+            raise
         except ValueError as e:
             return Response(
                 {"error": f"Invalid value: {str(e)}"}, 
@@ -251,17 +312,19 @@ class ServiceRequestViewSet(viewsets.ModelViewSet):
 class FieldStaffViewSet(viewsets.ModelViewSet):
     queryset = FieldStaff.objects.all()
     serializer_class = FieldStaffSerializer
-    permission_classes = [AllowAny]
+    # Live coordinates, availability and ratings drive dispatch: staff only
+    permission_classes = [IsAdminUser]
     renderer_classes = [JSONRenderer]
 
+    @action(detail=True, methods=['get'], url_path='current-location')
     def current_location(self, request, pk=None):
-        field_staff = self.get_object()
-        serializer = LiveLocationSerializer(data=request.data)
-        if serializer.is_valid():
-            serializer.save(field_staff=field_staff)
-            return Response(serializer.data)
-        else:
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            position = staff_position(int(pk))
+        except ValueError:
+            raise Http404("Field staff not found")
+        if position is None:
+            raise Http404("No location reported for this field staff")
+        return Response(position)
 
 class PricingPlanListView(generics.ListAPIView):
     queryset = PricingPlan.objects.all()
@@ -319,34 +382,15 @@ class CreateBookingView(APIView):
             # Set purchase type based on request type
             purchase_type = ServiceRequest.PURCHASE_TYPE_CART if cart_id else ServiceRequest.PURCHASE_TYPE_DIRECT
             
-            # Handle cart checkout
-            if cart_id:
-                cart = get_object_or_404(Cart, id=cart_id)
-                cart_items = CartItem.objects.filter(cart=cart)
-                
-                if not cart_items.exists():
-                    return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
-                
-                # Calculate total amount from cart items
-                service_total = sum(
-                    float(item.price) * item.quantity for item in cart_items if hasattr(item, 'price') and item.price
-                )
-            
-            # Handle direct purchase
-            else:
-                service = get_object_or_404(Service, id=service_id)
-                service_total = float(service.base_price)
-            
-            # Generate a booking reference
-            reference = f"RMB-{uuid.uuid4().hex[:8].upper()}"
-            
             # Get location and distance fee data
             latitude = request.data.get('latitude')
             longitude = request.data.get('longitude')
             distance_fee = request.data.get('distanceFee', 0)
             
-            # Calculate total with distance fee
-            total_amount = service_total + float(distance_fee)
+            # Reject locations we do not serve before any database work
+            error = service_area_error(latitude, longitude)
+            if error is not None:
+                return error
             
             # Get user profile and schedule data
             profile_data = request.data.get('profile', {})
@@ -354,55 +398,90 @@ class CreateBookingView(APIView):
             scheduled_date = request.data.get('scheduleDate') or profile_data.get('scheduleDate')
             scheduled_time = request.data.get('scheduleTime') or profile_data.get('scheduleTime')
             
-            # Create service request data
-            service_request_data = {
-                'user': request.user,
-                'customer_name': profile_data.get('name', request.user.username),
-                'customer_email': profile_data.get('email', request.user.email),
-                'customer_phone': profile_data.get('phone', ''),
-                'address': profile_data.get('address', ''),
-                'city': profile_data.get('city', ''),
-                'state': profile_data.get('state', ''),
-                'postal_code': profile_data.get('postalCode', ''),
-                'reference': reference,
-                'status': ServiceRequest.STATUS_PENDING,
-                'purchase_type': purchase_type,  # Set the purchase type
-                'total_amount': str(total_amount),
-                'scheduled_date': scheduled_date,
-                'schedule_time': scheduled_time,
-                'latitude': latitude,
-                'longitude': longitude,
-                'distance_fee': distance_fee,
-                'notes': f"{'Cart checkout' if cart_id else 'Direct purchase'} from website"
-            }
-            
-            # Add vehicle data if available
-            if vehicle_data.get('vehicle_type'):
-                service_request_data['vehicle_type_id'] = vehicle_data.get('vehicle_type')
-            if vehicle_data.get('manufacturer'):
-                service_request_data['manufacturer_id'] = vehicle_data.get('manufacturer')
-            if vehicle_data.get('model'):
-                service_request_data['vehicle_model_id'] = vehicle_data.get('model')
-            
-            # Create the service request
-            service_request = ServiceRequest.objects.create(**service_request_data)
-            
-            # Add services to the request
+            # Write the cached cart to the database first; an anonymous cart
+            # converts into a Cart row owned by the user here
             if cart_id:
-                # Add all services from cart
-                for item in cart_items:
-                    service_request.services.add(item.service)
-                # Clear the cart after successful booking
-                cart.delete()
-            else:
-                # Add the single service for direct purchase
-                service_request.services.add(service)
+                cart_id = cart_store.persist(cart_id, user=request.user)
+                if cart_id is None:
+                    raise Http404("Cart not found")
+            
+            # The cart is locked, read, converted and deleted in one transaction
+            # so a double submit cannot book the same cart twice
+            with transaction.atomic():
+                if cart_id:
+                    cart = get_object_or_404(Cart.objects.select_for_update(), id=cart_id)
+                    cart_items = CartItem.objects.filter(cart=cart)
+                    
+                    # Total and item count in one aggregate query
+                    totals = cart_items.aggregate(
+                        item_count=Count('id'),
+                        service_total=Sum(
+                            F('service__base_price') * F('quantity'),
+                            output_field=DecimalField(max_digits=12, decimal_places=2)
+                        )
+                    )
+                    if not totals['item_count']:
+                        return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
+                    service_total = totals['service_total'] or Decimal('0')
+                    service_ids = list(cart_items.values_list('service_id', flat=True))
+                
+                # Handle direct purchase
+                else:
+                    service = get_object_or_404(Service.objects.only('id', 'base_price'), id=service_id)
+                    service_total = service.base_price
+                    service_ids = [service.id]
+                
+                # Calculate total with distance fee
+                total_amount = service_total + Decimal(str(distance_fee or 0))
+                
+                # Create service request data
+                service_request_data = {
+                    'user': request.user,
+                    'customer_name': profile_data.get('name', request.user.username),
+                    'customer_email': profile_data.get('email', request.user.email),
+                    'customer_phone': profile_data.get('phone', ''),
+                    'address': profile_data.get('address', ''),
+                    'city': profile_data.get('city', ''),
+                    'state': profile_data.get('state', ''),
+                    'postal_code': profile_data.get('postalCode', ''),
+                    # Generate a booking reference
+                    'reference': f"RMB-{uuid.uuid4().hex[:8].upper()}",
+                    'status': ServiceRequest.STATUS_PENDING,
+                    'purchase_type': purchase_type,  # Set the purchase type
+                    'total_amount': total_amount,
+                    'scheduled_date': scheduled_date,
+                    'schedule_time': scheduled_time,
+                    'latitude': latitude,
+                    'longitude': longitude,
+                    'distance_fee': distance_fee,
+                    'notes': f"{'Cart checkout' if cart_id else 'Direct purchase'} from website"
+                }
+                
+                # Add vehicle data if available
+                if vehicle_data.get('vehicle_type'):
+                    service_request_data['vehicle_type_id'] = vehicle_data.get('vehicle_type')
+                if vehicle_data.get('manufacturer'):
+                    service_request_data['manufacturer_id'] = vehicle_data.get('manufacturer')
+                if vehicle_data.get('model'):
+                    service_request_data['vehicle_model_id'] = vehicle_data.get('model')
+                
+                # Create the service request and attach all services in one insert
+                service_request = ServiceRequest.objects.create(**service_request_data)
+                service_request.services.add(*service_ids)
+                
+                if cart_id:
+                    # Clear the cart after successful booking
+                    cart.delete()
+            if cart_id:
+                cart_store.discard(cart_id)
             
             # Return the booking details
             response_data = ServiceRequestSerializer(service_request).data
             response_data['message'] = "Booking created successfully. Our service experts will contact you shortly."
             return Response(response_data, status=status.HTTP_201_CREATED)
             
+        except (Http404, CartBusy):
+            raise
         except Exception as e:
             print(f"[ERROR] Booking creation failed: {str(e)}")
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -423,11 +502,29 @@ class LiveLocationView(generics.RetrieveUpdateAPIView):
     
     def get_object(self):
         service_request_id = self.kwargs['service_request_id']
-        try:
-            location = LiveLocation.objects.get(service_request_id=service_request_id)
-            return location
-        except LiveLocation.DoesNotExist:
+        location = (
+            LiveLocation.objects
+            .filter(service_request_id=service_request_id)
+            .order_by('-timestamp', '-id')
+            .first()
+        )
+        if location is None:
+            raise Http404("Live location not found for this service request")
+        return location
+
+    def retrieve(self, request, *args, **kwargs):
+        # Customers poll this endpoint, so it is served from the position cache
+        position = request_position(self.kwargs['service_request_id'])
+        if position is None:
             raise Http404("Live location not found for this service request")
+        return Response(position)
+
+    def perform_update(self, serializer):
+        location = serializer.save()
+        remember_position(
+            location.field_staff_id, location.service_request_id,
+            location.latitude, location.longitude, location.timestamp
+        )
 
 class CalculateDistanceFeeView(APIView):
     permission_classes = [AllowAny]
@@ -445,71 +542,105 @@ class CalculateDistanceFeeView(APIView):
                 {"error": "Invalid coordinates provided"},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if not all(math.isfinite(value) for value in (user_lat, user_lng, provider_lat, provider_lng)):
+            return Response(
+                {"error": "Invalid coordinates provided"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # If provider coordinates aren't provided, use shop coordinates
-        # In a real app, you might get these from your app settings
-        if provider_lat == 0 and provider_lng == 0:
-            provider_lat = 40.7128  # Example: NYC coordinates
-            provider_lng = -74.0060
-            
-        # Calculate distance using Haversine formula
-        from math import radians, sin, cos, sqrt, atan2
-        
-        R = 6371  # Earth radius in kilometers
-        
-        # Convert coordinates from degrees to radians
-        lat1 = radians(user_lat)
-        lon1 = radians(user_lng)
-        lat2 = radians(provider_lat)
-        lon2 = radians(provider_lng)
+        if not is_served(user_lat, user_lng):
+            return Response(
+                {"error": "Sorry, this location is outside our service area", "code": "out_of_service_area"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Haversine formula
-        dlon = lon2 - lon1
-        dlat = lat2 - lat1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        distance = R * c  # Distance in kilometers
+        # Nearest service center and its pricing rule, from the in-memory index;
+        # without any pricing configured travel is free
+        pricing = pricing_for(user_lat, user_lng)
+        if pricing is None:
+            return Response({
+                "distance": None,
+                "unit": "kilometers",
+                "fee": 0,
+                "within_free_radius": True,
+                "currency": "USD"
+            })
+        pricing_rule = pricing.rule
         
-        # Round to 2 decimal places
-        distance = round(distance, 2)
+        # Distance from the provider if given, otherwise from the service center
+        origin = (pricing.latitude, pricing.longitude)
+        if provider_lat != 0 or provider_lng != 0:
+            origin = (provider_lat, provider_lng)
+        distances, fees = distance_fees(pricing_rule, [user_lat], [user_lng], origin)
+        distance = round(float(distances[0]), 2)
         
-        # Calculate fee based on distance pricing rules
-        try:
-            # Get applicable distance pricing rule
-            pricing_rule = DistancePricingRule.objects.filter(
-                min_distance__lte=distance, 
-                max_distance__gte=distance
-            ).first()
-            
-            if pricing_rule:
-                # Calculate fee based on rule
-                if pricing_rule.fee_type == 'FIXED':
-                    fee = pricing_rule.fee_amount
-                else:  # PER_KM
-                    fee = pricing_rule.fee_amount * distance
-                    
-                # Round fee to 2 decimal places
-                fee = round(fee, 2)
-            else:
-                # Default calculation if no matching rule
-                base_fee = 5.00  # Base fee in dollars
-                per_km_fee = 1.50  # Fee per kilometer
-                fee = base_fee + (per_km_fee * distance)
-                fee = round(fee, 2)
-                
-        except Exception as e:
-            # Log the error and use a default calculation
-            print(f"Error calculating distance fee: {str(e)}")
-            fee = 5.00 + (1.50 * distance)
-            fee = round(fee, 2)
-            
         return Response({
             "distance": distance,
             "unit": "kilometers",
-            "fee": fee,
+            "fee": round(float(fees[0]), 2),
+            "within_free_radius": float(distances[0]) <= float(pricing_rule.free_radius_km),
+            "service_center": pricing.center.id if pricing.center else None,
+            "free_radius_km": float(pricing_rule.free_radius_km),
+            "base_charge": float(pricing_rule.base_charge),
+            "per_km_charge": float(pricing_rule.per_km_charge),
             "currency": "USD"  # In a real app, get this from settings
         })
 
+class CalculateDistanceFeesBatchView(APIView):
+    permission_classes = [AllowAny]
+    renderer_classes = [JSONRenderer]
+    max_points = 5000
+    
+    def post(self, request):
+        """
+        Price many customer points in one call, e.g. to preview zones on a map
+        Request data:
+        {
+            "points": [[latitude, longitude], ...]
+        }
+        """
+        try:
+            points = np.asarray(request.data.get('points'), dtype=np.float64)
+        except (ValueError, TypeError):
+            points = None
+        if points is None or points.ndim != 2 or points.shape[1] != 2 or not np.isfinite(points).all():
+            return Response(
+                {"error": "points must be a list of [latitude, longitude] pairs"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(points) > self.max_points:
+            return Response(
+                {"error": f"At most {self.max_points} points can be priced at once"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Points outside every service area get no quote
+        served = served_mask(points[:, 0], points[:, 1])
+        distances = [None] * len(points)
+        fees = [None] * len(points)
+        centers = [None] * len(points)
+        positions = np.flatnonzero(served)
+        
+        # Every served point is priced from its nearest service center
+        quotes = quote_many(points[positions, 0], points[positions, 1]) if positions.size else None
+        if quotes is not None:
+            for position, distance, fee, center in zip(
+                positions.tolist(), np.round(quotes[0], 2).tolist(), np.round(quotes[1], 2).tolist(), quotes[2]
+            ):
+                distances[position], fees[position], centers[position] = distance, fee, center
+        elif positions.size:
+            for position in positions.tolist():
+                fees[position] = 0
+        
+        return Response({
+            "unit": "kilometers",
+            "currency": "USD",
+            "in_service_area": served.tolist(),
+            "distances": distances,
+            "fees": fees,
+            "service_centers": centers
+        })
+
 class UpdateCartItemView(APIView):
     permission_classes = [AllowAny]
     renderer_classes = [JSONRenderer]
@@ -525,7 +656,8 @@ class UpdateCartItemView(APIView):
         }
         """
         try:
-            cart = get_object_or_404(Cart, id=cart_id)
+            if cart_store.get(cart_id) is None:
+                raise Http404("Cart not found")
             
             cart_item_id = request.data.get('cart_item_id')
             if not cart_item_id:
@@ -533,20 +665,12 @@ class UpdateCartItemView(APIView):
                     {"error": "cart_item_id is required"}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
-                
-            cart_item = get_object_or_404(CartItem, id=cart_item_id, cart=cart)
             
             # Update quantity if provided
             quantity = request.data.get('quantity')
             if quantity is not None:
                 try:
                     quantity = int(quantity)
-                    if quantity <= 0:
-                        # If quantity is 0 or negative, remove the item
-                        cart_item.delete()
-                        return Response({"status": "Item removed from cart"})
-                    else:
-                        cart_item.quantity = quantity
                 except ValueError:
                     return Response(
                         {"error": "Invalid quantity value"}, 
@@ -554,18 +678,23 @@ class UpdateCartItemView(APIView):
                     )
                     
             # Update service if provided
+            service = None
             service_id = request.data.get('service_id')
             if service_id:
-                service = get_object_or_404(Service, id=service_id)
-                cart_item.service = service
+                service = get_object_or_404(Service.objects.only('id', 'name', 'base_price'), id=service_id)
                 
-            # Save changes
-            cart_item.save()
+            # If quantity is 0 or negative, the item is removed
+            cart, found = cart_store.update_item(cart_id, int(cart_item_id), quantity=quantity, service=service)
+            if not found:
+                raise Http404("Cart item not found")
+            if quantity is not None and quantity <= 0:
+                return Response({"status": "Item removed from cart"})
             
             # Return updated cart
-            serializer = CartSerializer(cart)
-            return Response(serializer.data)
+            return Response(cart_store.render(cart))
             
+        except CartBusy:
+            raise
         except Http404:
             return Response(
                 {"error": "Cart item or service not found"}, 
@@ -584,12 +713,12 @@ class ClearCartView(APIView):
     def delete(self, request, cart_id):
         """Clear all items from a cart"""
         try:
-            cart = get_object_or_404(Cart, id=cart_id)
-            
-            # Delete all items in the cart
-            cart.cartitem_set.all().delete()
+            if cart_store.clear(cart_id) is None:
+                raise Http404("Cart not found")
             
             return Response({"status": "Cart cleared successfully"})
+        except (Http404, CartBusy):
+            raise
         except Exception as e:
             return Response(
                 {"error": f"An error occurred: {str(e)}"}, 
@@ -668,107 +797,85 @@ class ClearCancelledBookingsView(APIView):
                 "message": f"An error occurred: {str(e)}"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class BookingCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
 class UserBookingsView(APIView):
     permission_classes = [IsAuthenticated]
     renderer_classes = [JSONRenderer]
+    pagination_class = BookingCursorPagination
+
+    # Define status display mapping
+    status_display_mapping = {
+        'pending': 'Pending',
+        'confirmed': 'Confirmed',
+        'scheduled': 'Scheduled',
+        'in_progress': 'In Progress',
+        'completed': 'Completed',
+        'cancelled': 'Cancelled',
+        'rejected': 'Rejected'
+    }
     
     def get(self, request):
-        """Get all bookings for the authenticated user"""
-        try:
-            # Get all service requests for the user
-            bookings = ServiceRequest.objects.filter(user=request.user).order_by('-created_at')
-            
-            # Define status display mapping
-            status_display_mapping = {
-                'pending': 'Pending',
-                'confirmed': 'Confirmed',
-                'scheduled': 'Scheduled',
-                'in_progress': 'In Progress',
-                'completed': 'Completed',
-                'cancelled': 'Cancelled',
-                'rejected': 'Rejected'
+        """
+        Get the authenticated user's bookings, newest first, one cursor page at a time.
+        The page costs the same two queries (bookings with their vehicle, and
+        their services) however many bookings the user has.
+        """
+        bookings = (
+            ServiceRequest.objects
+            .filter(user=request.user)
+            .select_related('vehicle_type', 'manufacturer', 'vehicle_model')
+            .prefetch_related(Prefetch('services', queryset=Service.objects.only('id', 'name', 'base_price')))
+        )
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(bookings, request, view=self)
+        return paginator.get_paginated_response([self.booking_data(booking) for booking in page])
+
+    def booking_data(self, booking):
+        service_data = []
+        service_total = 0
+        for service in booking.services.all():
+            service_data.append({
+                'id': service.id,
+                'name': service.name,
+                'quantity': 1,  # Default quantity
+                'price': str(service.base_price)
+            })
+            service_total += float(service.base_price)
+
+        # Zero totals are shown as the service total here and fixed in the
+        # database by the reconcile_booking_totals command, never on read
+        total_amount = booking.total_amount
+        if float(total_amount) == 0 and service_total > 0:
+            total_amount = service_total
+
+        booking_data = {
+            'id': booking.id,
+            'reference': booking.reference or f'RMB-{uuid.uuid4().hex[:8].upper()}',
+            'created_at': booking.created_at.isoformat(),
+            'status': booking.status,
+            'status_display': self.status_display_mapping.get(booking.status.lower(), booking.status),
+            'total_amount': str(total_amount),
+            'schedule_date': booking.scheduled_date.isoformat() if booking.scheduled_date else None,
+            'schedule_time': booking.schedule_time.strftime('%H:%M') if booking.schedule_time else None,
+            'services': service_data,
+            'address': booking.address
+        }
+
+        if booking.vehicle_type_id and booking.manufacturer_id and booking.vehicle_model_id:
+            booking_data['vehicle'] = {
+                'vehicle_type': booking.vehicle_type_id,
+                'manufacturer': booking.manufacturer_id,
+                'model': booking.vehicle_model_id,
+                'vehicle_type_name': booking.vehicle_type.name,
+                'manufacturer_name': booking.manufacturer.name,
+                'model_name': booking.vehicle_model.name
             }
-            
-            # Prepare the response data
-            data = []
-            for booking in bookings:
-                # Get services for this booking
-                services = booking.services.all()
-                service_data = []
-                
-                # Calculate the actual service total
-                service_total = 0
-                
-                for service in services:
-                    service_price = service.base_price
-                    service_data.append({
-                        'id': service.id,
-                        'name': service.name,
-                        'quantity': 1,  # Default quantity
-                        'price': str(service_price)
-                    })
-                    service_total += float(service_price)
-                
-                # Add vehicle data if available
-                vehicle_data = None
-                try:
-                    if booking.vehicle_type_id and booking.manufacturer_id and booking.vehicle_model_id:
-                        # Get the actual model instances
-                        vehicle_type = VehicleType.objects.get(id=booking.vehicle_type_id)
-                        manufacturer = Manufacturer.objects.get(id=booking.manufacturer_id)
-                        vehicle_model = VehicleModel.objects.get(id=booking.vehicle_model_id)
-                        
-                        vehicle_data = {
-                            'vehicle_type': booking.vehicle_type_id,
-                            'manufacturer': booking.manufacturer_id,
-                            'model': booking.vehicle_model_id,
-                            'vehicle_type_name': vehicle_type.name,
-                            'manufacturer_name': manufacturer.name,
-                            'model_name': vehicle_model.name
-                        }
-                except Exception as e:
-                    print(f"[WARNING] Error fetching vehicle data for booking {booking.id}: {str(e)}")
-                    # If there's an error, still provide the IDs without names
-                    if booking.vehicle_type_id and booking.manufacturer_id and booking.vehicle_model_id:
-                        vehicle_data = {
-                            'vehicle_type': booking.vehicle_type_id,
-                            'manufacturer': booking.manufacturer_id,
-                            'model': booking.vehicle_model_id
-                        }
-                
-                # Ensure total_amount is properly calculated if it's zero
-                total_amount = booking.total_amount
-                if float(total_amount) == 0 and service_total > 0:
-                    # If total_amount is zero but services have prices, use service total
-                    total_amount = service_total
-                    # Also update the booking in the database
-                    booking.total_amount = total_amount
-                    booking.save(update_fields=['total_amount'])
-                
-                # Create booking data object
-                booking_data = {
-                    'id': booking.id,
-                    'reference': booking.reference or f'RMB-{uuid.uuid4().hex[:8].upper()}',
-                    'created_at': booking.created_at.isoformat(),
-                    'status': booking.status,
-                    'status_display': status_display_mapping.get(booking.status.lower(), booking.status),
-                    'total_amount': str(total_amount),
-                    'schedule_date': booking.scheduled_date.isoformat() if booking.scheduled_date else None,
-                    'schedule_time': booking.schedule_time.strftime('%H:%M') if booking.schedule_time else None,
-                    'services': service_data,
-                    'address': booking.address
-                }
-                
-                if vehicle_data:
-                    booking_data['vehicle'] = vehicle_data
-                    
-                data.append(booking_data)
-            
-            return Response(data, status=status.HTTP_200_OK)
-            
-        except Exception as e:
-            print(f"[ERROR] Failed to retrieve user bookings: {str(e)}")
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return booking_data
 
 class GetServiceNowView(APIView):
     permission_classes = [IsAuthenticated]
@@ -821,6 +928,11 @@ class GetServiceNowView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
+            # Reject locations we do not serve before any database work
+            error = service_area_error(request.data.get('latitude'), request.data.get('longitude'))
+            if error is not None:
+                return error
+            
             try:
                 service = Service.objects.get(id=service_id)
             except Service.DoesNotExist:
@@ -988,30 +1100,6 @@ class CancelServiceNowView(APIView):
                 "message": "An error occurred while cancelling the service request."
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class CartItemSerializer(serializers.ModelSerializer):
-    service_name = serializers.CharField(source='service.name')
-    service_price = serializers.DecimalField(source='service.base_price', max_digits=10, decimal_places=2)
-    
-    class Meta:
-        model = CartItem
-        fields = ['id', 'service_id', 'quantity', 'service_name', 'service_price']
-
-class DetailedCartSerializer(serializers.ModelSerializer):
-    items = CartItemSerializer(source='cartitem_set', many=True)
-    total_amount = serializers.SerializerMethodField()
-    total_items = serializers.SerializerMethodField()
-
-    class Meta:
-        model = Cart
-        fields = ['id', 'user', 'created_at', 'modified_at', 'status', 'items', 'total_amount', 'total_items']
-
-    def get_total_amount(self, obj):
-        total = sum(item.service.base_price * item.quantity for item in obj.cartitem_set.all())
-        return str(total)
-
-    def get_total_items(self, obj):
-        return obj.cartitem_set.count()
-
 class UserCartsView(APIView):
     permission_classes = [IsAuthenticated]
     renderer_classes = [JSONRenderer]
@@ -1022,20 +1110,18 @@ class UserCartsView(APIView):
         print(f"[DEBUG] Session cart_id: {request.session.get('cart_id')}")
         
         # Get all carts for the user
-        user_carts = Cart.objects.filter(user=request.user)
-        print(f"[DEBUG] Found {user_carts.count()} user carts")
+        user_carts = cart_store.carts_for_user(request.user)
+        print(f"[DEBUG] Found {len(user_carts)} user carts")
         
-        # Get session cart if it exists
+        # Add the session cart if it exists and is not one of them
         session_cart_id = request.session.get('cart_id')
-        if session_cart_id:
-            session_cart = Cart.objects.filter(id=session_cart_id)
-            if session_cart.exists():
-                # Combine querysets if session cart exists
-                user_carts = user_carts | session_cart
+        if session_cart_id and all(cart['id'] != int(session_cart_id) for cart in user_carts):
+            session_cart = cart_store.get(session_cart_id)
+            if session_cart is not None:
+                user_carts.append(session_cart)
         
         # Order by created_at
-        user_carts = user_carts.order_by('-created_at')
-        print(f"[DEBUG] Total carts after combining: {user_carts.count()}")
+        user_carts.sort(key=lambda cart: cart['created_at'], reverse=True)
+        print(f"[DEBUG] Total carts after combining: {len(user_carts)}")
         
-        serializer = DetailedCartSerializer(user_carts, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response([cart_store.render(cart) for cart in user_carts])
\ No newline at end of file
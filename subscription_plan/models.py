@@ -4,6 +4,7 @@ from django.utils import timezone
 from datetime import timedelta
 import json
 from repairing_service.models import ServiceRequest
+from utils.loaded_values import LoadedValuesMixin
 
 
 class Plan(models.Model):
@@ -92,7 +93,7 @@ class PlanVariant(models.Model):
         return self.price
 
 
-class SubscriptionRequest(models.Model):
+class SubscriptionRequest(LoadedValuesMixin, models.Model):
     """
     Handles subscription requests pending approval
     """
@@ -268,7 +269,7 @@ class UserSubscription(models.Model):
         return max(0, delta.days)
 
 
-class VisitSchedule(models.Model):
+class VisitSchedule(LoadedValuesMixin, models.Model):
     """
     Tracks planned and completed service visits
     """
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Benchmark the SQLite channel layer against InMemoryChannelLayer: send/receive
+and group_send throughput in one process, then delivery from separate
+worker processes to a receiver in this one (which the in-memory layer
+cannot do at all).
+
+Usage:
+    python tools/benchmark_channel_layer.py [--messages 5000] [--group-size 20] [--workers 4]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from channels.layers import InMemoryChannelLayer
+from tools.channel_layers import SQLiteChannelLayer
+
+
+async def send_receive(layer, messages):
+    channel = await layer.new_channel()
+    start = time.perf_counter()
+    for index in range(messages):
+        await layer.send(channel, {'type': 'location.update', 'index': index})
+        await layer.receive(channel)
+    return messages / (time.perf_counter() - start)
+
+
+async def fan_out(layer, messages, group_size):
+    channels = [await layer.new_channel() for _ in range(group_size)]
+    for channel in channels:
+        await layer.group_add('bench', channel)
+    start = time.perf_counter()
+    for index in range(messages):
+        await layer.group_send('bench', {'type': 'service.notification', 'index': index})
+        await asyncio.gather(*(layer.receive(channel) for channel in channels))
+    elapsed = time.perf_counter() - start
+    for channel in channels:
+        await layer.group_discard('bench', channel)
+    return messages * group_size / elapsed
+
+
+def worker(path, channel, messages, capacity):
+    async def run():
+        layer = SQLiteChannelLayer(path=path, capacity=capacity)
+        for index in range(messages):
+            await layer.send(channel, {'type': 'service.notification', 'pid': os.getpid(), 'index': index})
+    asyncio.run(run())
+
+
+async def cross_process(path, messages, workers):
+    capacity = messages * workers + 1
+    layer = SQLiteChannelLayer(path=path, capacity=capacity)
+    channel = await layer.new_channel()
+    # Spawn rather than fork: this process already has a SQLite thread running
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(target=worker, args=(path, channel, messages, capacity)) for _ in range(workers)
+    ]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    senders = set()
+    for _ in range(messages * workers):
+        senders.add((await layer.receive(channel))['pid'])
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    return messages * workers / elapsed, len(senders)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--group-size', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    print("===== CHANNEL LAYER BENCHMARK =====")
+    print(f"{args.messages} messages, groups of {args.group_size}, {args.workers} sending processes")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'channels.sqlite3')
+        fan_out_messages = max(args.messages // args.group_size, 1)
+        for name, make in [
+            ('in-memory', lambda: InMemoryChannelLayer(capacity=args.messages + 1)),
+            ('sqlite', lambda: SQLiteChannelLayer(path=path, capacity=args.messages + 1)),
+        ]:
+            rate = asyncio.run(send_receive(make(), args.messages))
+            print(f"{name + ' send/receive':<32} {rate:12,.0f} msg/s")
+            rate = asyncio.run(fan_out(make(), fan_out_messages, args.group_size))
+            print(f"{name + ' group_send':<32} {rate:12,.0f} deliveries/s")
+
+        rate, senders = asyncio.run(cross_process(path, args.messages // args.workers, args.workers))
+        print(f"{'sqlite cross-process':<32} {rate:12,.0f} msg/s from {senders} processes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Benchmark dispatch scoring: a per-mechanic Python loop vs the vectorized
+score_candidates + top_k pass used by the dispatch engine.
+
+Usage:
+    python tools/benchmark_dispatch_scoring.py [--candidates 10000] [--k 3] [--repeat 50]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from repairing_service.dispatch_scoring import (
+    DEFAULT_WEIGHTS, LOAD_HALF_JOBS, MAX_RATING, score_candidates, top_k
+)
+
+RADIUS_KM = 5.0
+
+
+def score_loop(candidates):
+    scores = []
+    for distance, rating, jobs, acceptance in candidates:
+        closeness = min(max(1.0 - distance / RADIUS_KM, 0.0), 1.0)
+        scores.append(
+            DEFAULT_WEIGHTS['distance'] * closeness
+            + DEFAULT_WEIGHTS['rating'] * min(max(rating / MAX_RATING, 0.0), 1.0)
+            + DEFAULT_WEIGHTS['load'] * (1.0 / (1.0 + jobs / LOAD_HALF_JOBS))
+            + DEFAULT_WEIGHTS['acceptance'] * min(max(acceptance, 0.0), 1.0)
+        )
+    return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--candidates', type=int, default=10000)
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    candidates = [
+        (rng.uniform(0, RADIUS_KM), rng.uniform(3, 5), rng.randint(0, 500), rng.random())
+        for _ in range(args.candidates)
+    ]
+    columns = [np.array(column) for column in zip(*candidates)]
+
+    print("===== DISPATCH SCORING BENCHMARK =====")
+    print(f"{args.candidates} candidates, top {args.k}, {args.repeat} runs")
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        scores = score_loop(candidates)
+        loop_best = sorted(range(len(scores)), key=lambda index: -scores[index])[:args.k]
+    loop_elapsed = (time.perf_counter() - start) / args.repeat
+    print(f"{'python loop + sort':<32} {loop_elapsed * 1000:9.3f} ms")
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        vector_best = top_k(score_candidates(*columns, radius_km=RADIUS_KM), args.k)
+    vector_elapsed = (time.perf_counter() - start) / args.repeat
+    print(f"{'score_candidates + top_k':<32} {vector_elapsed * 1000:9.3f} ms")
+
+    print(f"same ranking: {loop_best == vector_best.tolist()}")
+    print(f"speedup: {loop_elapsed / vector_elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
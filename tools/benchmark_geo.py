@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Benchmark utils.geo: scalar haversine in a Python loop vs the vectorized
+one-to-many and many-to-many batch functions.
+
+Usage:
+    python tools/benchmark_geo.py [--points 100000] [--matrix 1000]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+# Setup Django environment
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'authback.settings')
+import django
+django.setup()
+
+import numpy as np
+from utils.geo import haversine_km, initial_bearing, distances_from, bearings_from, distance_matrix
+
+CENTER_LAT, CENTER_LNG = 28.6139, 77.2090
+
+
+def report(label, elapsed, pairs):
+    print(f"{label:<36} {elapsed * 1000:9.2f} ms   {pairs / elapsed / 1e6:8.2f} M pairs/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--points', type=int, default=100000)
+    parser.add_argument('--matrix', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    lats = [CENTER_LAT + rng.uniform(-0.5, 0.5) for _ in range(args.points)]
+    lngs = [CENTER_LNG + rng.uniform(-0.5, 0.5) for _ in range(args.points)]
+    lat_array, lng_array = np.array(lats), np.array(lngs)
+
+    print("===== GEO DISTANCE BENCHMARK =====")
+    print(f"\nOne origin to {args.points} points")
+
+    start = time.perf_counter()
+    scalar = [haversine_km(CENTER_LAT, CENTER_LNG, lat, lng) for lat, lng in zip(lats, lngs)]
+    report("scalar haversine_km loop", time.perf_counter() - start, args.points)
+
+    start = time.perf_counter()
+    vectorized = distances_from(CENTER_LAT, CENTER_LNG, lat_array, lng_array)
+    report("distances_from", time.perf_counter() - start, args.points)
+    print(f"max abs difference: {np.max(np.abs(vectorized - np.array(scalar))):.2e} km")
+
+    start = time.perf_counter()
+    [initial_bearing(CENTER_LAT, CENTER_LNG, lat, lng) for lat, lng in zip(lats, lngs)]
+    report("scalar initial_bearing loop", time.perf_counter() - start, args.points)
+
+    start = time.perf_counter()
+    bearings_from(CENTER_LAT, CENTER_LNG, lat_array, lng_array)
+    report("bearings_from", time.perf_counter() - start, args.points)
+
+    size = args.matrix
+    print(f"\nMany-to-many {size} x {size}")
+    origins = (lat_array[:size], lng_array[:size])
+    targets = (lat_array[-size:], lng_array[-size:])
+
+    start = time.perf_counter()
+    for lat, lng in zip(*origins):
+        [haversine_km(lat, lng, lat2, lng2) for lat2, lng2 in zip(*targets)]
+    report("scalar haversine_km nested loop", time.perf_counter() - start, size * size)
+
+    start = time.perf_counter()
+    distance_matrix(origins[0], origins[1], targets[0], targets[1])
+    report("distance_matrix", time.perf_counter() - start, size * size)
+
+
+if __name__ == "__main__":
+    main()
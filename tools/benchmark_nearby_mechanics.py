@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+Benchmark nearby-mechanic lookup: full scan vs the spatial grid index.
+
+Simulates N mechanics scattered around a city and times radius searches
+with both strategies. By default the comparison runs in memory; with --db
+the mechanics are inserted into the configured database inside a
+transaction that is rolled back afterwards, and FieldStaff.find_nearby is
+timed against the old load-everything-and-filter approach.
+
+Usage:
+    python tools/benchmark_nearby_mechanics.py [--mechanics 10000] [--queries 200] [--db]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from collections import defaultdict
+
+# Setup Django environment
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'authback.settings')
+import django
+django.setup()
+
+from django.db import transaction
+from repairing_service.models import FieldStaff
+from repairing_service.spatial import grid_cell, cells_within
+
+# Roughly the Delhi NCR area
+CENTER_LAT, CENTER_LNG = 28.6139, 77.2090
+SPREAD_DEGREES = 0.35
+
+
+class Rollback(Exception):
+    pass
+
+
+def simulate_points(count, rng):
+    return [
+        (CENTER_LAT + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+         CENTER_LNG + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES))
+        for _ in range(count)
+    ]
+
+
+def timed(label, queries, search):
+    start = time.perf_counter()
+    found = 0
+    for lat, lng in queries:
+        found += len(search(lat, lng))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000 / len(queries):8.3f} ms/query   {found / len(queries):6.1f} mechanics/query")
+    return elapsed
+
+
+def run_in_memory(mechanics, queries, radius_km):
+    staff = [FieldStaff(latitude=lat, longitude=lng, is_available=True) for lat, lng in mechanics]
+    by_cell = defaultdict(list)
+    for mechanic in staff:
+        by_cell[grid_cell(mechanic.latitude, mechanic.longitude)].append(mechanic)
+
+    def full_scan(lat, lng):
+        return [m for m in staff if m.is_within_radius(lat, lng, radius_km)]
+
+    def grid(lat, lng):
+        return [
+            m for cell in cells_within(lat, lng, radius_km)
+            for m in by_cell.get(cell, ())
+            if m.is_within_radius(lat, lng, radius_km)
+        ]
+
+    print(f"\nIn memory, {len(staff)} mechanics, radius {radius_km} km")
+    scan = timed("full scan", queries, full_scan)
+    indexed = timed("grid cells + exact distance", queries, grid)
+    print(f"speedup: {scan / indexed:.1f}x")
+
+
+def run_database(mechanics, queries, radius_km):
+    print(f"\nDatabase, {len(mechanics)} mechanics, radius {radius_km} km")
+    try:
+        with transaction.atomic():
+            FieldStaff.objects.bulk_create([
+                FieldStaff(
+                    latitude=lat,
+                    longitude=lng,
+                    grid_cell=grid_cell(lat, lng),
+                    is_available=True
+                )
+                for lat, lng in mechanics
+            ], batch_size=2000)
+
+            def full_scan(lat, lng):
+                available = FieldStaff.objects.filter(is_available=True, current_job__isnull=True)
+                return [m for m in available if m.is_within_radius(lat, lng, radius_km)]
+
+            def grid(lat, lng):
+                return FieldStaff.find_nearby(lat, lng, radius_km=radius_km)
+
+            scan = timed("full scan", queries, full_scan)
+            indexed = timed("FieldStaff.find_nearby", queries, grid)
+            print(f"speedup: {scan / indexed:.1f}x")
+            raise Rollback()
+    except Rollback:
+        print("(benchmark rows rolled back)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--mechanics', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--radius', type=float, default=5.0)
+    parser.add_argument('--db', action='store_true', help='Also benchmark against the configured database')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    mechanics = simulate_points(args.mechanics, rng)
+    queries = simulate_points(args.queries, rng)
+
+    print("===== NEARBY MECHANIC LOOKUP BENCHMARK =====")
+    run_in_memory(mechanics, queries, args.radius)
+    if args.db:
+        run_database(mechanics, queries, args.radius)
+
+
+if __name__ == "__main__":
+    main()
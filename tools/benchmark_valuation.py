@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Benchmark the purchase offer valuation model: fitting the ridge regression
+from synthetic listings, and suggest_valuation per vehicle against the
+< 1 ms target.
+
+The fit runs in memory on DepreciationModel, so no database rows are
+written; suggestions use the fitted coefficient dict directly, as they do
+once it is cached.
+
+Usage:
+    python tools/benchmark_valuation.py [--listings 50000] [--brands 30] [--suggestions 20000]
+"""
+
+import math
+import os
+import sys
+import time
+import random
+import argparse
+
+# Setup Django environment
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'authback.settings')
+import django
+django.setup()
+
+from types import SimpleNamespace
+from marketplace.valuation import (
+    CONDITION_FIELDS, DepreciationModel, brand_key, model_key, numeric_features, suggest_valuation
+)
+
+TARGET_MS = 1.0
+REFERENCE_YEAR = 2025
+
+
+def synthetic_vehicle(rng, brands):
+    brand = rng.choice(brands)
+    return SimpleNamespace(
+        brand=brand,
+        model=f"{brand} {rng.randint(1, 8)}",
+        year=rng.randint(2005, REFERENCE_YEAR),
+        kms_driven=rng.randint(0, 120000),
+        fuel_type=rng.choice(['petrol', 'petrol', 'petrol', 'electric']),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--listings', type=int, default=50000)
+    parser.add_argument('--brands', type=int, default=30)
+    parser.add_argument('--suggestions', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    brands = [f"Brand{index}" for index in range(args.brands)]
+    brand_effect = {brand: rng.gauss(0, 0.3) for brand in brands}
+
+    observations = []
+    for _ in range(args.listings):
+        vehicle = synthetic_vehicle(rng, brands)
+        conditions = {field: rng.randint(1, 5) for field in CONDITION_FIELDS}
+        row = numeric_features(vehicle.year, vehicle.kms_driven, vehicle.fuel_type, conditions, REFERENCE_YEAR)
+        log_price = 11.0 - 0.08 * row[1] - 0.15 * row[2] + 0.03 * sum(row[4:]) + brand_effect[vehicle.brand]
+        price = math.exp(log_price + rng.gauss(0, 0.05))
+        observations.append((row, brand_key(vehicle.brand), model_key(vehicle.brand, vehicle.model), price))
+
+    print("===== VALUATION BENCHMARK =====")
+    print(f"{args.listings} listings, {args.brands} brands, {args.suggestions} suggestions")
+
+    model = DepreciationModel()
+    start = time.perf_counter()
+    for offset in range(0, len(observations), 5000):
+        model.add_observations(observations[offset:offset + 5000])
+    accumulate_elapsed = time.perf_counter() - start
+    print(f"{'accumulate XtX / Xty':<32} {accumulate_elapsed * 1000:9.1f} ms")
+
+    start = time.perf_counter()
+    coefficients = model.solve()
+    solve_elapsed = time.perf_counter() - start
+    print(f"{'solve ({} features)'.format(len(model.features)):<32} {solve_elapsed * 1000:9.1f} ms")
+    print(f"age coefficient {coefficients['numeric']['age']:.4f} (true -0.0800), "
+          f"log RMSE {coefficients['rmse_log']:.3f}")
+
+    vehicles = [synthetic_vehicle(rng, brands) for _ in range(args.suggestions)]
+    conditions = [{field: rng.randint(1, 5) for field in CONDITION_FIELDS} for _ in vehicles]
+    start = time.perf_counter()
+    for vehicle, condition in zip(vehicles, conditions):
+        suggest_valuation(vehicle, condition, coefficients=coefficients, reference_year=REFERENCE_YEAR)
+    per_vehicle_ms = (time.perf_counter() - start) * 1000 / len(vehicles)
+    print(f"{'suggest_valuation per vehicle':<32} {per_vehicle_ms:9.4f} ms")
+    print(f"under {TARGET_MS:g} ms target: {per_vehicle_ms < TARGET_MS}")
+
+
+if __name__ == "__main__":
+    main()
@@ -29,6 +29,22 @@ def get_cache_key(request, key_prefix="view"):
     key_string = "_".join(key_parts)
     return hashlib.md5(key_string.encode()).hexdigest()
 
+def get_namespace_version(namespace):
+    """
+    Return the current version of a cache namespace
+    """
+    return cache.get_or_set(f'cache_version_{namespace}', 1, None)
+
+def invalidate_namespace(namespace):
+    """
+    Invalidate every cached response in a namespace in one operation
+    by bumping its version, so stale keys are simply never read again
+    """
+    try:
+        cache.incr(f'cache_version_{namespace}')
+    except ValueError:
+        cache.set(f'cache_version_{namespace}', 2, None)
+
 def ensure_renderer(response):
     """
     Ensure the response has a renderer set
@@ -39,9 +55,10 @@ def ensure_renderer(response):
         response.renderer_context = {}
     return response
 
-def cache_api_response(timeout=None, key_prefix="api"):
+def cache_api_response(timeout=None, key_prefix="api", namespace=None):
     """
-    Cache API responses for a specified time
+    Cache API responses for a specified time.
+    Responses cached under a namespace can be dropped together with invalidate_namespace.
     """
     def decorator(view_func):
         @wraps(view_func)
@@ -76,7 +93,10 @@ def cache_api_response(timeout=None, key_prefix="api"):
                 cache_timeout = timeout or getattr(settings, 'CACHE_TTL', 60 * 5)
                 
                 # Generate cache key
-                cache_key = get_cache_key(request, key_prefix)
+                prefix = key_prefix
+                if namespace:
+                    prefix = f"{key_prefix}_v{get_namespace_version(namespace)}"
+                cache_key = get_cache_key(request, prefix)
                 
                 # Try to get from cache
                 response = cache.get(cache_key)
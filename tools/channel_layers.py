@@ -0,0 +1,335 @@
+"""
+Channel layer shared by every worker process on one host, with no broker.
+
+Messages and group memberships live in a SQLite database in WAL mode, so
+several gunicorn/uvicorn workers can send to each other's websocket
+consumers without Redis. Each layer instance runs its SQLite calls on one
+dedicated thread, so the event loop never blocks on the database.
+
+Receiving is done by one poller task per event loop. Channels created with
+new_channel() on a loop share a prefix unique to that loop, and the poller
+moves every message under that prefix into in-memory queues with a single
+indexed range query. It polls again right away while messages keep coming
+and backs off to poll_interval when idle. Channels not created by
+new_channel() are polled individually by receive().
+
+Messages are stored as JSON. Values JSON has no type for (Decimal,
+datetime, date, time, timedelta, UUID, bytes) are written as tagged
+objects and restored on receive, so payloads built for the in-memory or
+Redis layers go through unchanged. Tuples and sets arrive as lists and
+dict keys as strings.
+
+Configure in settings:
+
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "tools.channel_layers.SQLiteChannelLayer",
+            "CONFIG": {"path": "/tmp/channels.sqlite3"},
+        },
+    }
+"""
+import asyncio
+import base64
+import datetime
+import decimal
+import json
+import os
+import random
+import sqlite3
+import string
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channel_message (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    body TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS channel_message_channel ON channel_message (channel, id);
+CREATE TABLE IF NOT EXISTS channel_group (
+    name TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (name, channel)
+);
+"""
+
+# Sorts after every character allowed in a channel name
+PREFIX_END = '\x7f'
+
+# Key marking a tagged value in a stored message
+TYPE_KEY = '__channel_layer_type__'
+
+_ENCODERS = [
+    # datetime before date, its base class
+    (datetime.datetime, 'datetime', datetime.datetime.isoformat),
+    (datetime.date, 'date', datetime.date.isoformat),
+    (datetime.time, 'time', datetime.time.isoformat),
+    (datetime.timedelta, 'timedelta', datetime.timedelta.total_seconds),
+    (decimal.Decimal, 'decimal', str),
+    (uuid.UUID, 'uuid', str),
+    (bytes, 'bytes', lambda value: base64.b64encode(value).decode('ascii')),
+]
+
+_DECODERS = {
+    'datetime': datetime.datetime.fromisoformat,
+    'date': datetime.date.fromisoformat,
+    'time': datetime.time.fromisoformat,
+    'timedelta': lambda value: datetime.timedelta(seconds=value),
+    'decimal': decimal.Decimal,
+    'uuid': uuid.UUID,
+    'bytes': base64.b64decode,
+}
+
+
+def _encode_value(value):
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    for cls, tag, encode in _ENCODERS:
+        if isinstance(value, cls):
+            return {TYPE_KEY: tag, 'value': encode(value)}
+    raise TypeError(f"Object of type {type(value).__name__} cannot be sent over the channel layer")
+
+
+def _decode_object(obj):
+    if TYPE_KEY in obj and len(obj) == 2:
+        return _DECODERS[obj[TYPE_KEY]](obj['value'])
+    return obj
+
+
+def encode_message(message):
+    return json.dumps(message, default=_encode_value, separators=(',', ':'))
+
+
+def decode_message(body):
+    return json.loads(body, object_hook=_decode_object)
+
+
+class _LoopState:
+    """Receive queues and poller of one event loop"""
+
+    def __init__(self):
+        self.prefix = 'sqlite.' + uuid.uuid4().hex
+        self.queues = {}
+        self.task = None
+        self.wakeup = None
+
+    def wake(self):
+        if self.wakeup is not None and not self.wakeup.done():
+            self.wakeup.set_result(None)
+
+
+class SQLiteChannelLayer(BaseChannelLayer):
+    extensions = ['groups', 'flush']
+
+    def __init__(self, path=None, expiry=60, group_expiry=86400, capacity=100, channel_capacity=None,
+                 poll_interval=0.02, batch_size=500, cleanup_interval=30):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity)
+        self.channel_capacity = self.compile_capacities(channel_capacity or {})
+        self.path = str(path or os.path.join(tempfile.gettempdir(), 'channel-layer.sqlite3'))
+        self.group_expiry = group_expiry
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.cleanup_interval = cleanup_interval
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite-channel-layer')
+        self._connection = None
+        self._last_cleanup = 0.0
+        self._loops = {}
+
+    # Database access, always on the executor thread
+
+    def _db(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _send(self, channel, body, capacity):
+        db = self._db()
+        now = time.time()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            queued, = db.execute(
+                'SELECT COUNT(*) FROM channel_message WHERE channel = ? AND expires > ?', (channel, now)
+            ).fetchone()
+            if queued >= capacity:
+                raise ChannelFull(channel)
+            db.execute(
+                'INSERT INTO channel_message (channel, body, expires) VALUES (?, ?, ?)',
+                (channel, body, now + self.expiry)
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def _group_send(self, group, body):
+        db = self._db()
+        now = time.time()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            channels = [
+                channel for channel, queued in db.execute(
+                    'SELECT g.channel, COUNT(m.id) FROM channel_group g '
+                    'LEFT JOIN channel_message m ON m.channel = g.channel AND m.expires > ? '
+                    'WHERE g.name = ? AND g.expires > ? GROUP BY g.channel',
+                    (now, group, now)
+                )
+                # Full channels miss the message, as with other layers
+                if queued < self.get_capacity(channel)
+            ]
+            db.executemany(
+                'INSERT INTO channel_message (channel, body, expires) VALUES (?, ?, ?)',
+                [(channel, body, now + self.expiry) for channel in channels]
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def _take(self, low, high, limit):
+        """Remove and return up to limit live messages for channels in [low, high)"""
+        db = self._db()
+        now = time.time()
+        if now - self._last_cleanup > self.cleanup_interval:
+            self._last_cleanup = now
+            db.execute('DELETE FROM channel_message WHERE expires <= ?', (now,))
+            db.execute('DELETE FROM channel_group WHERE expires <= ?', (now,))
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            rows = db.execute(
+                'SELECT id, channel, body, expires FROM channel_message '
+                'WHERE channel >= ? AND channel < ? ORDER BY id LIMIT ?',
+                (low, high, limit)
+            ).fetchall()
+            if rows:
+                db.execute(
+                    f"DELETE FROM channel_message WHERE id IN ({','.join('?' * len(rows))})",
+                    [row[0] for row in rows]
+                )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return [(channel, body) for _, channel, body, expires in rows if expires > now]
+
+    def _execute(self, sql, params=()):
+        self._db().execute(sql, params)
+
+    # Channel layer API
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_channel_name(channel)
+        assert '__asgi_channel__' not in message
+        await self._run(self._send, channel, encode_message(message), self.get_capacity(channel))
+
+    def _state(self):
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            # Forget loops that were closed, e.g. by async_to_sync
+            for closed in [other for other in self._loops if other.is_closed()]:
+                del self._loops[closed]
+            state = self._loops[loop] = _LoopState()
+        return state
+
+    async def new_channel(self, prefix='specific'):
+        state = self._state()
+        suffix = ''.join(random.choice(string.ascii_letters) for _ in range(12))
+        channel = f"{state.prefix}.{prefix}!{suffix}"
+        state.queues[channel] = asyncio.Queue()
+        return channel
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        state = self._state()
+        if channel not in state.queues:
+            if channel.startswith(state.prefix + '.'):
+                state.queues[channel] = asyncio.Queue()
+            else:
+                return await self._receive_direct(channel)
+        if state.task is None or state.task.done():
+            state.task = asyncio.ensure_future(self._poll(state))
+        state.wake()
+        queue = state.queues[channel]
+        try:
+            return await queue.get()
+        except asyncio.CancelledError:
+            # The consumer went away; stop routing to it unless messages are pending
+            if queue.empty():
+                state.queues.pop(channel, None)
+            raise
+
+    async def _receive_direct(self, channel):
+        delay = 0.001
+        while True:
+            messages = await self._run(self._take, channel, channel + '\x00', 1)
+            if messages:
+                return decode_message(messages[0][1])
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.poll_interval)
+
+    async def _poll(self, state):
+        delay = 0.001
+        while state.queues:
+            try:
+                messages = await self._run(
+                    self._take, state.prefix + '.', state.prefix + '.' + PREFIX_END, self.batch_size
+                )
+            except sqlite3.OperationalError:
+                # Locked for longer than the busy timeout; keep the poller alive
+                messages = []
+            for channel, body in messages:
+                queue = state.queues.get(channel)
+                if queue is not None:
+                    queue.put_nowait(decode_message(body))
+            if len(messages) == self.batch_size:
+                continue
+            if messages:
+                delay = 0.001
+            # A new receive() cuts the wait short. asyncio.wait rather than
+            # wait_for, which can swallow the task's cancellation on 3.11.
+            state.wakeup = asyncio.get_running_loop().create_future()
+            await asyncio.wait([state.wakeup], timeout=delay)
+            delay = min(delay * 2, self.poll_interval)
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await self._run(
+            self._execute,
+            'INSERT OR REPLACE INTO channel_group (name, channel, expires) VALUES (?, ?, ?)',
+            (group, channel, time.time() + self.group_expiry)
+        )
+
+    async def group_discard(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await self._run(self._execute, 'DELETE FROM channel_group WHERE name = ? AND channel = ?', (group, channel))
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        self.require_valid_group_name(group)
+        await self._run(self._group_send, group, encode_message(message))
+
+    async def flush(self):
+        await self._run(self._execute, 'DELETE FROM channel_message')
+        await self._run(self._execute, 'DELETE FROM channel_group')
+
+    async def close(self):
+        for state in self._loops.values():
+            if state.task is not None:
+                state.task.cancel()
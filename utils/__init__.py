@@ -1,3 +1,10 @@
-from .cdn_utils import cdn_manager
+__all__ = ['cdn_manager']
 
-__all__ = ['cdn_manager'] 
\ No newline at end of file
+
+def __getattr__(name):
+    # cdn_utils reads Django settings on import, so only load it when asked;
+    # settings-free helpers such as utils.geo stay importable on their own
+    if name == 'cdn_manager':
+        from .cdn_utils import cdn_manager
+        return cdn_manager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,266 @@
+"""
+Great-circle distance and bearing helpers.
+
+Scalar functions use the math module and are meant for single pairs of
+points. The batch functions accept sequences or NumPy arrays and compute
+one-to-many or many-to-many results in a single vectorized pass.
+All coordinates are in decimal degrees, distances in kilometers and
+bearings in degrees clockwise from north (0-360).
+"""
+import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distance in kilometers between two points"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (float(lat1), float(lon1), float(lat2), float(lon2)))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def initial_bearing(lat1, lon1, lat2, lon2):
+    """Initial bearing in degrees when travelling from point 1 to point 2"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (float(lat1), float(lon1), float(lat2), float(lon2)))
+    dlon = lon2 - lon1
+    x = math.sin(dlon) * math.cos(lat2)
+    y = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlon)
+    return (math.degrees(math.atan2(x, y)) + 360.0) % 360.0
+
+
+def _radians(values):
+    return np.radians(np.asarray(values, dtype=np.float64))
+
+
+def distances_from(lat, lon, lats, lons):
+    """Distances in kilometers from one point to every point in lats/lons"""
+    lat1, lon1 = math.radians(float(lat)), math.radians(float(lon))
+    lat2, lon2 = _radians(lats), _radians(lons)
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def bearings_from(lat, lon, lats, lons):
+    """Initial bearings in degrees from one point to every point in lats/lons"""
+    lat1, lon1 = math.radians(float(lat)), math.radians(float(lon))
+    lat2, lon2 = _radians(lats), _radians(lons)
+    dlon = lon2 - lon1
+    x = np.sin(dlon) * np.cos(lat2)
+    y = math.cos(lat1) * np.sin(lat2) - math.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return (np.degrees(np.arctan2(x, y)) + 360.0) % 360.0
+
+
+def distance_matrix(lats1, lons1, lats2, lons2):
+    """
+    Pairwise distances in kilometers, shape (len(lats1), len(lats2)).
+    Row i holds the distances from point i of the first set to every
+    point of the second set.
+    """
+    lat1 = _radians(lats1)[:, np.newaxis]
+    lon1 = _radians(lons1)[:, np.newaxis]
+    lat2 = _radians(lats2)[np.newaxis, :]
+    lon2 = _radians(lons2)[np.newaxis, :]
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def bearing_matrix(lats1, lons1, lats2, lons2):
+    """Pairwise initial bearings in degrees, shape (len(lats1), len(lats2))"""
+    lat1 = _radians(lats1)[:, np.newaxis]
+    lon1 = _radians(lons1)[:, np.newaxis]
+    lat2 = _radians(lats2)[np.newaxis, :]
+    lon2 = _radians(lons2)[np.newaxis, :]
+    dlon = lon2 - lon1
+    x = np.sin(dlon) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return (np.degrees(np.arctan2(x, y)) + 360.0) % 360.0
+
+
+def segment_distances(lats, lons):
+    """Lengths in kilometers of the segments joining consecutive points of a path"""
+    lat, lon = _radians(lats), _radians(lons)
+    if lat.size < 2:
+        return np.zeros(0)
+    a = (
+        np.sin((lat[1:] - lat[:-1]) / 2) ** 2
+        + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin((lon[1:] - lon[:-1]) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def simplify_track(lats, lons, tolerance_m):
+    """
+    Douglas-Peucker simplification of a path.
+    Returns a boolean mask of the points to keep; the first and last points
+    are always kept and no dropped point is further than tolerance_m meters
+    from the simplified path.
+    """
+    count = len(lats)
+    keep = np.zeros(count, dtype=bool)
+    if count == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    if count < 3:
+        return keep
+
+    # Project onto a local plane in meters; accurate enough at track scale
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    scale = EARTH_RADIUS_KM * 1000.0
+    x = (lon - lon[0]) * np.cos(lat.mean()) * scale
+    y = (lat - lat[0]) * scale
+
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        length = np.hypot(dx, dy)
+        if length == 0:
+            distances = np.hypot(px, py)
+        else:
+            distances = np.abs(dx * py - dy * px) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_m:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return keep
+
+
+def unit_vectors(lats, lons):
+    """Points on the unit sphere, shape (n, 3); chord length grows with great-circle distance"""
+    lat, lon = _radians(lats), _radians(lons)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+# Up to this many points, NearestPointIndex.nearest_many compares all pairs
+BRUTE_FORCE_POINTS = 256
+
+
+class NearestPointIndex:
+    """
+    Static KD-tree over points on the sphere for nearest-neighbour lookups.
+
+    Points are stored as 3D unit vectors so the nearest point by chord length
+    is also the nearest by great-circle distance, with no special cases at
+    the antimeridian or the poles. Build is O(n log n) and a query visits
+    O(log n) nodes on average. Rebuild the index when the points change.
+    """
+
+    def __init__(self, lats, lons):
+        self.points = unit_vectors(lats, lons)
+        count = len(self.points)
+        # Implicit tree: node i splits on axes[i] at the point order[i]
+        self.order = np.arange(count)
+        self.axes = np.zeros(count, dtype=np.intp)
+        self.left = np.full(count, -1, dtype=np.intp)
+        self.right = np.full(count, -1, dtype=np.intp)
+        self.root = self._build(0, count) if count else -1
+        # Plain lists are much faster than NumPy scalars for the per-node walk
+        self._nodes = [
+            (self.points[index].tolist(), int(index), int(axis), int(left), int(right))
+            for index, axis, left, right in zip(self.order, self.axes, self.left, self.right)
+        ]
+
+    def _build(self, start, end):
+        order = self.order[start:end]
+        points = self.points[order]
+        axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+        order[:] = order[np.argsort(points[:, axis], kind='stable')]
+        middle = (start + end) // 2
+        self.axes[middle] = axis
+        if start < middle:
+            self.left[middle] = self._build(start, middle)
+        if middle + 1 < end:
+            self.right[middle] = self._build(middle + 1, end)
+        return middle
+
+    def __len__(self):
+        return len(self.points)
+
+    def nearest(self, lat, lon):
+        """Index (into the input sequences) of the point nearest to lat/lon, or None if empty"""
+        if self.root < 0:
+            return None
+        return self._nearest(unit_vectors([lat], [lon])[0].tolist())
+
+    def nearest_many(self, lats, lons, block_size=1 << 18):
+        """
+        Indices of the nearest point for many targets as an integer array, or
+        None if the index is empty. Small indexes compare every target with
+        every point in vectorized blocks of about block_size pairs; larger
+        ones walk the tree per target.
+        """
+        if self.root < 0:
+            return None
+        targets = unit_vectors(lats, lons)
+        count = len(self.points)
+        if count > BRUTE_FORCE_POINTS:
+            return np.fromiter(
+                (self._nearest(target) for target in targets.tolist()), dtype=np.intp, count=len(targets)
+            )
+        nearest = np.empty(len(targets), dtype=np.intp)
+        step = max(block_size // count, 1)
+        for start in range(0, len(targets), step):
+            # For unit vectors the squared chord is 2 - 2 * dot product
+            nearest[start:start + step] = np.argmax(targets[start:start + step] @ self.points.T, axis=1)
+        return nearest
+
+    def _nearest(self, target):
+        nodes = self._nodes
+        best, best_distance = None, float('inf')
+        # (node, squared distance from the target to the node's side of the split)
+        stack = [(self.root, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if bound >= best_distance:
+                continue
+            point, index, axis, left, right = nodes[node]
+            distance = (point[0] - target[0]) ** 2 + (point[1] - target[1]) ** 2 + (point[2] - target[2]) ** 2
+            if distance < best_distance:
+                best, best_distance = index, distance
+            offset = target[axis] - point[axis]
+            near, far = (left, right) if offset < 0 else (right, left)
+            if far >= 0:
+                stack.append((far, offset * offset))
+            if near >= 0:
+                stack.append((near, bound))
+        return best
+
+
+def points_in_rings(lats, lons, rings):
+    """
+    Even-odd ray casting of many points against a polygon given as a list of
+    rings, each a sequence of (longitude, latitude) vertices as in GeoJSON.
+    Holes are simply more rings: a point inside the outer ring and a hole
+    crosses an even number of edges. Returns a boolean array, one per point.
+    """
+    y = np.asarray(lats, dtype=np.float64)[:, np.newaxis]
+    x = np.asarray(lons, dtype=np.float64)[:, np.newaxis]
+    starts, ends = [], []
+    for ring in rings:
+        ring = np.asarray(ring, dtype=np.float64)[:, :2]
+        starts.append(ring)
+        ends.append(np.roll(ring, -1, axis=0))
+    start, end = np.concatenate(starts), np.concatenate(ends)
+    x1, y1 = start[:, 0][np.newaxis, :], start[:, 1][np.newaxis, :]
+    x2, y2 = end[:, 0][np.newaxis, :], end[:, 1][np.newaxis, :]
+    straddles = (y1 > y) != (y2 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    crossings = straddles & (x < crossing_x)
+    return (crossings.sum(axis=1) % 2) == 1
@@ -0,0 +1,28 @@
+"""
+Remembering the values a model instance was loaded with.
+
+Mixing LoadedValuesMixin into a model keeps, on every instance read from the
+database, the loaded field values in instance._loaded_values (attname ->
+value), so a later save can tell what changed without reading the row again.
+The snapshot is taken in from_db, so instances built in Python (Model(...),
+objects.create) pay nothing, and refresh_from_db updates it with the values
+it reloads. Instances never loaded have no _loaded_values.
+"""
+
+
+class LoadedValuesMixin:
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        """The reloaded values become the new baseline"""
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        reloaded = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__ and (fields is None or {field.name, field.attname} & set(fields))
+        }
+        self._loaded_values = {**getattr(self, '_loaded_values', {}), **reloaded}